@@ -0,0 +1,61 @@
+# bench/filtered_recall.py
+# Recall@k and latency of filtered HNSW search against exact search, per ef_search / iterative scan:
+#   DATABASE_URL=... python bench/filtered_recall.py --model-id esm2_t6_8M_UR50D --organism "Homo sapiens" --exclude-fallback
+import os, sys, time, json, asyncio, argparse, statistics
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services', 'gateway'))
+from app.db.repository import DatabaseContext, DatabasePool
+
+def result_keys(rows):
+    return {(r["primary_accession"], round(r["distance"], 6)) for r in rows}
+
+async def run(args):
+    db_url = os.environ["DATABASE_URL"]
+    filters = {k: v for k, v in {
+        "organism": args.organism, "min_confidence": args.min_confidence, "exclude_fallback": args.exclude_fallback
+    }.items() if v not in (None, False)}
+
+    async with DatabaseContext(db_url) as repo:
+        table_name = (await repo.get_model(args.model_id)).table_name
+        queries = [r["vector"] for r in await repo.conn.fetch(
+            f'SELECT vector FROM "{table_name}" ORDER BY random() LIMIT $1', args.queries
+        )]
+
+        # Ground truth: same query with index scans disabled, so the planner has to scan exactly
+        truth, exact_latency = [], []
+        for vector in queries:
+            async with repo.conn.transaction():
+                await repo.conn.execute("SET LOCAL enable_indexscan = off")
+                started = time.perf_counter()
+                truth.append(result_keys(await repo.find_similar(vector, args.model_id, args.k, filters=filters)))
+                exact_latency.append(time.perf_counter() - started)
+        print(json.dumps({"mode": "exact", "filters": filters, "mean_ms": round(statistics.mean(exact_latency) * 1000, 2)}))
+
+        for iterative in args.iterative:
+            for ef in args.ef_search:
+                recalls, latencies = [], []
+                for vector, expected in zip(queries, truth):
+                    started = time.perf_counter()
+                    rows = await repo.find_similar(vector, args.model_id, args.k, filters=filters, ef_search=ef, iterative_scan=iterative)
+                    latencies.append(time.perf_counter() - started)
+                    if expected:
+                        recalls.append(len(result_keys(rows) & expected) / len(expected))
+                print(json.dumps({
+                    "mode": "hnsw", "iterative_scan": iterative, "ef_search": ef, "k": args.k,
+                    f"recall@{args.k}": round(statistics.mean(recalls), 4) if recalls else None,
+                    "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+                    "p95_ms": round(sorted(latencies)[int(len(latencies) * 0.95)] * 1000, 2),
+                }))
+    await DatabasePool.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Filtered ANN recall vs latency")
+    parser.add_argument("--model-id", default="esm2_t6_8M_UR50D")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[20, 40, 80, 160, 320])
+    parser.add_argument("--iterative", nargs="+", default=["off", "relaxed_order"])
+    parser.add_argument("--organism")
+    parser.add_argument("--min-confidence", type=float)
+    parser.add_argument("--exclude-fallback", action="store_true")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,80 @@
+# bench/inference_backends.py
+# Embedding parity (cosine against eager fp32) and sequences/s for each MODE backend, on random
+# sequences spread over the worker's length buckets. Exits non-zero if a backend drops below --min-cosine:
+#   python bench/inference_backends.py --model facebook/esm2_t6_8M_UR50D --backends eager bf16 compile int8 onnx
+import os, sys, time, json, random, argparse
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services', 'gateway'))
+import torch
+from app.core.embedding import EmbeddingEngine
+from load_gateway import random_sequence
+
+def run_backend(args, backend, sequences):
+    started = time.perf_counter()
+    engine = EmbeddingEngine(args.model, device=torch.device("cpu"), with_confidence=True, backend=backend)
+    # Warm up on the longest batch: torch.compile traces here, not inside the timed loop
+    engine.embed(sequences[-args.batch_size:])
+    load_s = time.perf_counter() - started
+
+    vectors, confidences = [], []
+    started = time.perf_counter()
+    for _ in range(args.repeats):
+        vectors, confidences = [], []
+        for i in range(0, len(sequences), args.batch_size):
+            batch_vectors, batch_confidences = engine.embed(sequences[i:i + args.batch_size])
+            vectors.append(batch_vectors)
+            confidences.extend(batch_confidences)
+    elapsed = (time.perf_counter() - started) / args.repeats
+    return torch.cat(vectors), torch.tensor(confidences), load_s, elapsed
+
+def main(args):
+    torch.set_num_threads(args.threads or torch.get_num_threads())
+    rng = random.Random(args.seed)
+    # Sorted like the worker's length buckets, so padding waste matches production
+    sequences = sorted((random_sequence(rng, args.min_len, args.max_len) for _ in range(args.sequences)), key=len)
+
+    backends = ["eager"] + [b for b in args.backends if b != "eager"]
+    reference, failed = None, []
+    for backend in backends:
+        try:
+            vectors, confidences, load_s, elapsed = run_backend(args, backend, sequences)
+        except Exception as e:
+            print(json.dumps({"backend": backend, "error": f"{type(e).__name__}: {e}"}))
+            failed.append(backend)
+            continue
+        report = {
+            "backend": backend, "load_s": round(load_s, 2),
+            "seq_per_s": round(len(sequences) / elapsed, 1),
+        }
+        if reference is None:
+            reference = (vectors, confidences, elapsed)
+        else:
+            # Both sides are L2-normalized, so the row-wise dot product is the cosine
+            cosine = (vectors * reference[0]).sum(dim=1)
+            report.update({
+                "speedup": round(reference[2] / elapsed, 2),
+                "cosine_min": round(cosine.min().item(), 5),
+                "cosine_mean": round(cosine.mean().item(), 5),
+                "confidence_max_abs_diff": round((confidences - reference[1]).abs().max().item(), 5),
+            })
+            if cosine.min().item() < args.min_cosine:
+                failed.append(backend)
+        print(json.dumps(report))
+
+    if failed:
+        print(json.dumps({"failed": failed, "min_cosine": args.min_cosine}))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parity and throughput of the embedding backends against eager fp32")
+    parser.add_argument("--model", default="facebook/esm2_t6_8M_UR50D")
+    parser.add_argument("--backends", nargs="+", default=["eager", "bf16", "compile", "int8", "onnx"])
+    parser.add_argument("--sequences", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--min-len", type=int, default=60)
+    parser.add_argument("--max-len", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--seed", type=int, default=5)
+    main(parser.parse_args())
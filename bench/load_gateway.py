@@ -0,0 +1,80 @@
+# bench/load_gateway.py
+# Concurrent load against a running gateway. Run it once on the old build and once on the new
+# one with the same flags, e.g.:
+#   python bench/load_gateway.py --url http://localhost:8000 --concurrency 32 --requests 500 --label async
+import argparse, asyncio, json, random, statistics, time
+import httpx
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+def random_sequence(rng, min_len=60, max_len=400):
+    return "".join(rng.choice(AMINO_ACIDS) for _ in range(rng.randint(min_len, max_len)))
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def run(args):
+    rng = random.Random(args.seed)
+    # A small pool of repeated queries plus fresh ones mirrors real search traffic
+    pool = [random_sequence(rng) for _ in range(args.distinct)]
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for _ in range(args.requests):
+        queue.put_nowait(rng.choice(pool))
+
+    async def client_loop(client):
+        nonlocal errors
+        while not queue.empty():
+            sequence = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                if args.endpoint == "search":
+                    res = await client.post("/v1/search", json={"sequence": sequence}, params={"model_id": args.model_id})
+                else:
+                    res = await client.post("/v1/ingest", json={"sequence": sequence}, params={"model_id": args.model_id})
+                res.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(args.concurrency)))
+        wall = time.perf_counter() - started
+
+    report = {
+        "label": args.label,
+        "endpoint": args.endpoint,
+        "concurrency": args.concurrency,
+        "completed": len(latencies),
+        "errors": errors,
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+    }
+    if latencies:
+        report.update({
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+        })
+    print(json.dumps(report))
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps(report) + "\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HelixStream gateway load benchmark")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", choices=["search", "ingest"], default="search")
+    parser.add_argument("--model-id", default="esm2_t6_8M_UR50D")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output", help="Append the JSON report to this file to compare runs")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,84 @@
+# bench/priority_load.py
+# Interactive search latency on its own, then again while a bulk FASTA ingest of the same remote model
+# is draining through TitanCache. With priority lanes the two p99s should stay close:
+#   python bench/priority_load.py --url http://localhost:8000 --model-id esm2_t33_650M_UR50D --bulk-sequences 20000
+import argparse, asyncio, json, random, statistics, time
+import httpx
+from load_gateway import random_sequence, percentile
+
+def summarize(label, latencies, errors, wall):
+    report = {"phase": label, "completed": len(latencies), "errors": errors, "wall_s": round(wall, 2)}
+    if latencies:
+        report.update({
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+        })
+    return report
+
+async def interactive_phase(client, args, rng, label, keep_going=None):
+    # Fresh sequences only: a cache hit never reaches the task queue
+    latencies, errors = [], 0
+    remaining = args.requests
+
+    async def client_loop():
+        nonlocal remaining, errors
+        while remaining > 0 and (keep_going is None or keep_going()):
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                res = await client.post("/v1/search", json={"sequence": random_sequence(rng)}, params={"model_id": args.model_id})
+                res.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+    return summarize(label, latencies, errors, time.perf_counter() - started)
+
+async def run(args):
+    rng = random.Random(args.seed)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+        reports = [await interactive_phase(client, args, rng, "interactive_only")]
+
+        fasta = "".join(f">bench_{i}\n{random_sequence(rng)}\n" for i in range(args.bulk_sequences))
+        res = await client.post("/v1/ingest/bulk", params={"model_id": args.model_id},
+                                files={"file": ("bench.fasta", fasta.encode(), "text/plain")})
+        res.raise_for_status()
+        job = res.json()
+
+        async def poll_job():
+            nonlocal job
+            while job["status"] in ("QUEUED", "RUNNING"):
+                await asyncio.sleep(1.0)
+                job = (await client.get(f"/v1/ingest/bulk/{job['job_id']}")).json()
+
+        poller = asyncio.create_task(poll_job())
+        # Let the bulk queue build up before measuring
+        await asyncio.sleep(args.bulk_warmup_s)
+        reports.append(await interactive_phase(client, args, rng, "interactive_during_bulk",
+                                               keep_going=lambda: job["status"] in ("QUEUED", "RUNNING")))
+        if args.wait_for_bulk:
+            await poller
+        else:
+            poller.cancel()
+        reports.append({"phase": "bulk", **{k: job[k] for k in ("status", "stored", "fallback", "stored_per_s")}})
+
+    for report in reports:
+        print(json.dumps(report))
+    if reports[0].get("p99_ms") and reports[1].get("p99_ms"):
+        print(json.dumps({"p99_ratio_during_bulk": round(reports[1]["p99_ms"] / reports[0]["p99_ms"], 2)}))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Interactive p99 with and without a concurrent bulk ingest")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--model-id", default="esm2_t33_650M_UR50D")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--bulk-sequences", type=int, default=20000)
+    parser.add_argument("--bulk-warmup-s", type=float, default=5.0)
+    parser.add_argument("--wait-for-bulk", action="store_true")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=11)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,70 @@
+# bench/quantization_recall.py
+# ANN index size against recall@k for each quantization level (candidates reranked on the fp32 column):
+#   DATABASE_URL=... python bench/quantization_recall.py --model-id esm2_t33_650M_UR50D --levels FP32 FP16 BINARY
+import os, sys, time, json, asyncio, argparse, statistics
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services', 'gateway'))
+from app.db.repository import DatabaseContext, DatabasePool
+from app.db.registry import ModelRegistry
+
+def result_keys(rows):
+    return {(r["primary_accession"], round(r["distance"], 6)) for r in rows}
+
+async def run(args):
+    db_url = os.environ["DATABASE_URL"]
+
+    async with DatabaseContext(db_url) as repo:
+        spec = await repo.get_model(args.model_id)
+        table_name, dim, configured = spec.table_name, spec.dimension, spec.quantization
+        rows = await repo.conn.fetchval(f'SELECT count(*) FROM "{table_name}"')
+        queries = [r["vector"] for r in await repo.conn.fetch(
+            f'SELECT vector FROM "{table_name}" ORDER BY random() LIMIT $1', args.queries
+        )]
+
+        # Ground truth: exact fp32 ordering, index scans disabled
+        ModelRegistry._models[args.model_id] = spec._replace(quantization="FP32")
+        truth = []
+        for vector in queries:
+            async with repo.conn.transaction():
+                await repo.conn.execute("SET LOCAL enable_indexscan = off")
+                truth.append(result_keys(await repo.find_similar(vector, args.model_id, args.k, rerank_factor=1)))
+        print(json.dumps({"model_id": args.model_id, "rows": rows, "dim": dim, "configured_level": configured}))
+
+        for level in args.levels:
+            # Side index per level, so the configured one is left untouched
+            index_name = f"bench_{table_name}_{level.lower()}"
+            started = time.perf_counter()
+            await repo.conn.execute("SELECT apply_vector_quantization($1, $2, $3, $4)", index_name, table_name, dim, level)
+            build_s = time.perf_counter() - started
+            index_bytes = await repo.conn.fetchval("SELECT pg_relation_size($1::regclass)", index_name)
+            ModelRegistry._models[args.model_id] = spec._replace(quantization=level)
+
+            for factor in args.rerank_factors:
+                recalls, latencies = [], []
+                for vector, expected in zip(queries, truth):
+                    started = time.perf_counter()
+                    found = await repo.find_similar(vector, args.model_id, args.k, rerank_factor=factor)
+                    latencies.append(time.perf_counter() - started)
+                    if expected:
+                        recalls.append(len(result_keys(found) & expected) / len(expected))
+                print(json.dumps({
+                    "level": level, "rerank_factor": factor, "k": args.k,
+                    "index_mb": round(index_bytes / 2**20, 2),
+                    "index_bytes_per_row": round(index_bytes / rows, 1) if rows else None,
+                    "build_s": round(build_s, 2),
+                    f"recall@{args.k}": round(statistics.mean(recalls), 4) if recalls else None,
+                    "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+                }))
+            if not args.keep:
+                await repo.conn.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+    await DatabasePool.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantized ANN index memory vs recall")
+    parser.add_argument("--model-id", default="esm2_t33_650M_UR50D")
+    parser.add_argument("--levels", nargs="+", default=["FP32", "FP16", "BINARY"])
+    parser.add_argument("--rerank-factors", type=int, nargs="+", default=[1, 2, 4, 10])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="Leave the side indexes in place")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,81 @@
+# bench/uniprot_ingest_check.py
+# Drives UniProtIngestor against bench/uniprot_stub.py: cursor pagination, retries on injected 503s
+# (Retry-After) and reuse of the disk cache. Exits non-zero if any check fails:
+#   python bench/uniprot_ingest_check.py --entries 1200 --limit 1000 --page-size 100 --fail-every 4
+import os, sys, json, socket, asyncio, argparse, tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services', 'gateway'))
+from uniprot_stub import StubHandler, serve
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def served():
+    with StubHandler.lock:
+        return StubHandler.requests
+
+async def run(args, base_url):
+    from app.core.uniprot import UniProtIngestor
+    UniProtIngestor.BASE_URL = base_url
+    ingestor = UniProtIngestor()
+    pages = []
+    try:
+        async for page in ingestor.iter_pages(args.query, args.limit):
+            pages.append([ingestor.parse_entry(entry) for entry in page])
+    finally:
+        await ingestor.close()
+    return pages, ingestor.stats
+
+def main(args):
+    cache_dir = tempfile.mkdtemp(prefix="helix_uniprot_cache_")
+    os.environ.update({
+        "UNIPROT_PAGE_SIZE": str(args.page_size), "UNIPROT_CACHE_DIR": cache_dir, "UNIPROT_MAX_RETRIES": str(args.max_retries),
+    })
+    port = free_port()
+    server = serve(port, args.entries, 0.0, args.fail_every, args.seed)
+    base_url = f"http://127.0.0.1:{port}/uniprotkb/search"
+
+    expected_entries = min(args.limit, args.entries)
+    expected_pages = -(-expected_entries // args.page_size)
+    checks = {}
+
+    pages, stats = asyncio.run(run(args, base_url))
+    network_requests = served()
+    entries = [entry for page in pages for entry in page]
+    accessions = [entry["accession"] for entry in entries]
+    checks["pages"] = (len(pages), expected_pages)
+    checks["entries"] = (len(entries), expected_entries)
+    checks["unique_accessions"] = (len(set(accessions)), expected_entries)
+    checks["parsed_sequences"] = (sum(1 for entry in entries if entry["sequence"]), expected_entries)
+    # Every injected 503 was retried, and nothing else was requested
+    checks["retries"] = (stats["retries"], network_requests - stats["pages"])
+    checks["retried_at_least_once"] = (stats["retries"] > 0, args.fail_every > 0 and network_requests >= args.fail_every)
+
+    cached_pages, cached_stats = asyncio.run(run(args, base_url))
+    cached_accessions = [entry["accession"] for page in cached_pages for entry in page]
+    checks["cache_hits"] = (cached_stats["cache_hits"], 1)
+    checks["cache_network_requests"] = (served() - network_requests, 0)
+    checks["cache_entries_match"] = (cached_accessions == accessions, True)
+    server.shutdown()
+
+    failed = [name for name, (got, want) in checks.items() if got != want]
+    print(json.dumps({
+        "stats": stats, "network_requests": network_requests,
+        "checks": {name: {"got": got, "want": want} for name, (got, want) in checks.items()},
+    }))
+    if failed:
+        print(json.dumps({"failed": failed}))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="UniProtIngestor pagination, retry and cache checks against the local stub")
+    parser.add_argument("--entries", type=int, default=1200)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--fail-every", type=int, default=4, help="stub answers every Nth request with 503")
+    parser.add_argument("--max-retries", type=int, default=4)
+    parser.add_argument("--query", default="*")
+    parser.add_argument("--seed", type=int, default=3)
+    main(parser.parse_args())
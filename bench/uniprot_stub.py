@@ -0,0 +1,89 @@
+# bench/uniprot_stub.py
+# Local stand-in for the UniProt search API: deterministic entries, Link-header cursor pages, and
+# optional latency / injected 503s to exercise the ingestor's retries. Point the gateway at it with
+#   python bench/uniprot_stub.py --port 8089 --entries 5000 --fail-every 7
+#   UNIPROT_BASE_URL=http://localhost:8089/uniprotkb/search
+import json, time, zlib, random, argparse, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, urlencode
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+def make_entry(i, rng):
+    length = rng.randint(60, 600)
+    return {
+        "primaryAccession": f"S{i:07d}",
+        "proteinDescription": {"recommendedName": {"fullName": {"value": f"Stub protein {i}"}}},
+        "organism": {"scientificName": rng.choice(["Homo sapiens", "Mus musculus", "Escherichia coli"])},
+        "sequence": {"value": "".join(rng.choice(AMINO_ACIDS) for _ in range(length)), "length": length},
+        "comments": [{"commentType": "FUNCTION", "texts": [{"value": f"Synthetic function {i}."}]}],
+        "features": [{"type": "Binding site", "description": "stub ligand", "location": {"start": {"value": rng.randint(1, length)}}}],
+        "uniProtKBCrossReferences": [{"database": "PDB", "id": f"{i % 10}S{i % 100:02d}"}] if i % 3 == 0 else [],
+    }
+
+class StubHandler(BaseHTTPRequestHandler):
+    entries = []
+    latency_s = 0.0
+    fail_every = 0
+    requests = 0  # answered so far, 503s included
+    lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/uniprotkb/search":
+            return self._send(404, {"messages": ["not found"]})
+        with self.lock:
+            StubHandler.requests += 1
+            n = StubHandler.requests
+        if self.fail_every and n % self.fail_every == 0:
+            return self._send(503, {"messages": ["stub overload"]}, {"Retry-After": "0.1"})
+        time.sleep(self.latency_s)
+
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        size = min(int(params.get("size", 25)), 500)
+        start = int(params.get("cursor", 0))
+        # "*" matches everything; any other query deterministically selects half the entries
+        query = params.get("query", "*")
+        matching = [e for e in self.entries if query in ("*", "") or zlib.crc32(query.encode()) % 2 == int(e["primaryAccession"][1:]) % 2]
+        page = matching[start:start + size]
+        headers = {"X-Total-Results": str(len(matching))}
+        if start + size < len(matching):
+            host = self.headers.get("Host")
+            headers["Link"] = f'<http://{host}{url.path}?{urlencode({**params, "cursor": start + size})}>; rel="next"'
+        self._send(200, {"results": page}, headers)
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, fmt, *args):
+        pass
+
+def serve(port, entries=1000, latency_s=0.0, fail_every=0, seed=3):
+    rng = random.Random(seed)
+    StubHandler.entries = [make_entry(i, rng) for i in range(entries)]
+    StubHandler.latency_s, StubHandler.fail_every, StubHandler.requests = latency_s, fail_every, 0
+    server = ThreadingHTTPServer(("0.0.0.0", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub UniProt search API with cursor pagination")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--entries", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every Nth request with 503")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+    server = serve(args.port, args.entries, args.latency_ms / 1000.0, args.fail_every, args.seed)
+    print(f"UniProt stub on http://localhost:{args.port}/uniprotkb/search ({args.entries} entries)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -5,16 +5,22 @@ CREATE EXTENSION IF NOT EXISTS vector;
 -- Cleanup
 DROP TABLE IF EXISTS vectors_esm2_650m CASCADE;
 DROP TABLE IF EXISTS vectors_esm2_8m CASCADE;
+DROP TABLE IF EXISTS backfill_jobs CASCADE;
 DROP TABLE IF EXISTS embedding_metadata CASCADE;
 DROP TABLE IF EXISTS models CASCADE;
 
 -- Model Registry
+-- Drives routing in the gateway: one row per model, its own vector table and ANN index.
+-- Register a model with a plain INSERT; the trigger below creates its storage and notifies the gateways.
 CREATE TABLE models (
     model_id VARCHAR(50) PRIMARY KEY,
     family VARCHAR(50),
     parameters_count BIGINT,
     vector_dimension INTEGER NOT NULL,
-    quantization_level VARCHAR(10) DEFAULT 'FP32',
+    quantization_level VARCHAR(10) DEFAULT 'FP32', -- FP32 | FP16 | BINARY (opt-in), see apply_vector_quantization
+    table_name VARCHAR(63) UNIQUE NOT NULL,
+    worker_pool VARCHAR(20) NOT NULL DEFAULT 'local', -- local (gateway process pool) | remote (TitanCache workers)
+    checkpoint VARCHAR(255), -- Hugging Face checkpoint, defaults to facebook/<model_id>
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -25,8 +31,9 @@ CREATE TABLE embedding_metadata (
     primary_accession VARCHAR(20),
     protein_name VARCHAR(255),
     organism VARCHAR(100),
-    confidence_score FLOAT DEFAULT NULL, 
+    confidence_score FLOAT DEFAULT NULL,
     is_fallback BOOLEAN DEFAULT FALSE,
+    requested_model_id VARCHAR(50) REFERENCES models(model_id), -- set on fallback rows: the model to upgrade to
     sequence_text TEXT NOT NULL,
     function_text TEXT,
     binding_sites JSONB DEFAULT '[]'::jsonb,
@@ -35,24 +42,98 @@ CREATE TABLE embedding_metadata (
     UNIQUE (sequence_hash, model_id)
 );
 
--- Vector Tables
-CREATE TABLE vectors_esm2_8m (
-    metadata_id INTEGER PRIMARY KEY REFERENCES embedding_metadata(id) ON DELETE CASCADE,
-    vector vector(320)
-);
+-- ANN index per quantization level. The vector column itself stays fp32 so candidates
+-- from a compact index can be reranked at full precision.
+-- FP16: halfvec HNSW. BINARY: 1 bit per dimension, Hamming HNSW.
+-- INT8 is rejected: pgvector has no int8 vector type, and a halfvec index would only give FP16's 2x.
+-- The gateway's in-process index has its own int8 mode (VECTOR_INDEX_DTYPE=int8).
+CREATE OR REPLACE FUNCTION apply_vector_quantization(p_index TEXT, p_table TEXT, p_dim INTEGER, p_level TEXT) RETURNS VOID AS $$
+BEGIN
+    IF p_level NOT IN ('FP32', 'FP16', 'BINARY') THEN
+        RAISE EXCEPTION 'Unsupported quantization_level % for %: expected FP32, FP16 or BINARY (pgvector has no int8 vector type)', p_level, p_table;
+    END IF;
+    EXECUTE format('DROP INDEX IF EXISTS %I', p_index);
+    IF p_level = 'BINARY' THEN
+        EXECUTE format('CREATE INDEX %I ON %I USING hnsw ((binary_quantize(vector)::bit(%s)) bit_hamming_ops)', p_index, p_table, p_dim);
+    ELSIF p_level = 'FP16' THEN
+        EXECUTE format('CREATE INDEX %I ON %I USING hnsw ((vector::halfvec(%s)) halfvec_cosine_ops)', p_index, p_table, p_dim);
+    ELSE
+        EXECUTE format('CREATE INDEX %I ON %I USING hnsw (vector vector_cosine_ops)', p_index, p_table);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Vector Tables, one per registered model
+-- organism / confidence_score / is_fallback are copies of embedding_metadata so search filters
+-- are evaluated on the rows coming out of the HNSW scan, without a join per candidate.
+-- Selective organism filters are cheaper as an exact B-tree lookup than as a filtered HNSW walk.
+-- updated_at moves whenever the vector is (re)written: the gateway's in-memory index catches up on it at startup.
+CREATE OR REPLACE FUNCTION ensure_model_storage() RETURNS TRIGGER AS $$
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I (
+            metadata_id INTEGER PRIMARY KEY REFERENCES embedding_metadata(id) ON DELETE CASCADE,
+            vector vector(%s),
+            organism VARCHAR(100),
+            confidence_score FLOAT,
+            is_fallback BOOLEAN DEFAULT FALSE,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )', NEW.table_name, NEW.vector_dimension);
+    EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON %I(organism)', 'idx_' || NEW.table_name || '_organism', NEW.table_name);
+    EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON %I(updated_at, metadata_id)', 'idx_' || NEW.table_name || '_updated', NEW.table_name);
+    IF TG_OP = 'INSERT' OR NEW.quantization_level IS DISTINCT FROM OLD.quantization_level THEN
+        PERFORM apply_vector_quantization('idx_' || NEW.table_name || '_ann', NEW.table_name, NEW.vector_dimension, NEW.quantization_level);
+    END IF;
+    PERFORM pg_notify('helix_models', NEW.model_id);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_ensure_model_storage
+AFTER INSERT OR UPDATE OF vector_dimension, quantization_level, table_name, worker_pool, checkpoint ON models
+FOR EACH ROW EXECUTE FUNCTION ensure_model_storage();
+
+-- Keep the denormalized filter columns in step with later metadata updates
+CREATE OR REPLACE FUNCTION sync_vector_filters() RETURNS TRIGGER AS $$
+DECLARE
+    v_table TEXT;
+BEGIN
+    SELECT table_name INTO v_table FROM models WHERE model_id = NEW.model_id;
+    EXECUTE format(
+        'UPDATE %I SET organism = $1, confidence_score = $2, is_fallback = $3 WHERE metadata_id = $4', v_table
+    ) USING NEW.organism, NEW.confidence_score, NEW.is_fallback, NEW.id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
 
-CREATE TABLE vectors_esm2_650m (
-    metadata_id INTEGER PRIMARY KEY REFERENCES embedding_metadata(id) ON DELETE CASCADE,
-    vector vector(1280)
+CREATE TRIGGER trg_sync_vector_filters
+AFTER UPDATE OF organism, confidence_score, is_fallback ON embedding_metadata
+FOR EACH ROW EXECUTE FUNCTION sync_vector_filters();
+
+-- Re-embedding backfills (see app/core/backfill.py)
+-- One row per job; last_id is the keyset checkpoint over embedding_metadata.id, advanced in the same
+-- transaction that writes each batch, so a restarted job neither skips nor repeats work.
+CREATE TABLE backfill_jobs (
+    job_id CHAR(32) PRIMARY KEY,
+    model_id VARCHAR(50) NOT NULL REFERENCES models(model_id),
+    mode VARCHAR(10) NOT NULL DEFAULT 'missing', -- missing: sequences without a vector for model_id | all: recompute every one
+    status VARCHAR(20) NOT NULL DEFAULT 'QUEUED', -- QUEUED | RUNNING | PAUSED | COMPLETED | FAILED
+    last_id INTEGER NOT NULL DEFAULT 0,
+    scanned BIGINT NOT NULL DEFAULT 0,
+    stored BIGINT NOT NULL DEFAULT 0,
+    fallback_skipped BIGINT NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Indexing
-CREATE INDEX idx_vec_8m ON vectors_esm2_8m USING hnsw (vector vector_cosine_ops);
-CREATE INDEX idx_vec_650m ON vectors_esm2_650m USING hnsw (vector vector_cosine_ops);
 CREATE INDEX idx_meta_accession ON embedding_metadata(primary_accession);
 CREATE INDEX idx_meta_organism ON embedding_metadata(organism);
+-- Only fallback rows, so the reconciler's scan stays cheap however large the table grows
+CREATE INDEX idx_meta_fallback ON embedding_metadata(id) WHERE is_fallback;
 
 -- Seed Models
-INSERT INTO models (model_id, family, parameters_count, vector_dimension) VALUES 
-('esm2_t6_8M_UR50D', 'esm2', 8000000, 320), 
-('esm2_t33_650M_UR50D', 'esm2', 650000000, 1280);
\ No newline at end of file
+INSERT INTO models (model_id, family, parameters_count, vector_dimension, quantization_level, table_name, worker_pool) VALUES
+('esm2_t6_8M_UR50D', 'esm2', 8000000, 320, 'FP32', 'vectors_esm2_8m', 'local'),
+('esm2_t33_650M_UR50D', 'esm2', 650000000, 1280, 'FP32', 'vectors_esm2_650m', 'remote');
@@ -0,0 +1,173 @@
+# services/gateway/app/core/backfill.py
+# Resumable re-embedding: walks embedding_metadata in keyset pages, embeds each sequence with the target
+# model (TitanCache BULK lane for remote models, the local pool otherwise) and writes vectors back in
+# bulk. Progress lives in backfill_jobs, so a restarted gateway picks a job up where it stopped.
+import os, json, uuid, asyncio, logging
+from typing import Dict, Optional
+from app.db.repository import DatabaseContext, DatabasePool
+from app.db.registry import ModelRegistry
+
+logger = logging.getLogger("Backfill")
+
+MODES = ("missing", "all")
+
+def _json(value):
+    return json.loads(value) if isinstance(value, str) else (value or [])
+
+def source_data(row):
+    # embedding_metadata row -> the biological_data dict the repository writes take
+    return {
+        "sequence": row["sequence_text"], "accession": row["primary_accession"], "name": row["protein_name"],
+        "organism": row["organism"], "function": row["function_text"],
+        "annotations": _json(row["binding_sites"]), "pdb_ids": _json(row["pdb_ids"]),
+    }
+
+class BackfillManager:
+    def __init__(self, orchestrator):
+        self.orchestrator = orchestrator
+        self.page_size = int(os.getenv("BACKFILL_PAGE_SIZE", "2000"))
+        self.batch_size = int(os.getenv("BACKFILL_BATCH_SIZE", "256"))
+        self.tasks: Dict[str, asyncio.Task] = {}
+
+    def _db(self):
+        return DatabaseContext(self.orchestrator.db_url)
+
+    async def resume_interrupted(self):
+        # QUEUED/RUNNING rows were cut short by a restart (or belong to another gateway, see _run)
+        async with self._db() as repo:
+            jobs = await repo.list_backfill_jobs(("QUEUED", "RUNNING"))
+        for job in jobs:
+            logger.info(f"Resuming backfill {job['job_id']} for {job['model_id']} after id {job['last_id']}")
+            self._launch(job["job_id"])
+
+    async def start(self, model_id: str, mode: str = "missing"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown backfill mode {mode!r}, expected one of {', '.join(MODES)}")
+        ModelRegistry.get(model_id)
+        async with self._db() as repo:
+            job = await repo.create_backfill_job(uuid.uuid4().hex, model_id, mode)
+        self._launch(job["job_id"])
+        return await self.get(job["job_id"])
+
+    async def pause(self, job_id: str):
+        task = self.tasks.get(job_id)
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        job = await self.get(job_id)
+        if job and job["status"] in ("QUEUED", "RUNNING"):
+            async with self._db() as repo:
+                await repo.set_backfill_status(job_id, "PAUSED")
+            job = await self.get(job_id)
+        return job
+
+    async def resume(self, job_id: str):
+        job = await self.get(job_id)
+        if job and job["status"] in ("PAUSED", "FAILED"):
+            async with self._db() as repo:
+                await repo.set_backfill_status(job_id, "QUEUED")
+            self._launch(job_id)
+            job = await self.get(job_id)
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        async with self._db() as repo:
+            job = await repo.get_backfill_job(job_id)
+        return job and job | {"running_here": job_id in self.tasks}
+
+    async def list(self):
+        async with self._db() as repo:
+            return [job | {"running_here": job["job_id"] in self.tasks} for job in await repo.list_backfill_jobs()]
+
+    async def close(self):
+        # Status stays RUNNING on purpose: the next startup resumes from the last checkpoint
+        for task in list(self.tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+    def _launch(self, job_id: str):
+        if job_id in self.tasks: return
+        task = asyncio.create_task(self._run(job_id))
+        self.tasks[job_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(job_id, None))
+
+    async def _run(self, job_id: str):
+        pool = await DatabasePool.get_pool(self.orchestrator.db_url)
+        async with pool.acquire() as lock_conn:
+            # One runner per job across gateways. The session lock goes away with this connection,
+            # so a crashed gateway never leaves the job locked.
+            if not await lock_conn.fetchval("SELECT pg_try_advisory_lock(hashtext($1))", f"backfill:{job_id}"):
+                logger.info(f"Backfill {job_id} is running on another gateway")
+                return
+            try:
+                await self._execute(job_id)
+            finally:
+                await lock_conn.execute("SELECT pg_advisory_unlock(hashtext($1))", f"backfill:{job_id}")
+
+    async def _execute(self, job_id: str):
+        async with self._db() as repo:
+            job = await repo.get_backfill_job(job_id)
+            await repo.set_backfill_status(job_id, "RUNNING")
+
+        # scan -> embed -> write, bounded like the bulk ingest so the scan never runs far ahead
+        to_embed, to_write = asyncio.Queue(maxsize=2), asyncio.Queue(maxsize=2)
+        stages = [
+            asyncio.create_task(self._scan_stage(job, to_embed)),
+            asyncio.create_task(self._embed_stage(job, to_embed, to_write)),
+            asyncio.create_task(self._write_stage(job, to_write)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+            async with self._db() as repo:
+                await repo.set_backfill_status(job_id, "COMPLETED")
+            logger.info(f"Backfill {job_id} for {job['model_id']} completed")
+        except asyncio.CancelledError:
+            for stage in stages: stage.cancel()
+            raise
+        except Exception as e:
+            for stage in stages: stage.cancel()
+            logger.error(f"Backfill {job_id} failed: {e}")
+            async with self._db() as repo:
+                await repo.set_backfill_status(job_id, "FAILED", str(e))
+
+    async def _scan_stage(self, job, out_queue):
+        after_id = job["last_id"]
+        while True:
+            async with self._db() as repo:
+                rows, page_end = await repo.backfill_sources(job["model_id"], after_id, job["mode"], self.page_size)
+            if page_end is None: break
+            # Each batch carries the id the checkpoint may advance to once it is written
+            for i in range(0, len(rows), self.batch_size):
+                chunk = rows[i:i + self.batch_size]
+                await out_queue.put((chunk, page_end if i + self.batch_size >= len(rows) else chunk[-1]["id"]))
+            if not rows:
+                await out_queue.put(([], page_end))
+            after_id = page_end
+        await out_queue.put(None)
+
+    async def _embed_stage(self, job, in_queue, out_queue):
+        model_id = job["model_id"]
+        while (item := await in_queue.get()) is not None:
+            rows, last_id = item
+            records, fallback = [], 0
+            if rows:
+                results = await self.orchestrator._compute_vectors_bulk(
+                    [(row["sequence_hash"], row["sequence_text"]) for row in rows], model_id)
+                for row, (vector, active_model, confidence) in zip(rows, results):
+                    # A fallback vector belongs to another model: leave the row for a later "missing" run
+                    if active_model != model_id:
+                        fallback += 1
+                        continue
+                    records.append((row["sequence_hash"], model_id, vector, source_data(row), confidence, model_id))
+                if not records:
+                    # Nothing reached the target model (its workers are down): stop before the checkpoint moves
+                    raise RuntimeError(f"no {model_id} vectors for ids up to {last_id}, workers unavailable")
+            await out_queue.put((records, last_id, len(rows), fallback))
+        await out_queue.put(None)
+
+    async def _write_stage(self, job, in_queue):
+        while (item := await in_queue.get()) is not None:
+            records, last_id, scanned, fallback = item
+            async with self._db() as repo:
+                stored = await repo.store_backfill_batch(job["job_id"], records, last_id, scanned, fallback)
+            self.orchestrator._index_stored(stored)
@@ -0,0 +1,172 @@
+# services/gateway/app/core/bulk.py
+import os, re, time, uuid, asyncio, hashlib, logging
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.db.repository import DatabaseContext
+
+logger = logging.getLogger("BulkIngest")
+
+def _iter_lines(handle, chunk_size: int) -> Iterator[str]:
+    tail = ""
+    while chunk := handle.read(chunk_size):
+        lines = (tail + chunk).split("\n")
+        tail = lines.pop()
+        yield from lines
+    if tail:
+        yield tail
+
+def iter_fasta(handle, chunk_size: int = 1 << 20) -> Iterator[Tuple[str, str]]:
+    # Incremental: never holds more than one record plus one chunk in memory
+    header, parts = None, []
+    for line in _iter_lines(handle, chunk_size):
+        line = line.strip()
+        if line.startswith(">"):
+            if header is not None: yield header, "".join(parts)
+            header, parts = line[1:].strip(), []
+        elif line and header is not None:
+            parts.append(line)
+    if header is not None:
+        yield header, "".join(parts)
+
+def parse_header(header: str, seq_hash: str) -> Dict[str, str]:
+    # UniProt style: sp|P69905|HBA_HUMAN Hemoglobin subunit alpha OS=Homo sapiens OX=9606 ...
+    ident, _, description = header.partition(" ")
+    fields = ident.split("|")
+    accession = fields[1] if len(fields) >= 3 and fields[0] in ("sp", "tr") else ident
+    organism = re.search(r"\bOS=(.+?)(?:\s+[A-Z]{2}=|$)", description)
+    name = re.split(r"\s+[A-Z]{2}=", description)[0].strip()
+    return {
+        "accession": (accession or f"MAN-{seq_hash[:8]}")[:20],
+        "name": (name or "Bulk Ingestion")[:255],
+        "organism": (organism.group(1) if organism else "User Defined")[:100],
+    }
+
+class BulkIngestJob:
+    def __init__(self, model_id: str):
+        self.id = uuid.uuid4().hex
+        self.model_id = model_id
+        self.status = "QUEUED"
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.parsed = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.embedded = 0
+        self.stored = 0
+        self.fallback = 0
+
+    def to_dict(self):
+        elapsed = (self.finished_at or time.time()) - self.created_at
+        return {
+            "job_id": self.id,
+            "model_id": self.model_id,
+            "status": self.status,
+            "error": self.error,
+            "parsed": self.parsed,
+            "invalid": self.invalid,
+            "duplicates": self.duplicates,
+            "embedded": self.embedded,
+            "stored": self.stored,
+            "fallback": self.fallback,
+            "elapsed_s": round(elapsed, 2),
+            "stored_per_s": round(self.stored / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+class BulkIngestPipeline:
+    def __init__(self, orchestrator):
+        self.orchestrator = orchestrator
+        self.batch_size = int(os.getenv("BULK_BATCH_SIZE", "256"))
+        self.write_batch_size = int(os.getenv("BULK_WRITE_BATCH_SIZE", "1000"))
+        self.jobs: Dict[str, BulkIngestJob] = {}
+        self.tasks = set()
+
+    def submit(self, path: str, model_id: str) -> BulkIngestJob:
+        job = BulkIngestJob(model_id)
+        self.jobs[job.id] = job
+        task = asyncio.create_task(self._run(job, path))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[BulkIngestJob]:
+        return self.jobs.get(job_id)
+
+    async def _run(self, job: BulkIngestJob, path: str):
+        job.status = "RUNNING"
+        # parse/dedupe -> embed -> write, each stage bounded so a fast parser cannot run ahead unboundedly
+        to_embed, to_write = asyncio.Queue(maxsize=2), asyncio.Queue(maxsize=2)
+        stages = [
+            asyncio.create_task(self._parse_stage(job, path, to_embed)),
+            asyncio.create_task(self._embed_stage(job, to_embed, to_write)),
+            asyncio.create_task(self._write_stage(job, to_write)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+            job.status = "COMPLETED"
+        except Exception as e:
+            for stage in stages: stage.cancel()
+            logger.error(f"Bulk job {job.id} failed: {e}")
+            job.status, job.error = "FAILED", str(e)
+        finally:
+            job.finished_at = time.time()
+            os.unlink(path)
+
+    async def _parse_stage(self, job, path, out_queue):
+        seen = set()
+        with open(path, "r", encoding="utf-8", errors="replace") as handle:
+            records = iter_fasta(handle)
+            while True:
+                raw = await asyncio.to_thread(lambda: [r for _, r in zip(range(self.batch_size), records)])
+                if not raw: break
+                batch = []
+                for header, sequence in raw:
+                    job.parsed += 1
+                    try:
+                        clean_seq = self.orchestrator._clean_sequence(sequence)
+                    except ValueError:
+                        job.invalid += 1
+                        continue
+                    seq_hash = hashlib.sha256(clean_seq.encode()).hexdigest()
+                    if seq_hash in seen:
+                        job.duplicates += 1
+                        continue
+                    seen.add(seq_hash)
+                    batch.append((seq_hash, clean_seq, header))
+                batch = await self._drop_existing(job, batch)
+                if batch: await out_queue.put(batch)
+        await out_queue.put(None)
+
+    async def _drop_existing(self, job, batch):
+        if not batch: return batch
+        async with DatabaseContext(self.orchestrator.db_url) as repo:
+            existing = await repo.existing_hashes([h for h, _, _ in batch], job.model_id)
+        job.duplicates += len(existing)
+        return [item for item in batch if item[0] not in existing]
+
+    async def _embed_stage(self, job, in_queue, out_queue):
+        while (batch := await in_queue.get()) is not None:
+            results = await self.orchestrator._compute_vectors_bulk([(h, s) for h, s, _ in batch], job.model_id)
+            records = []
+            for (seq_hash, clean_seq, header), (vector, active_model, confidence) in zip(batch, results):
+                data = parse_header(header, seq_hash)
+                data.update({"sequence": clean_seq, "function": "Bulk ingested sequence.", "annotations": [], "pdb_ids": []})
+                job.fallback += active_model != job.model_id
+                records.append((seq_hash, active_model, vector, data, confidence, job.model_id))
+            job.embedded += len(records)
+            await out_queue.put(records)
+        await out_queue.put(None)
+
+    async def _write_stage(self, job, in_queue):
+        pending: List[tuple] = []
+        while True:
+            records = await in_queue.get()
+            if records is not None:
+                pending.extend(records)
+            while pending and (len(pending) >= self.write_batch_size or records is None):
+                chunk, pending = pending[:self.write_batch_size], pending[self.write_batch_size:]
+                async with DatabaseContext(self.orchestrator.db_url) as repo:
+                    stored = await repo.store_rich_embeddings_bulk(chunk)
+                self.orchestrator._index_stored(stored)
+                # Rows actually written: duplicate keys within a chunk collapse in the upsert
+                job.stored += len(stored)
+            if records is None: break
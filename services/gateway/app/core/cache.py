@@ -0,0 +1,31 @@
+# services/gateway/app/core/cache.py
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+class EmbeddingCache:
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self.entries.get(key)
+        if item is None: return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self.entries)
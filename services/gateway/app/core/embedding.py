@@ -0,0 +1,133 @@
+# services/gateway/app/core/embedding.py
+# Shared by the gateway fallback and the inference worker so local and remote vectors match.
+import os, logging
+import torch
+from transformers import AutoTokenizer, AutoModel, AutoModelForMaskedLM
+
+AMINO_ACIDS = 20
+# MODE picks the inference backend; bench/inference_backends.py measures parity and speed of each
+BACKENDS = ("eager", "bf16", "compile", "int8", "onnx")
+LEGACY_MODES = {"cpu": "eager"}
+
+def backend_from_env() -> str:
+    mode = os.getenv("MODE", "eager").lower()
+    mode = LEGACY_MODES.get(mode, mode)
+    if mode not in BACKENDS:
+        raise ValueError(f"Unknown MODE {mode!r}, expected one of {', '.join(BACKENDS)}")
+    return mode
+
+class _EncoderWithHead(torch.nn.Module):
+    # Single graph for ONNX export: hidden states plus (optionally) the MLM logits
+    def __init__(self, encoder, lm_head):
+        super().__init__()
+        self.encoder, self.lm_head = encoder, lm_head
+
+    def forward(self, input_ids, attention_mask):
+        hidden = self.encoder(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+        return (hidden, self.lm_head(hidden)) if self.lm_head is not None else hidden
+
+class EmbeddingEngine:
+    def __init__(self, model_name: str, device=None, with_confidence: bool = False, backend: str = None):
+        self.backend = backend or backend_from_env()
+        self.device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        if self.backend in ("int8", "onnx") and self.device.type != "cpu":
+            # Dynamic quantization and the CPU execution provider only run on the host
+            logging.warning(f"{self.backend} backend runs on CPU, ignoring device {self.device}")
+            self.device = torch.device("cpu")
+        self.with_confidence = with_confidence
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        # The MLM head is only needed for the entropy confidence, otherwise run the bare encoder
+        if with_confidence:
+            mlm = AutoModelForMaskedLM.from_pretrained(model_name)
+            self.encoder, self.lm_head = mlm.base_model, mlm.lm_head
+        else:
+            self.encoder, self.lm_head = AutoModel.from_pretrained(model_name, add_pooling_layer=False), None
+
+        self.encoder.eval().to(self.device)
+        if self.lm_head is not None:
+            self.lm_head.eval().to(self.device)
+        self.hidden_size = self.encoder.config.hidden_size
+
+        self.session = None
+        if self.backend == "int8":
+            # Linear layers carry nearly all of the FLOPs; weights int8, activations quantized on the fly
+            self.encoder = torch.ao.quantization.quantize_dynamic(self.encoder, {torch.nn.Linear}, dtype=torch.qint8)
+            if self.lm_head is not None:
+                self.lm_head = torch.ao.quantization.quantize_dynamic(self.lm_head, {torch.nn.Linear}, dtype=torch.qint8)
+        elif self.backend == "compile":
+            # Batch and sequence length vary per bucket: compile once for dynamic shapes instead of per shape
+            self.encoder = torch.compile(self.encoder, dynamic=True)
+        elif self.backend == "onnx":
+            self.session = self._onnx_session(model_name)
+
+    def _onnx_session(self, model_name):
+        import onnxruntime as ort
+        cache_dir = os.getenv("ONNX_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "helix", "onnx"))
+        path = os.path.join(cache_dir, f"{model_name.replace('/', '__')}{'-mlm' if self.lm_head is not None else ''}.onnx")
+        if not os.path.exists(path):
+            os.makedirs(cache_dir, exist_ok=True)
+            logging.info(f"Exporting {model_name} to {path}")
+            sample = self.tokenize(["MKTAYIAKQR", "MKT"])
+            outputs = ["hidden", "logits"] if self.lm_head is not None else ["hidden"]
+            axes = {"input_ids": {0: "batch", 1: "seq"}, "attention_mask": {0: "batch", 1: "seq"}}
+            axes.update({name: {0: "batch", 1: "seq"} for name in outputs})
+            # Export to a temp name first so a crashed export never leaves a half-written model behind
+            torch.onnx.export(_EncoderWithHead(self.encoder, self.lm_head), (sample["input_ids"], sample["attention_mask"]),
+                              path + ".tmp", input_names=["input_ids", "attention_mask"], output_names=outputs,
+                              dynamic_axes=axes, opset_version=17)
+            os.replace(path + ".tmp", path)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = torch.get_num_threads()
+        return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    @property
+    def dimension(self) -> int:
+        return self.hidden_size
+
+    def tokenize(self, sequences):
+        return self.tokenizer(list(sequences), return_tensors="pt", padding=True, return_special_tokens_mask=True)
+
+    def embed(self, sequences):
+        return self.embed_tokens(self.tokenize(sequences))
+
+    def _forward(self, input_ids, attention_mask):
+        if self.session is not None:
+            feeds = {"input_ids": input_ids.numpy(), "attention_mask": attention_mask.numpy()}
+            outputs = [torch.from_numpy(output) for output in self.session.run(None, feeds)]
+            return outputs[0], (outputs[1] if self.lm_head is not None else None)
+
+        if self.backend == "bf16":
+            with torch.autocast(device_type=self.device.type, dtype=torch.bfloat16):
+                hidden = self.encoder(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+                logits = self.lm_head(hidden) if self.lm_head is not None else None
+            # Pool in fp32: summing hundreds of bf16 residues loses more than the matmuls do
+            return hidden.float(), logits
+
+        hidden = self.encoder(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+        return hidden, (self.lm_head(hidden) if self.lm_head is not None else None)
+
+    def embed_tokens(self, inputs):
+        # Pool over residues only: drop padding and the BOS/EOS special tokens
+        residue_mask = inputs["attention_mask"] * (1 - inputs["special_tokens_mask"])
+        residue_mask = residue_mask.to(self.device)
+
+        with torch.inference_mode():
+            hidden, logits = self._forward(inputs["input_ids"].to(self.device), inputs["attention_mask"].to(self.device))
+            weights = residue_mask.unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * weights).sum(dim=1) / weights.sum(dim=1).clamp(min=1)
+            vectors = torch.nn.functional.normalize(pooled.float(), p=2, dim=1)
+
+            confidences = None
+            if logits is not None:
+                confidences = self._confidence(logits, residue_mask)
+
+        return vectors.cpu(), confidences
+
+    @staticmethod
+    def _confidence(logits, residue_mask):
+        log_probs = torch.log_softmax(logits.float(), dim=-1)
+        entropy = -(log_probs.exp() * log_probs).sum(dim=-1)
+        normalized = 1.0 - entropy / torch.log(torch.tensor(float(AMINO_ACIDS)))
+        mask = residue_mask.to(normalized.dtype)
+        return ((normalized * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)).tolist()
@@ -0,0 +1,222 @@
+# services/gateway/app/core/inference_pool.py
+import os, time, asyncio, logging, threading, itertools
+import multiprocessing as mp
+from typing import List
+
+logger = logging.getLogger("LocalInferencePool")
+
+WARMUP_SEQUENCE = "MKTAYIAKQRQISFVKSHFSRQLEERLGLIEVQAPILSRVGDGTQDNLSGAEKAVQVKVKALPDAQFEVVHSLAKWKRQTLGQHDFSAGEGLYTHMKALRPDEDRLSPLHSVYVDQWDWERVMGDGERQFSTLKSTVEAIWAGIKATEAAVSEEFGLAPFLPDQIHFVHSQELLSRYPDLDAKGRERAIAKDLGAVFLVGIGGKLSDGHRHDVRAPDYDDW"
+
+def _process_main(index, model_name, threads, task_queue, result_queue):
+    # Runs in a spawned child: its own interpreter, its own GIL, its own copy of the model
+    started = time.perf_counter()
+    try:
+        import torch
+        from app.core.embedding import EmbeddingEngine
+        torch.set_num_threads(threads)
+        engine = EmbeddingEngine(model_name, device=torch.device("cpu"))
+        engine.embed([WARMUP_SEQUENCE])
+    except Exception as e:
+        # Report instead of dying silently, so start() fails with the reason rather than hanging
+        result_queue.put(("failed", index, None, repr(e)))
+        return
+    result_queue.put(("ready", index, None, time.perf_counter() - started))
+
+    while True:
+        job = task_queue.get()
+        if job is None: break
+        batch_id, sequences = job
+        try:
+            # Sort by length so the padded batch wastes as little compute as possible
+            order = sorted(range(len(sequences)), key=lambda i: len(sequences[i]))
+            vectors, _ = engine.embed([sequences[i] for i in order])
+            vectors = vectors.numpy()
+            restored = [None] * len(sequences)
+            for row, i in enumerate(order):
+                restored[i] = vectors[row]
+            result_queue.put(("done", index, batch_id, restored))
+        except Exception as e:
+            result_queue.put(("error", index, batch_id, repr(e)))
+
+class LocalInferencePool:
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.processes = int(os.getenv("LOCAL_INFERENCE_PROCESSES", "2"))
+        self.max_batch = int(os.getenv("LOCAL_BATCH_SIZE", "16"))
+        self.max_wait = float(os.getenv("LOCAL_BATCH_WAIT_MS", "5")) / 1000.0
+        self.timeout = float(os.getenv("LOCAL_INFERENCE_TIMEOUT_S", "60"))
+        self.threads = int(os.getenv("LOCAL_THREADS_PER_PROCESS", str(max(1, (os.cpu_count() or 1) // self.processes))))
+        # Covers a first-run checkpoint download as well as the load and warmup
+        self.start_timeout = float(os.getenv("LOCAL_POOL_START_TIMEOUT_S", "600"))
+
+        # One inbox per child so the pool knows which batches a crashed child took down with it
+        self.ctx = mp.get_context("spawn")
+        self.task_queues = [self.ctx.Queue() for _ in range(self.processes)]
+        self.result_queue = self.ctx.Queue()
+        self.workers = [None] * self.processes
+        self.assigned = [set() for _ in range(self.processes)]
+        self.child_ready = [False] * self.processes
+
+        self.loop = None
+        self.pending = None
+        self.in_flight = {}
+        self.batch_ids = itertools.count()
+        self.slots = None
+        self.ready = asyncio.Event()
+        self.dispatcher = None
+        self.reader = None
+        self.monitor = None
+        self.load_error = None
+
+        self.warmup_seconds = {}
+        self.started_at = None
+        self.batches = 0
+        self.sequences = 0
+        self.restarts = 0
+
+    def _spawn(self, index):
+        self.workers[index] = self.ctx.Process(
+            target=_process_main, args=(index, self.model_name, self.threads, self.task_queues[index], self.result_queue), daemon=True)
+        self.workers[index].start()
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.pending = asyncio.Queue()
+        # Two batches per process: one computing, one waiting, so children never idle on the dispatcher
+        self.slots = asyncio.Semaphore(self.processes * 2)
+        self.started_at = time.perf_counter()
+        for index in range(self.processes):
+            self._spawn(index)
+        self.reader = threading.Thread(target=self._read_results, name="helix-pool-results", daemon=True)
+        self.reader.start()
+        self.dispatcher = asyncio.create_task(self._dispatch())
+        self.monitor = asyncio.create_task(self._monitor())
+        try:
+            await asyncio.wait_for(self.ready.wait(), self.start_timeout)
+        except asyncio.TimeoutError:
+            self.load_error = f"not ready after {self.start_timeout:g}s"
+        if self.load_error:
+            await self.close()
+            raise RuntimeError(f"Local pool {self.model_name} failed to start: {self.load_error}")
+        logger.info(f"Local pool ready: {self.processes} x {self.model_name} in {time.perf_counter() - self.started_at:.1f}s")
+
+    async def close(self):
+        for task in (self.monitor, self.dispatcher):
+            if task: task.cancel()
+        for inbox in self.task_queues:
+            inbox.put(None)
+        self.result_queue.put(("stop", None, None, None))
+        for worker in self.workers:
+            if worker is None: continue
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+    async def embed(self, sequence: str):
+        return (await self.embed_many([sequence]))[0]
+
+    async def embed_many(self, sequences: List[str]):
+        futures = []
+        for sequence in sequences:
+            future = self.loop.create_future()
+            self.pending.put_nowait((sequence, future))
+            futures.append(future)
+        return await asyncio.wait_for(asyncio.gather(*futures), timeout=self.timeout)
+
+    async def _dispatch(self):
+        while True:
+            await self.slots.acquire()
+            batch = [await self.pending.get()]
+            # Micro-batch: collect whatever else arrives within the wait window
+            deadline = self.loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - self.loop.time()
+                if remaining <= 0: break
+                try:
+                    batch.append(await asyncio.wait_for(self.pending.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [(seq, fut) for seq, fut in batch if not fut.done()]
+            if not batch:
+                self.slots.release()
+                continue
+            batch_id = next(self.batch_ids)
+            # Least-loaded child, preferring ones that have finished loading
+            candidates = [i for i, ready in enumerate(self.child_ready) if ready] or range(self.processes)
+            index = min(candidates, key=lambda i: len(self.assigned[i]))
+            self.assigned[index].add(batch_id)
+            self.in_flight[batch_id] = [fut for _, fut in batch]
+            self.task_queues[index].put((batch_id, [seq for seq, _ in batch]))
+
+    async def _monitor(self):
+        # A child that dies (OOM, native crash) fails the batches it held and is replaced
+        while True:
+            await asyncio.sleep(1.0)
+            for index, worker in enumerate(self.workers):
+                if worker.is_alive(): continue
+                logger.error(f"Local pool process {index} exited with code {worker.exitcode}, restarting")
+                self.child_ready[index] = False
+                for batch_id in self.assigned[index]:
+                    self._fail_batch(batch_id, f"local inference process exited with code {worker.exitcode}")
+                self.assigned[index].clear()
+                # A fresh inbox: the old one may hold a half-read batch
+                self.task_queues[index] = self.ctx.Queue()
+                self.restarts += 1
+                self._spawn(index)
+
+    def _fail_batch(self, batch_id, reason):
+        futures = self.in_flight.pop(batch_id, None)
+        if futures is None: return
+        self.slots.release()
+        for fut in futures:
+            if not fut.done(): fut.set_exception(RuntimeError(reason))
+
+    def _read_results(self):
+        while True:
+            kind, index, key, payload = self.result_queue.get()
+            if kind == "stop": break
+            self.loop.call_soon_threadsafe(self._on_result, kind, index, key, payload)
+
+    def _on_result(self, kind, index, key, payload):
+        if kind == "ready":
+            self.child_ready[index] = True
+            self.warmup_seconds[index] = round(payload, 2)
+            if all(self.child_ready):
+                self.ready.set()
+            return
+        if kind == "failed":
+            logger.error(f"Local pool process {index} could not load {self.model_name}: {payload}")
+            if not self.ready.is_set():
+                self.load_error = payload
+                self.ready.set()
+            return
+
+        self.assigned[index].discard(key)
+        if kind == "error":
+            logger.error(f"Local batch {key} failed: {payload}")
+            self._fail_batch(key, payload)
+            return
+        # Already failed by the monitor: the slot went back with it
+        futures = self.in_flight.pop(key, None)
+        if futures is None: return
+        self.slots.release()
+        self.batches += 1
+        self.sequences += len(futures)
+        for fut, vector in zip(futures, payload):
+            if not fut.done(): fut.set_result(vector)
+
+    def stats(self):
+        return {
+            "model": self.model_name,
+            "processes": self.processes,
+            "alive": sum(1 for w in self.workers if w is not None and w.is_alive()),
+            "restarts": self.restarts,
+            "ready": self.ready.is_set(),
+            "warmup_seconds": self.warmup_seconds,
+            "queue_depth": self.pending.qsize() if self.pending else 0,
+            "batches_in_flight": len(self.in_flight),
+            "batches": self.batches,
+            "sequences": self.sequences,
+            "avg_batch_size": round(self.sequences / self.batches, 2) if self.batches else 0.0,
+        }
@@ -1,72 +1,115 @@
 # services/gateway/app/core/orchestrator.py
-import os, hashlib, torch, json, logging, requests, grpc, time, re
-from typing import List, Dict, Any, Optional
-from transformers import AutoTokenizer, AutoModelForMaskedLM
-from app.db.repository import DatabaseContext
+import os, hashlib, logging, asyncio, grpc, re
+from collections import Counter
+from typing import Dict
+from app.db.repository import DatabaseContext, DatabasePool
+from app.db.registry import ModelRegistry
 from app.core.structure import StructureOrchestrator
+from app.core.inference_pool import LocalInferencePool
+from app.core.cache import EmbeddingCache
+from app.core.vector_codec import vector_from_response
+from app.core.bulk import BulkIngestPipeline
+from app.core.backfill import BackfillManager
+from app.core.reconciler import FallbackReconciler
+from app.core.vector_index import VectorIndexManager
+from app.core.worker_health import WorkerHealthMonitor, CHANNEL_OPTIONS
+from app.core.uniprot import UniProtIngestor
 
 import gen.cache_pb2 as cache_pb2
 import gen.cache_pb2_grpc as cache_pb2_grpc
-from gen import cache_pb2 as health_pb2
-from gen import cache_pb2_grpc as health_pb2_grpc
 
 logger = logging.getLogger("HelixOrchestrator")
 
-class UniProtIngestor:
-    BASE_URL = "https://rest.uniprot.org/uniprotkb/search"
-    FIELDS = ["accession", "protein_name", "organism_name", "sequence", "cc_function", "ft_binding", "ft_site", "xref_pdb"]
-
-    def fetch_proteins(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
-        try:
-            params = {"query": query, "fields": ",".join(self.FIELDS), "size": limit, "sort": "accession desc"}
-            res = requests.get(self.BASE_URL, params=params, headers={"accept": "application/json"})
-            res.raise_for_status()
-            return res.json().get("results", [])
-        except Exception as e:
-            logger.error(f"UniProt Fetch Error: {e}")
-            return []
-
-    def parse_entry(self, entry: Dict[str, Any]) -> Dict[str, Any]:
-        desc = entry.get("proteinDescription", {})
-        name = desc.get("recommendedName", {}).get("fullName", {}).get("value") or \
-               desc.get("submissionNames", [{}])[0].get("fullName", {}).get("value", "Unknown Protein")
-        
-        pdb_ids = [ref.get("id") for ref in entry.get("uniProtKBCrossReferences", []) if ref.get("database") == "PDB"]
-        
-        annotations = []
-        for f in entry.get("features", []):
-            if f.get("type") in ["Binding site", "Active site", "Metal binding", "Site"]:
-                label = f.get("description") or f.get("ligand", {}).get("name") or f.get("type")
-                pos = f.get("location", {}).get("start", {}).get("value")
-                if pos: annotations.append({"label": label, "pos": pos})
-        
-        function_text = "No description."
-        for comment in entry.get("comments", []):
-            if comment.get("commentType") == "FUNCTION":
-                texts = comment.get("texts", [])
-                if texts: function_text = texts[0].get("value", function_text)
-                break
-
-        return {
-            "accession": entry.get("primaryAccession"),
-            "name": name,
-            "organism": entry.get("organism", {}).get("scientificName", "Unknown"),
-            "sequence": entry.get("sequence", {}).get("value", ""), 
-            "function": function_text,
-            "pdb_ids": pdb_ids,
-            "annotations": annotations
-        }
-
 class HelixOrchestrator:
     def __init__(self):
         self.db_url = os.getenv("DATABASE_URL")
         self.remote_host = os.getenv("TITAN_CACHE_HOST", "localhost")
         self.remote_port = os.getenv("TITAN_CACHE_PORT", "9090")
+        self.worker_health_host = os.getenv("WORKER_HEALTH_HOST", self.remote_host)
         self.worker_health_port = os.getenv("WORKER_PORT", "50051")
-        self.local_model_name = "facebook/esm2_t6_8M_UR50D"
-        self.local_model = None
-        self.local_tokenizer = None
+        # Channels live for the whole process (created in startup, on the serving loop):
+        # no per-request TCP + HTTP/2 handshake to TitanCache or the worker
+        self.titan_channel = None
+        self.titan = None
+        self.worker_health = WorkerHealthMonitor(f"{self.worker_health_host}:{self.worker_health_port}")
+        self.remote_timeout = float(os.getenv("REMOTE_TIMEOUT_S", "12"))
+        # Fallback model: always loaded in-process, serves remote models while their workers are down
+        self.local_model_id = os.getenv("LOCAL_MODEL_ID", "esm2_t6_8M_UR50D")
+        self.local_pool = LocalInferencePool(f"facebook/{self.local_model_id}")
+        self.local_pools = {self.local_model_id: self.local_pool}
+        self.local_pool_lock = asyncio.Lock()
         self.ingestor = UniProtIngestor()
+        self.embedding_cache = EmbeddingCache(
+            max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+            ttl_seconds=float(os.getenv("EMBEDDING_CACHE_TTL_S", "600"))
+        )
+        self.lookup_stats = {layer: Counter() for layer in ("memory", "titan", "database", "inference", "single_flight")}
+        # (seq_hash, model_id) -> task resolving it: concurrent requests for one sequence share the work
+        self.inflight: Dict[tuple, asyncio.Task] = {}
+        self.bulk = BulkIngestPipeline(self)
+        self.backfill = BackfillManager(self)
+        self.reconciler = FallbackReconciler(self)
+        self.search_batch_size = int(os.getenv("SEARCH_BATCH_SIZE", "64"))
+        # Opt-in: unset VECTOR_INDEX_DIR keeps every search on pgvector
+        self.vector_index_dir = os.getenv("VECTOR_INDEX_DIR")
+        self.vector_index = None
+
+    async def startup(self):
+        await DatabasePool.get_pool(self.db_url)
+        await ModelRegistry.start(self.db_url)
+        self.titan_channel = grpc.aio.insecure_channel(
+            f"{self.remote_host}:{self.remote_port}", options=CHANNEL_OPTIONS + [("grpc.enable_retries", 1)])
+        self.titan = cache_pb2_grpc.CacheServiceStub(self.titan_channel)
+        await self.worker_health.start()
+        # Load and warm the fallback model before serving so no request pays the cold start
+        await self.local_pool.start()
+        if self.vector_index_dir:
+            dims = {spec.model_id: spec.dimension for spec in ModelRegistry.all().values()}
+            self.vector_index = VectorIndexManager(self.vector_index_dir, dims)
+            await self.vector_index.start(lambda: DatabaseContext(self.db_url))
+        if os.getenv("BACKFILL_RESUME", "1") == "1":
+            await self.backfill.resume_interrupted()
+        if os.getenv("RECONCILE_FALLBACKS", "1") == "1":
+            await self.reconciler.start()
+
+    async def shutdown(self):
+        await self.reconciler.close()
+        await self.backfill.close()
+        if self.vector_index:
+            await self.vector_index.close()
+        await self.ingestor.close()
+        await self.worker_health.close()
+        if self.titan_channel:
+            await self.titan_channel.close()
+        await ModelRegistry.close()
+        await DatabasePool.close()
+        for pool in self.local_pools.values():
+            await pool.close()
+
+    def metrics(self):
+        return {
+            "local_pools": {model_id: pool.stats() for model_id, pool in self.local_pools.items()},
+            "embedding_lookup": {layer: dict(counts) for layer, counts in self.lookup_stats.items()},
+            "embedding_cache": {"entries": len(self.embedding_cache), "evictions": self.embedding_cache.evictions},
+            "vector_index": self.vector_index.stats() if self.vector_index else None,
+            "worker_health": self.worker_health.stats(),
+            "uniprot": self.ingestor.stats,
+            "fallback_reconciler": self.reconciler.snapshot(),
+        }
+
+    def list_models(self):
+        return [spec._asdict() | {"loaded_locally": model_id in self.local_pools} for model_id, spec in ModelRegistry.all().items()]
+
+    def _index_stored(self, stored):
+        # stored: (metadata_id, model_id, vector) as returned by the repository writes
+        if not self.vector_index: return
+        by_model = {}
+        for metadata_id, model_id, vector in stored:
+            by_model.setdefault(model_id, ([], []))
+            by_model[model_id][0].append(metadata_id)
+            by_model[model_id][1].append(vector)
+        for model_id, (ids, vectors) in by_model.items():
+            self.vector_index.add(model_id, ids, vectors)
 
     def _clean_sequence(self, sequence: str) -> str:
         # Remove FASTA headers and whitespace
@@ -79,61 +122,144 @@ class HelixOrchestrator:
         if not seq: raise ValueError("Invalid protein sequence")
         return seq[:1022]
 
-    def _is_worker_online(self) -> bool:
-        target = f"{self.remote_host}:{self.worker_health_port}"
+    async def queue_stats(self):
+        # Server-side view of the task queues: depths, leases, connected streams and queue-to-start latency
+        res = await self.titan.GetQueueStats(cache_pb2.EmptyRequest(), timeout=2.0)
+        return {
+            "models": [{field.name: getattr(model, field.name) for field in model.DESCRIPTOR.fields} for model in res.models],
+            "dead_letters": res.dead_letters,
+        }
+
+    async def _titan_lookup(self, seq_hash: str, model_id: str):
         try:
-            with grpc.insecure_channel(target) as channel:
-                stub = health_pb2_grpc.HealthStub(channel)
-                response = stub.Check(health_pb2.HealthCheckRequest(service=""), timeout=0.5)
-                return response.status == health_pb2.HealthCheckResponse.SERVING
-        except Exception:
-            return False
-
-    def _get_vector_data(self, clean_seq: str, model_id: str):
+            res = await self.titan.Get(cache_pb2.KeyRequest(key=seq_hash, model_id=model_id, accept_binary=True), timeout=0.2)
+            if res.found:
+                return vector_from_response(res), model_id, res.confidence_score
+        except grpc.RpcError:
+            pass
+        return None
+
+    async def _lookup_vector_data(self, seq_hash: str, model_id: str):
+        key = (seq_hash, model_id)
+        found = self.embedding_cache.get(key)
+        self.lookup_stats["memory"]["hits" if found else "misses"] += 1
+        if found: return found
+
+        # Only remote models are ever written to TitanCache
+        if ModelRegistry.get(model_id).remote:
+            found = await self._titan_lookup(seq_hash, model_id)
+            self.lookup_stats["titan"]["hits" if found else "misses"] += 1
+        if not found:
+            async with DatabaseContext(self.db_url) as repo:
+                row = await repo.get_vector(seq_hash, model_id)
+            self.lookup_stats["database"]["hits" if row else "misses"] += 1
+            if row:
+                found = (row["vector"], model_id, row["confidence_score"])
+
+        if found: self.embedding_cache.put(key, found)
+        return found
+
+    async def _get_vector_data(self, clean_seq: str, model_id: str):
         seq_hash = hashlib.sha256(clean_seq.encode()).hexdigest()
-        
-        # Attempt remote
-        if "650M" in model_id:
-            try:
-                if self._is_worker_online():
-                    target = f"{self.remote_host}:{self.remote_port}"
-                    with grpc.insecure_channel(target, options=[('grpc.enable_retries', 1), ('grpc.keepalive_timeout_ms', 10000)]) as channel:
-                        stub = cache_pb2_grpc.CacheServiceStub(channel)
-                        try:
-                            stub.SubmitTask(cache_pb2.Task(hash=seq_hash, sequence=clean_seq, model_id=model_id), timeout=2.0)
-                        except grpc.RpcError as e:
-                            logger.error(f"SubmitTask failed: {e.code()} - {e.details()}")
-                            raise e
-
-                        for _ in range(12): 
-                            try:
-                                res = stub.Get(cache_pb2.KeyRequest(key=seq_hash, model_id=model_id), timeout=1.0)
-                                if res.found: 
-                                    return json.loads(res.value), model_id, res.confidence_score
-                            except grpc.RpcError:
-                                pass # Retry loop
-                            time.sleep(1)
-            except Exception as e:
-                logger.warning(f"Remote Worker fail: {e}. Falling back to Local 8M.")
+        key = (seq_hash, model_id)
+        stats = self.lookup_stats["single_flight"]
+
+        task = self.inflight.get(key)
+        joined = task is not None
+        if joined:
+            stats["joined"] += 1
+        else:
+            stats["leaders"] += 1
+            task = asyncio.create_task(self._resolve_vector_data(clean_seq, seq_hash, model_id))
+            self.inflight[key] = task
+            task.add_done_callback(lambda done: self._finish_flight(key, done))
+        # Shielded: a caller that disconnects must not cancel the work the others are waiting on
+        result, computed = await asyncio.shield(task)
+        if joined and computed:
+            stats["inference_saved"] += 1
+        return result
+
+    def _finish_flight(self, key, task):
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        # Every waiter may have gone away: retrieve the exception so it is not reported as lost
+        if not task.cancelled():
+            task.exception()
+
+    async def _resolve_vector_data(self, clean_seq: str, seq_hash: str, model_id: str):
+        # Returns (vector_data, ran_inference)
+        # Memory -> TitanCache -> pgvector, only then inference
+        found = await self._lookup_vector_data(seq_hash, model_id)
+        if found: return found, False
+
+        self.lookup_stats["inference"]["calls"] += 1
+        result = await self._compute_vector_data(clean_seq, seq_hash, model_id)
+        # Fallback vectors come from a different model, never serve them as a cache hit for this one
+        if result[1] == model_id:
+            self.embedding_cache.put((seq_hash, model_id), result)
+        return result, True
+
+    async def _compute_vectors_bulk(self, items, model_id: str):
+        # Bypasses the lookup layers: callers have already deduped against stored rows,
+        # and bulk traffic must not evict hot search entries from the LRU.
+        # Concurrent local calls are micro-batched by the pool, remote ones by the worker's lease.
+        # Remote tasks go to TitanCache's BULK lane so interactive searches lease ahead of them.
+        return await asyncio.gather(*(
+            self._compute_vector_data(clean_seq, seq_hash, model_id, priority=cache_pb2.BULK) for seq_hash, clean_seq in items
+        ))
+
+    async def _local_pool_for(self, spec):
+        # Further local models get their own process pool on first use
+        if spec.model_id not in self.local_pools:
+            async with self.local_pool_lock:
+                if spec.model_id not in self.local_pools:
+                    pool = LocalInferencePool(spec.checkpoint)
+                    await pool.start()
+                    self.local_pools[spec.model_id] = pool
+        return self.local_pools[spec.model_id]
+
+    async def _compute_vector_data(self, clean_seq: str, seq_hash: str, model_id: str, priority=cache_pb2.INTERACTIVE):
+        spec = ModelRegistry.get(model_id)
+        if not spec.remote:
+            pool = await self._local_pool_for(spec)
+            return await pool.embed(clean_seq), model_id, None
+
+        # Attempt remote, unless the health watch already knows the worker is down
+        try:
+            if self.worker_health.serving:
+                try:
+                    ack = await self.titan.SubmitTask(cache_pb2.Task(hash=seq_hash, sequence=clean_seq, model_id=model_id, priority=priority), timeout=2.0)
+                except grpc.RpcError as e:
+                    logger.error(f"SubmitTask failed: {e.code()} - {e.details()}")
+                    raise e
+                # Workers already failed this key repeatedly: do not wait for a result that will not come
+                if ack.message.startswith("DeadLettered"):
+                    raise RuntimeError(f"{seq_hash[:8]} is dead-lettered ({ack.message})")
+
+                # Server holds the call open until SubmitBatch resolves the hash
+                res = await self.titan.AwaitResult(
+                    cache_pb2.AwaitRequest(key=seq_hash, model_id=model_id, timeout_ms=int(self.remote_timeout * 1000), accept_binary=True),
+                    timeout=self.remote_timeout + 1.0
+                )
+                if res.found:
+                    return vector_from_response(res), model_id, res.confidence_score
+                if res.dead_lettered:
+                    raise RuntimeError(f"{seq_hash[:8]} was dead-lettered: {res.error}")
+                logger.warning(f"Remote result for {seq_hash[:8]} not ready after {self.remote_timeout}s")
+            else:
+                self.lookup_stats["inference"]["worker_down"] += 1
+        except Exception as e:
+            logger.warning(f"Remote Worker fail: {e}. Falling back to local {self.local_model_id}.")
 
         # Local Fallback
         logger.info("Executing Local Fallback Inference...")
-        if not self.local_model:
-            self.local_tokenizer = AutoTokenizer.from_pretrained(self.local_model_name)
-            self.local_model = AutoModelForMaskedLM.from_pretrained(self.local_model_name)
-            self.local_model.eval()
-        
-        inputs = self.local_tokenizer(clean_seq, return_tensors="pt")
-        with torch.no_grad():
-            outputs = self.local_model(**inputs, output_hidden_states=True)
-            embeddings = outputs.hidden_states[-1].mean(dim=1)
-            normalized = torch.nn.functional.normalize(embeddings, p=2, dim=1)
-            return normalized.tolist()[0], "esm2_t6_8M_UR50D", None
+        vector = await self.local_pool.embed(clean_seq)
+        return vector, self.local_model_id, None
 
     async def ingest_manual_sequence(self, sequence: str, model_id: str):
         clean_seq = self._clean_sequence(sequence)
         seq_hash = hashlib.sha256(clean_seq.encode()).hexdigest()
-        vector, active_model, confidence = self._get_vector_data(clean_seq, model_id)
+        vector, active_model, confidence = await self._get_vector_data(clean_seq, model_id)
         
         data = {
             "accession": f"MAN-{seq_hash[:8]}",
@@ -147,9 +273,10 @@ class HelixOrchestrator:
 
         is_fallback = (active_model != model_id)
 
-        with DatabaseContext(self.db_url) as repo:
-            repo.store_rich_embedding(seq_hash, active_model, vector, data, confidence, is_fallback=is_fallback)
-        
+        async with DatabaseContext(self.db_url) as repo:
+            meta_id = await repo.store_rich_embedding(seq_hash, active_model, vector, data, confidence, requested_model_id=model_id)
+        self._index_stored([(meta_id, active_model, vector)])
+
         return [{
             "accession": data['accession'], 
             "status": f"COMPLETED_{'LOCAL' if is_fallback else 'REMOTE'}",
@@ -157,25 +284,106 @@ class HelixOrchestrator:
         }]
 
     async def ingest_from_uniprot(self, query: str, model_id: str, limit: int = 5):
-        raw_results = self.ingestor.fetch_proteins(query, limit)
-        processed = []
-        with DatabaseContext(self.db_url) as repo:
-            for raw in raw_results:
-                data = self.ingestor.parse_entry(raw)
-                clean_seq = self._clean_sequence(data['sequence'])
-                seq_hash = hashlib.sha256(clean_seq.encode()).hexdigest()
-                vector, active_model, confidence = self._get_vector_data(clean_seq, model_id)
-                repo.store_rich_embedding(seq_hash, active_model, vector, data, confidence, is_fallback=(active_model != model_id))
-                processed.append({"accession": data['accession'], "name": data['name'], "status": "COMPLETED"})
-        return processed
-
-    async def search_similar(self, sequence: str, model_id: str, limit: int = 5):
+        # Pages stream in (the next one is fetched while this one embeds); a page's entries embed
+        # concurrently, so the pool/worker batches them, and each page is written in one transaction
+        results = []
+        async for page in self.ingestor.iter_pages(query, limit):
+            embedded = await asyncio.gather(*(self._embed_entry(raw, model_id) for raw in page))
+            processed = [item for item in embedded if "skipped" not in item]
+            if processed:
+                async with DatabaseContext(self.db_url) as repo:
+                    stored = await repo.store_rich_embeddings_bulk([
+                        (it["seq_hash"], it["active_model"], it["vector"], it["data"], it["confidence"], model_id)
+                        for it in processed
+                    ])
+                self._index_stored(stored)
+            for item in embedded:
+                data = item["data"]
+                if "skipped" in item:
+                    results.append({"accession": data["accession"], "name": data["name"], "status": "SKIPPED", "reason": item["skipped"]})
+                else:
+                    results.append({"accession": data["accession"], "name": data["name"], "status": "COMPLETED"})
+        return results
+
+    async def _embed_entry(self, raw, model_id: str):
+        data = self.ingestor.parse_entry(raw)
+        try:
+            clean_seq = self._clean_sequence(data["sequence"])
+        except ValueError as e:
+            # Non-standard residues (U, X, ...) skip the one entry instead of failing the ingest
+            return {"data": data, "skipped": str(e)}
+        seq_hash = hashlib.sha256(clean_seq.encode()).hexdigest()
+        vector, active_model, confidence = await self._get_vector_data(clean_seq, model_id)
+        return {"data": data, "seq_hash": seq_hash, "active_model": active_model, "vector": vector, "confidence": confidence}
+
+    async def search_similar(self, sequence: str, model_id: str, limit: int = 5, **search_options):
+        # search_options: filters, ef_search, iterative_scan, rerank_factor (see EmbeddingRepository.find_similar)
         clean_seq = self._clean_sequence(sequence)
-        vector, active_model, _ = self._get_vector_data(clean_seq, model_id)
-        with DatabaseContext(self.db_url) as repo:
-            return repo.find_similar(vector, active_model, limit)
+        vector, active_model, _ = await self._get_vector_data(clean_seq, model_id)
+        async with DatabaseContext(self.db_url) as repo:
+            # Filters and HNSW knobs are pgvector features; only plain top-k goes to the in-process index
+            if self.vector_index and not any(search_options.values()):
+                found = self.vector_index.search(active_model, vector, limit)
+                if found is not None:
+                    return await self._hydrate(repo, *found)
+            return await repo.find_similar(vector, active_model, limit, **search_options)
+
+    async def _hydrate(self, repo, ids, distances):
+        metadata = await repo.get_metadata_by_ids(ids)
+        results = []
+        for metadata_id, distance in zip(ids.tolist(), distances.tolist()):
+            # Rows deleted in Postgres since the index saw them are simply skipped
+            if metadata_id in metadata:
+                row = metadata[metadata_id]
+                results.append({
+                    "primary_accession": row["primary_accession"], "protein_name": row["protein_name"],
+                    "organism": row["organism"], "is_fallback": row["is_fallback"], "distance": distance,
+                })
+        return results
+
+    async def search_batch(self, queries, model_id: str, limit: int = 5, **search_options):
+        # queries: (query_id, raw_sequence). Yields one result dict per query, in order.
+        indexed = [(i, query_id, sequence) for i, (query_id, sequence) in enumerate(queries)]
+        chunks = [indexed[i:i + self.search_batch_size] for i in range(0, len(indexed), self.search_batch_size)]
+        if not chunks: return
+
+        async with DatabaseContext(self.db_url) as repo:
+            next_embed = asyncio.create_task(self._embed_queries(chunks[0], model_id))
+            try:
+                for i in range(len(chunks)):
+                    embedded = await next_embed
+                    # Embed chunk n+1 while chunk n is in the database
+                    if i + 1 < len(chunks):
+                        next_embed = asyncio.create_task(self._embed_queries(chunks[i + 1], model_id))
+
+                    by_model = {}
+                    for item in embedded:
+                        if "vector" in item:
+                            by_model.setdefault(item["model_used"], []).append(item)
+                    for active_model, items in by_model.items():
+                        vectors = [it.pop("vector") for it in items]
+                        if self.vector_index and not any(search_options.values()) and active_model in self.vector_index.ready:
+                            matches = [await self._hydrate(repo, *self.vector_index.search(active_model, v, limit)) for v in vectors]
+                        else:
+                            matches = await repo.find_similar_batch(vectors, active_model, limit, **search_options)
+                        for item, results in zip(items, matches):
+                            item["results"] = results
+                    for item in embedded:
+                        yield item
+            finally:
+                # Client went away mid-stream: do not leave the prefetch running
+                next_embed.cancel()
+
+    async def _embed_queries(self, chunk, model_id: str):
+        async def embed_one(offset, query_id, sequence):
+            try:
+                vector, active_model, _ = await self._get_vector_data(self._clean_sequence(sequence), model_id)
+                return {"index": offset, "id": query_id, "model_used": active_model, "vector": vector}
+            except ValueError as e:
+                return {"index": offset, "id": query_id, "error": str(e)}
+        return await asyncio.gather(*(embed_one(*query) for query in chunk))
 
     async def get_structure_data(self, accession: str, model_id: str):
-        with DatabaseContext(self.db_url) as repo:
-            protein_data = repo.get_embedding_by_accession(accession, model_id)
+        async with DatabaseContext(self.db_url) as repo:
+            protein_data = await repo.get_embedding_by_accession(accession, model_id)
             return StructureOrchestrator.generate_manifest(protein_data) if protein_data else None
\ No newline at end of file
@@ -0,0 +1,94 @@
+# services/gateway/app/core/reconciler.py
+# Upgrades fallback rows: sequences the local model embedded while a remote model's workers were down are
+# recomputed with the model that was requested once health reports SERVING, then is_fallback is cleared.
+import os, time, asyncio, logging
+from collections import Counter
+from app.db.repository import DatabaseContext
+from app.core.backfill import source_data
+
+logger = logging.getLogger("FallbackReconciler")
+
+class FallbackReconciler:
+    def __init__(self, orchestrator):
+        self.orchestrator = orchestrator
+        self.batch_size = int(os.getenv("RECONCILE_BATCH_SIZE", "32"))
+        # Sequences per second. Upgrades already ride TitanCache's BULK lane; this caps how much they add to it
+        self.rate = float(os.getenv("RECONCILE_RATE", "10"))
+        self.interval = float(os.getenv("RECONCILE_INTERVAL_S", "30"))
+        # Back off while this many interactive lookups are in flight
+        self.max_inflight = int(os.getenv("RECONCILE_MAX_INFLIGHT", "8"))
+        self.after_id = 0
+        self.task = None
+        self.stats = Counter()
+
+    async def start(self):
+        self.task = asyncio.create_task(self._loop())
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    def snapshot(self):
+        return dict(self.stats) | {"after_id": self.after_id}
+
+    async def _loop(self):
+        while True:
+            try:
+                progressed = await self._step()
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"Fallback reconcile failed: {e}")
+                progressed = False
+            if not progressed:
+                await asyncio.sleep(self.interval)
+
+    async def _step(self):
+        # True when a batch went through and the next one may follow right after the rate-limit pause
+        if not self.orchestrator.worker_health.serving:
+            self.stats["waits_worker_down"] += 1
+            return False
+        if len(self.orchestrator.inflight) >= self.max_inflight:
+            self.stats["waits_busy"] += 1
+            return False
+
+        async with DatabaseContext(self.orchestrator.db_url) as repo:
+            if self.after_id == 0:
+                self.stats["cleared"] += await repo.clear_upgraded_fallbacks()
+            rows = await repo.fallback_candidates(self.after_id, self.batch_size)
+        if not rows:
+            # End of the table: the next pass starts over and picks up rows stored since
+            self.after_id = 0
+            return False
+
+        started = time.monotonic()
+        by_model = {}
+        for row in rows:
+            by_model.setdefault(row["requested_model_id"], []).append(row)
+        records, upgraded_ids = [], []
+        for model_id, group in by_model.items():
+            results = await self.orchestrator._compute_vectors_bulk(
+                [(row["sequence_hash"], row["sequence_text"]) for row in group], model_id)
+            for row, (vector, active_model, confidence) in zip(group, results):
+                # Fell back again (worker dropped mid-batch): the row stays for a later pass
+                if active_model != model_id: continue
+                records.append((row["sequence_hash"], model_id, vector, source_data(row), confidence, model_id))
+                upgraded_ids.append(row["id"])
+        self.stats["scanned"] += len(rows)
+
+        if not records:
+            self.stats["failed_batches"] += 1
+            # Still serving means these keys fail on their own (dead-lettered, ...): move past them
+            if self.orchestrator.worker_health.serving:
+                self.after_id = rows[-1]["id"]
+            return False
+
+        async with DatabaseContext(self.orchestrator.db_url) as repo:
+            stored = await repo.store_fallback_upgrades(records, upgraded_ids)
+        self.orchestrator._index_stored(stored)
+        self.stats["upgraded"] += len(upgraded_ids)
+        self.after_id = rows[-1]["id"]
+        logger.info(f"Upgraded {len(upgraded_ids)}/{len(rows)} fallback rows up to id {self.after_id}")
+
+        await asyncio.sleep(max(0.0, len(rows) / self.rate - (time.monotonic() - started)))
+        return True
@@ -0,0 +1,152 @@
+# services/gateway/app/core/uniprot.py
+# Streaming UniProt search client: cursor pages over one pooled HTTP/1.1 client, retries with backoff,
+# and an optional on-disk cache of raw entries so re-ingests (and tests) run without the network.
+import os, re, json, hashlib, asyncio, logging, httpx
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+logger = logging.getLogger("UniProtIngestor")
+
+NEXT_LINK = re.compile(r'<([^>]+)>\s*;\s*rel="next"')
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class UniProtIngestor:
+    BASE_URL = os.getenv("UNIPROT_BASE_URL", "https://rest.uniprot.org/uniprotkb/search")
+    FIELDS = ["accession", "protein_name", "organism_name", "sequence", "cc_function", "ft_binding", "ft_site", "xref_pdb"]
+    # UniProt caps a search page at 500 results
+    MAX_PAGE_SIZE = 500
+
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            timeout=30.0, headers={"accept": "application/json"},
+            limits=httpx.Limits(max_connections=8, max_keepalive_connections=8),
+        )
+        self.page_size = min(int(os.getenv("UNIPROT_PAGE_SIZE", "100")), self.MAX_PAGE_SIZE)
+        self.max_retries = int(os.getenv("UNIPROT_MAX_RETRIES", "4"))
+        # Opt-in: unset UNIPROT_CACHE_DIR always goes to the network
+        self.cache_dir = os.getenv("UNIPROT_CACHE_DIR")
+        self.stats = {"pages": 0, "entries": 0, "retries": 0, "cache_hits": 0}
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def _get(self, url: str, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            try:
+                res = await self.client.get(url, params=params)
+                if res.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                    res.raise_for_status()
+                    return res
+                # Rate limited or overloaded: honour Retry-After when UniProt sends one
+                wait = float(res.headers.get("retry-after", delay))
+            except (httpx.TransportError, httpx.TimeoutException):
+                if attempt == self.max_retries: raise
+                wait = delay
+            self.stats["retries"] += 1
+            logger.warning(f"UniProt request failed, retry {attempt + 1}/{self.max_retries} in {wait:.1f}s")
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, 30.0)
+
+    async def iter_pages(self, query: str, limit: int) -> AsyncIterator[List[Dict[str, Any]]]:
+        # Yields raw entries a page at a time, following the Link: rel="next" cursor until limit.
+        # The next page is requested while the caller is still working on the current one.
+        cached = self._read_cache(query, limit)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            for i in range(0, len(cached), self.page_size):
+                yield cached[i:i + self.page_size]
+            return
+
+        params = {"query": query, "fields": ",".join(self.FIELDS), "size": min(self.page_size, limit), "sort": "accession desc"}
+        fetched: List[Dict[str, Any]] = []
+        complete = False
+        pending = asyncio.create_task(self._get(self.BASE_URL, params))
+        try:
+            while pending is not None:
+                res = await pending
+                pending = None
+                page = res.json().get("results", [])[:limit - len(fetched)]
+                fetched.extend(page)
+                self.stats["pages"] += 1
+                self.stats["entries"] += len(page)
+
+                match = NEXT_LINK.search(res.headers.get("link", ""))
+                complete = match is None
+                if match and len(fetched) < limit:
+                    # The cursor URL already carries query, fields and size
+                    pending = asyncio.create_task(self._get(match.group(1)))
+                if page:
+                    yield page
+        finally:
+            if pending is not None:
+                pending.cancel()
+        self._write_cache(query, fetched, complete)
+
+    async def fetch_proteins(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        try:
+            return [entry async for page in self.iter_pages(query, limit) for entry in page]
+        except Exception as e:
+            logger.error(f"UniProt Fetch Error: {e}")
+            return []
+
+    def _cache_path(self, query: str) -> str:
+        key = hashlib.sha256(f"{query}|{','.join(self.FIELDS)}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_cache(self, query: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        if not self.cache_dir: return None
+        try:
+            with open(self._cache_path(query)) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # A shorter cached run only answers this query if UniProt had nothing more to give
+        if cached["complete"] or len(cached["entries"]) >= limit:
+            return cached["entries"][:limit]
+        return None
+
+    def _write_cache(self, query: str, entries: List[Dict[str, Any]], complete: bool):
+        if not self.cache_dir: return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(query)
+        try:
+            with open(path) as f:
+                previous = json.load(f)
+            # Never replace a longer run with a shorter one
+            if len(previous["entries"]) > len(entries) and not complete: return
+        except (OSError, ValueError):
+            pass
+        with open(path + ".tmp", "w") as f:
+            json.dump({"query": query, "complete": complete, "entries": entries}, f)
+        os.replace(path + ".tmp", path)
+
+    def parse_entry(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        desc = entry.get("proteinDescription", {})
+        name = desc.get("recommendedName", {}).get("fullName", {}).get("value") or \
+               desc.get("submissionNames", [{}])[0].get("fullName", {}).get("value", "Unknown Protein")
+
+        pdb_ids = [ref.get("id") for ref in entry.get("uniProtKBCrossReferences", []) if ref.get("database") == "PDB"]
+
+        annotations = []
+        for f in entry.get("features", []):
+            if f.get("type") in ["Binding site", "Active site", "Metal binding", "Site"]:
+                label = f.get("description") or f.get("ligand", {}).get("name") or f.get("type")
+                pos = f.get("location", {}).get("start", {}).get("value")
+                if pos: annotations.append({"label": label, "pos": pos})
+
+        function_text = "No description."
+        for comment in entry.get("comments", []):
+            if comment.get("commentType") == "FUNCTION":
+                texts = comment.get("texts", [])
+                if texts: function_text = texts[0].get("value", function_text)
+                break
+
+        return {
+            "accession": entry.get("primaryAccession"),
+            "name": name,
+            "organism": entry.get("organism", {}).get("scientificName", "Unknown"),
+            "sequence": entry.get("sequence", {}).get("value", ""),
+            "function": function_text,
+            "pdb_ids": pdb_ids,
+            "annotations": annotations
+        }
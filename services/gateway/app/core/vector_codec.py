@@ -0,0 +1,28 @@
+# services/gateway/app/core/vector_codec.py
+# Packed vector encoding for cache.proto, shared by the gateway and the inference worker.
+import json
+import numpy as np
+import gen.cache_pb2 as cache_pb2
+
+DTYPES = {
+    cache_pb2.FLOAT32_LE: np.dtype("<f4"),
+    cache_pb2.FLOAT16_LE: np.dtype("<f2"),
+}
+ENCODINGS = {"float32": cache_pb2.FLOAT32_LE, "float16": cache_pb2.FLOAT16_LE}
+
+def encoding_from_name(name: str) -> int:
+    return ENCODINGS[name.lower()]
+
+def encode_vector(vector, encoding=cache_pb2.FLOAT32_LE) -> bytes:
+    return np.asarray(vector, dtype=DTYPES[encoding]).tobytes()
+
+def decode_vector(data: bytes, encoding) -> np.ndarray:
+    # float32 is a zero-copy (read-only) view over the protobuf bytes, float16 needs one widening copy
+    vector = np.frombuffer(data, dtype=DTYPES[encoding])
+    return vector if encoding == cache_pb2.FLOAT32_LE else vector.astype(np.float32)
+
+def vector_from_response(res) -> np.ndarray:
+    if res.vector and res.encoding != cache_pb2.JSON:
+        return decode_vector(res.vector, res.encoding)
+    # Entries written by pre-binary workers only carry JSON
+    return np.asarray(json.loads(res.value), dtype=np.float32)
@@ -0,0 +1,274 @@
+# services/gateway/app/core/vector_index.py
+# Optional in-memory ANN layer in front of pgvector. Postgres stays the source of truth:
+# this only maps a query to metadata ids, which are hydrated from embedding_metadata.
+import os, json, time, asyncio, logging
+import numpy as np
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("VectorIndex")
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def _train_centroids(sample: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    # Spherical k-means: unit vectors, so nearest centroid == highest dot product
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = sample[assign == c]
+            centroids[c] = members.sum(axis=0) if len(members) else sample[rng.integers(len(sample))]
+        centroids = _normalize(centroids)
+    return centroids
+
+class VectorIndex:
+    TRAIN_MIN_ROWS = 1024
+
+    def __init__(self, model_id: str, dim: int, directory: str, dtype: str = "float32", nprobe: int = 8, retrain_ratio: float = 2.0):
+        self.model_id = model_id
+        self.dim = dim
+        self.directory = directory
+        self.nprobe = nprobe
+        # Centroids are retrained once the table outgrows the rows they were trained on by this factor
+        self.retrain_ratio = retrain_ratio
+        self.set_dtype(dtype)
+
+    def set_dtype(self, dtype: str):
+        # Only before load(): a snapshot stored in another dtype is ignored and rebuilt
+        self.quantized = dtype == "int8"
+        # Base: memory-mapped snapshot. Delta: rows added since, merged on the next snapshot.
+        self.matrix = np.zeros((0, self.dim), dtype=np.int8 if self.quantized else np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.lists = np.zeros(0, dtype=np.int32)
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_rows = 0
+        # Wall-clock time of the loaded snapshot; startup catch-up reads vectors updated after it
+        self.synced_at = 0.0
+        self.list_order = np.zeros(0, dtype=np.int64)
+        self.list_offsets = np.zeros(1, dtype=np.int64)
+        self.delta_ids: List[int] = []
+        self.delta_vectors: List[np.ndarray] = []
+        self.delta_cache: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self.stale = set()
+
+    def _path(self, name: str, ext: str = "npy") -> str:
+        return os.path.join(self.directory, f"{self.model_id}.{name}.{ext}")
+
+    def __len__(self):
+        superseded = int(np.isin(self.ids, self._stale_array()).sum()) if self.stale else 0
+        return len(self.ids) - superseded + len(set(self.delta_ids))
+
+    def _stale_array(self) -> np.ndarray:
+        return np.fromiter(self.stale, dtype=np.int64, count=len(self.stale))
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        # Unit vectors sit in [-1, 1], so a fixed 127 scale is enough for int8
+        return np.clip(np.rint(vectors * 127), -127, 127).astype(np.int8) if self.quantized else vectors
+
+    def _scores(self, stored: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return (stored.astype(np.float32) @ query) / 127.0 if self.quantized else stored @ query
+
+    def _index_lists(self):
+        nlist = len(self.centroids) if self.centroids is not None else 0
+        self.list_order = np.argsort(self.lists, kind="stable")
+        self.list_offsets = np.searchsorted(self.lists[self.list_order], np.arange(nlist + 1))
+
+    def load(self, centroids: Optional[np.ndarray] = None) -> bool:
+        if not os.path.exists(self._path("ids")): return False
+        matrix = np.load(self._path("vectors"), mmap_mode="r")
+        if matrix.dtype != self.matrix.dtype:
+            logger.info(f"Vector index {self.model_id}: snapshot is {matrix.dtype}, rebuilding as {self.matrix.dtype}")
+            return False
+        self.matrix = matrix
+        self.ids = np.load(self._path("ids"))
+        self.lists = np.load(self._path("lists"))
+        if centroids is None and os.path.exists(self._path("centroids")):
+            centroids = np.load(self._path("centroids"))
+        self.centroids = centroids
+        meta = {}
+        if os.path.exists(self._path("meta", "json")):
+            with open(self._path("meta", "json")) as f:
+                meta = json.load(f)
+        self.trained_rows = meta.get("trained_rows", len(self.ids) if centroids is not None else 0)
+        self.synced_at = meta.get("synced_at", 0.0)
+        self._index_lists()
+        return True
+
+    def add(self, ids, vectors):
+        vectors = _normalize(np.atleast_2d(vectors))
+        for metadata_id, vector in zip(ids, vectors):
+            metadata_id = int(metadata_id)
+            self.stale.add(metadata_id)  # Any older copy (base or delta) is superseded
+            self.delta_ids.append(metadata_id)
+            self.delta_vectors.append(self._encode(vector))
+        self.delta_cache = None
+
+    @staticmethod
+    def _latest(delta_ids, delta_vectors):
+        # Keep only the newest copy of each id
+        latest = {metadata_id: row for row, metadata_id in enumerate(delta_ids)}
+        rows = list(latest.values())
+        return np.asarray(delta_ids, dtype=np.int64)[rows], np.stack([delta_vectors[r] for r in rows])
+
+    def _delta(self):
+        if self.delta_cache is None and self.delta_ids:
+            self.delta_cache = self._latest(self.delta_ids, self.delta_vectors)
+        return self.delta_cache
+
+    def search(self, query, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        query = _normalize(query)
+        cand_ids, cand_scores = [], []
+
+        if len(self.ids):
+            if self.centroids is not None:
+                nprobe = min(self.nprobe, len(self.centroids))
+                probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+                rows = np.sort(np.concatenate([self.list_order[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probe]))
+            else:
+                rows = np.arange(len(self.ids))
+            ids = self.ids[rows]
+            if self.stale:
+                keep = ~np.isin(ids, self._stale_array())
+                rows, ids = rows[keep], ids[keep]
+            cand_ids.append(ids)
+            cand_scores.append(self._scores(self.matrix[rows], query))
+
+        delta = self._delta()
+        if delta is not None:
+            cand_ids.append(delta[0])
+            cand_scores.append(self._scores(delta[1], query))
+
+        if not cand_ids: return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        ids, scores = np.concatenate(cand_ids), np.concatenate(cand_scores)
+        if len(ids) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            ids, scores = ids[top], scores[top]
+        order = np.argsort(-scores)
+        return ids[order], 1.0 - scores[order]  # cosine distance, same as pgvector <=>
+
+    def snapshot(self) -> Tuple[int, Optional[np.ndarray]]:
+        # Runs off the event loop: only reads the first n delta rows, adds that land meanwhile are kept by commit()
+        n = len(self.delta_ids)
+        synced_at = time.time()
+        delta_ids, delta_vectors = self.delta_ids[:n], self.delta_vectors[:n]
+        ids, matrix = self.ids, np.asarray(self.matrix)
+        if delta_ids:
+            delta_ids, delta_vectors = self._latest(delta_ids, delta_vectors)
+            keep = ~np.isin(ids, delta_ids)
+            ids, matrix = np.concatenate([ids[keep], delta_ids]), np.concatenate([matrix[keep], delta_vectors])
+
+        # Train into a local: search() keeps using the published centroids/lists until commit() swaps both
+        centroids, trained_rows = self.centroids, self.trained_rows
+        grown = centroids is not None and len(ids) >= trained_rows * self.retrain_ratio
+        if (centroids is None or grown) and len(ids) >= self.TRAIN_MIN_ROWS:
+            if grown:
+                logger.info(f"Vector index {self.model_id}: {len(ids)} rows vs {trained_rows} trained, retraining centroids")
+            trained_rows = len(ids)
+            nlist = int(min(4096, max(1, np.sqrt(len(ids)))))
+            sample = matrix[np.random.default_rng(0).choice(len(ids), min(len(ids), nlist * 64), replace=False)]
+            centroids = _train_centroids(_normalize(sample.astype(np.float32)), nlist)
+        lists = np.zeros(len(ids), dtype=np.int32)
+        if centroids is not None:
+            for start in range(0, len(ids), 65536):
+                block = matrix[start:start + 65536].astype(np.float32)
+                lists[start:start + 65536] = np.argmax(block @ centroids.T, axis=1)
+
+        os.makedirs(self.directory, exist_ok=True)
+        files = {"vectors": matrix, "ids": ids, "lists": lists}
+        if centroids is not None: files["centroids"] = centroids
+        for name, array in files.items():
+            tmp = self._path(name) + ".tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp, self._path(name))
+        # Written last: a crash before this leaves the previous sync time, so the next catch-up only repeats work
+        tmp = self._path("meta", "json") + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"synced_at": synced_at, "trained_rows": trained_rows}, f)
+        os.replace(tmp, self._path("meta", "json"))
+        return n, centroids
+
+    def commit(self, snapshot):
+        # Back on the event loop: drop the delta rows the snapshot absorbed, then publish centroids, lists
+        # and offsets together with the new files
+        n, centroids = snapshot
+        self.delta_ids, self.delta_vectors = self.delta_ids[n:], self.delta_vectors[n:]
+        self.delta_cache = None
+        self.stale = set(self.delta_ids)
+        self.load(centroids)
+
+class VectorIndexManager:
+    def __init__(self, directory: str, dims: Dict[str, int]):
+        self.directory = directory
+        self.dtype = os.getenv("VECTOR_INDEX_DTYPE", "float32")
+        self.snapshot_interval = float(os.getenv("VECTOR_INDEX_SNAPSHOT_S", "300"))
+        nprobe = int(os.getenv("VECTOR_INDEX_NPROBE", "8"))
+        retrain_ratio = float(os.getenv("VECTOR_INDEX_RETRAIN_RATIO", "2.0"))
+        # updated_at is the writer's transaction start and the gateway/DB clocks may drift: re-read this much
+        # before the snapshot time. Rows seen twice just supersede themselves.
+        self.catchup_margin = float(os.getenv("VECTOR_INDEX_CATCHUP_MARGIN_S", "600"))
+        self.indexes = {
+            model_id: VectorIndex(model_id, dim, directory, self.dtype, nprobe, retrain_ratio) for model_id, dim in dims.items()
+        }
+        self.ready = set()
+        self.searches = 0
+        self.task = None
+
+    async def start(self, repo_factory):
+        self.task = asyncio.create_task(self._run(repo_factory))
+
+    async def close(self):
+        if self.task: self.task.cancel()
+        await self.snapshot_all()
+
+    async def _run(self, repo_factory):
+        for model_id, index in self.indexes.items():
+            started = time.perf_counter()
+            loaded = await asyncio.to_thread(index.load)
+            # Catch up on anything inserted or re-upserted since the snapshot (or everything, on first boot)
+            async with repo_factory() as repo:
+                if loaded:
+                    since = datetime.fromtimestamp(max(0.0, index.synced_at - self.catchup_margin), timezone.utc)
+                    batches = repo.iter_updated_vectors(model_id, since)
+                else:
+                    batches = repo.iter_vectors(model_id)
+                async for batch in batches:
+                    index.add([r["metadata_id"] for r in batch], np.stack([r["vector"] for r in batch]))
+            if index.delta_ids or not loaded:
+                index.commit(await asyncio.to_thread(index.snapshot))
+            self.ready.add(model_id)
+            logger.info(f"Vector index {model_id}: {len(index)} rows ready in {time.perf_counter() - started:.1f}s")
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await self.snapshot_all()
+
+    async def snapshot_all(self):
+        for model_id in list(self.ready):
+            index = self.indexes[model_id]
+            if index.delta_ids:
+                index.commit(await asyncio.to_thread(index.snapshot))
+
+    def add(self, model_id: str, ids, vectors):
+        if model_id in self.indexes and len(ids):
+            self.indexes[model_id].add(ids, np.stack([np.asarray(v, dtype=np.float32) for v in vectors]))
+
+    def search(self, model_id: str, vector, k: int):
+        if model_id not in self.ready: return None
+        self.searches += 1
+        return self.indexes[model_id].search(vector, k)
+
+    def stats(self):
+        return {
+            model_id: {
+                "ready": model_id in self.ready,
+                "rows": len(index),
+                "pending_delta": len(index.delta_ids),
+                "lists": len(index.centroids) if index.centroids is not None else 0,
+                "trained_rows": index.trained_rows,
+                "dtype": str(index.matrix.dtype),
+            } for model_id, index in self.indexes.items()
+        } | {"searches": self.searches}
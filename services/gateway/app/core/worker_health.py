@@ -0,0 +1,91 @@
+# services/gateway/app/core/worker_health.py
+# Background view of the remote worker's health, kept current over one long-lived Health.Watch stream
+# so routing reads a flag instead of probing the worker on every request.
+import os, time, asyncio, logging, grpc
+
+import gen.cache_pb2 as cache_pb2
+import gen.cache_pb2_grpc as cache_pb2_grpc
+
+logger = logging.getLogger("WorkerHealthMonitor")
+
+SERVING = cache_pb2.HealthCheckResponse.SERVING
+NOT_SERVING = cache_pb2.HealthCheckResponse.NOT_SERVING
+UNKNOWN = cache_pb2.HealthCheckResponse.UNKNOWN
+
+# Keepalive pings notice a silently dead peer (worker host gone, NAT dropped) while the watch is idle
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 10000),
+    ("grpc.keepalive_timeout_ms", 5000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+
+class WorkerHealthMonitor:
+    def __init__(self, target: str):
+        self.target = target
+        self.poll_interval = float(os.getenv("WORKER_HEALTH_POLL_S", "2"))
+        self.status = UNKNOWN
+        self.changed_at = time.time()
+        self.transitions = 0
+        self.channel = None
+        self.task = None
+
+    @property
+    def serving(self) -> bool:
+        # UNKNOWN (not heard from yet, or the stream just broke) counts as down: falling back is cheap,
+        # waiting on a dead worker costs the full remote timeout
+        return self.status == SERVING
+
+    async def start(self):
+        self.channel = grpc.aio.insecure_channel(self.target, options=CHANNEL_OPTIONS)
+        self.task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+        if self.channel:
+            await self.channel.close()
+
+    def _set(self, status):
+        if status == self.status: return
+        logger.info(f"Worker {self.target}: {cache_pb2.HealthCheckResponse.ServingStatus.Name(self.status)} -> "
+                    f"{cache_pb2.HealthCheckResponse.ServingStatus.Name(status)}")
+        self.status, self.changed_at = status, time.time()
+        self.transitions += 1
+
+    async def _run(self):
+        stub = cache_pb2_grpc.HealthStub(self.channel)
+        backoff = self.poll_interval
+        while True:
+            try:
+                async for res in stub.Watch(cache_pb2.HealthCheckRequest(service="")):
+                    self._set(res.status)
+                    backoff = self.poll_interval
+                # The worker ended the stream (shutting down)
+                self._set(UNKNOWN)
+            except asyncio.CancelledError:
+                raise
+            except grpc.RpcError as e:
+                if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                    # Workers from before Watch: poll Check instead
+                    return await self._poll(stub)
+                self._set(NOT_SERVING)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.poll_interval * 5)
+
+    async def _poll(self, stub):
+        while True:
+            try:
+                res = await stub.Check(cache_pb2.HealthCheckRequest(service=""), timeout=self.poll_interval)
+                self._set(res.status)
+            except grpc.RpcError:
+                self._set(NOT_SERVING)
+            await asyncio.sleep(self.poll_interval)
+
+    def stats(self):
+        return {
+            "target": self.target,
+            "status": cache_pb2.HealthCheckResponse.ServingStatus.Name(self.status),
+            "since_s": round(time.time() - self.changed_at, 1),
+            "transitions": self.transitions,
+        }
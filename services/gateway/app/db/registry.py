@@ -0,0 +1,106 @@
+# services/gateway/app/db/registry.py
+# Cached view of the models table. Routing (vector table, quantization, worker pool) is data, not code:
+# a row inserted or updated in models fires pg_notify('helix_models') and every gateway reloads.
+import os, asyncio, logging
+import asyncpg
+from typing import Dict, NamedTuple, Optional
+
+logger = logging.getLogger("ModelRegistry")
+
+CHANNEL = "helix_models"
+
+class ModelSpec(NamedTuple):
+    model_id: str
+    dimension: int
+    table_name: str
+    quantization: str
+    worker_pool: str  # 'local' = gateway process pool, 'remote' = TitanCache workers
+    checkpoint: str
+
+    @property
+    def remote(self) -> bool:
+        return self.worker_pool != "local"
+
+class ModelRegistry:
+    _models: Dict[str, ModelSpec] = {}
+    _loaded = False
+    _listener = None
+    _task = None
+    _changed = None
+    _dsn = None
+
+    @classmethod
+    async def load(cls, conn):
+        rows = await conn.fetch("""
+            SELECT model_id, vector_dimension, table_name, quantization_level, worker_pool, checkpoint
+            FROM models
+        """)
+        cls._models = {
+            r['model_id']: ModelSpec(
+                r['model_id'], r['vector_dimension'], r['table_name'], (r['quantization_level'] or 'FP32').upper(),
+                r['worker_pool'] or 'local', r['checkpoint'] or f"facebook/{r['model_id']}"
+            ) for r in rows
+        }
+        cls._loaded = True
+        return cls._models
+
+    @classmethod
+    async def ensure_loaded(cls, conn):
+        if not cls._loaded: await cls.load(conn)
+
+    @classmethod
+    async def start(cls, db_url):
+        # LISTEN needs a connection of its own, outside the pool
+        cls._dsn, cls._changed = db_url, asyncio.Event()
+        cls._listener = await asyncpg.connect(db_url)
+        await cls._listener.add_listener(CHANNEL, lambda *_: cls._changed.set())
+        await cls.load(cls._listener)
+        cls._task = asyncio.create_task(cls._refresh_loop())
+
+    @classmethod
+    async def _refresh_loop(cls):
+        # Periodic reload as well, in case a notification is missed while the listener reconnects
+        interval = float(os.getenv("MODEL_REGISTRY_REFRESH_S", "60"))
+        while True:
+            try:
+                await asyncio.wait_for(cls._changed.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            cls._changed.clear()
+            try:
+                if cls._listener.is_closed():
+                    await cls.close_listener()
+                    cls._listener = await asyncpg.connect(cls._dsn)
+                    await cls._listener.add_listener(CHANNEL, lambda *_: cls._changed.set())
+                before = set(cls._models)
+                await cls.load(cls._listener)
+                if set(cls._models) != before:
+                    logger.info(f"Model registry now serves: {sorted(cls._models)}")
+            except Exception as e:
+                logger.warning(f"Model registry refresh failed: {e}")
+
+    @classmethod
+    async def close_listener(cls):
+        if cls._listener is not None and not cls._listener.is_closed():
+            await cls._listener.close()
+        cls._listener = None
+
+    @classmethod
+    async def close(cls):
+        if cls._task: cls._task.cancel()
+        await cls.close_listener()
+
+    @classmethod
+    def get(cls, model_id: str) -> ModelSpec:
+        spec = cls._models.get(model_id)
+        if spec is None:
+            raise ValueError(f"Unknown model_id '{model_id}'. Registered: {', '.join(sorted(cls._models))}")
+        return spec
+
+    @classmethod
+    def find(cls, model_id: str) -> Optional[ModelSpec]:
+        return cls._models.get(model_id)
+
+    @classmethod
+    def all(cls) -> Dict[str, ModelSpec]:
+        return dict(cls._models)
@@ -1,89 +1,406 @@
 # services/gateway/app/db/repository.py
-import psycopg2
-from psycopg2 import pool, sql
-from psycopg2.extras import RealDictCursor
+import asyncpg
+from pgvector.asyncpg import register_vector
 import json
 import os
+import numpy as np
+from app.db.registry import ModelRegistry
+
+def _vector_literal(vector):
+    return "[" + ",".join(map(str, np.asarray(vector, dtype=np.float32))) + "]"
+
+def _filter_clause(filters, first_param):
+    # filters: organism (exact), min_confidence, exclude_fallback; columns live on the vector table
+    conditions, params = [], []
+    filters = filters or {}
+    if filters.get("organism"):
+        params.append(filters["organism"])
+        conditions.append(f"v.organism = ${first_param + len(params) - 1}")
+    if filters.get("min_confidence") is not None:
+        params.append(float(filters["min_confidence"]))
+        conditions.append(f"v.confidence_score >= ${first_param + len(params) - 1}")
+    if filters.get("exclude_fallback"):
+        conditions.append("NOT v.is_fallback")
+    return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+def _upsert_vectors_sql(table_name, source_sql):
+    # Filter columns are always taken from embedding_metadata so both tables agree
+    return f"""
+        INSERT INTO "{table_name}" (metadata_id, vector, organism, confidence_score, is_fallback)
+        SELECT s.metadata_id, s.vector, m.organism, m.confidence_score, m.is_fallback
+        FROM ({source_sql}) s
+        JOIN embedding_metadata m ON m.id = s.metadata_id
+        ON CONFLICT (metadata_id) DO UPDATE
+        SET vector = EXCLUDED.vector,
+            organism = EXCLUDED.organism,
+            confidence_score = EXCLUDED.confidence_score,
+            is_fallback = EXCLUDED.is_fallback,
+            updated_at = now()
+    """
+
+# Candidate depth per quantization level: the compact index returns limit * factor rows,
+# which are reranked on the fp32 column. Binary codes are coarse, so they need the deepest pool.
+RERANK_FACTORS = {"FP32": 1, "FP16": 2, "BINARY": 10}
+# pgvector rejects hnsw.ef_search outside 1..1000
+EF_SEARCH_MAX = 1000
+
+def _scan_distance(level, dim, query_sql):
+    # Must match the index expression created by apply_vector_quantization() in schema.sql
+    if level == "BINARY":
+        return f"binary_quantize(v.vector)::bit({dim}) <~> binary_quantize({query_sql})::bit({dim})"
+    if level == "FP16":
+        return f"v.vector::halfvec({dim}) <=> {query_sql}::halfvec({dim})"
+    if level != "FP32":
+        raise ValueError(f"Unsupported quantization level {level}: expected FP32, FP16 or BINARY")
+    return f"v.vector <=> {query_sql}"
 
 class DatabasePool:
     _pool = None
 
     @classmethod
-    def get_pool(cls, db_url):
+    async def get_pool(cls, db_url):
         if cls._pool is None:
-            cls._pool = psycopg2.pool.SimpleConnectionPool(1, 20, db_url)
+            cls._pool = await asyncpg.create_pool(
+                db_url,
+                min_size=int(os.getenv("DB_POOL_MIN", "1")),
+                max_size=int(os.getenv("DB_POOL_MAX", "20")),
+                init=register_vector
+            )
         return cls._pool
 
+    @classmethod
+    async def close(cls):
+        if cls._pool is not None:
+            await cls._pool.close()
+            cls._pool = None
+
 class DatabaseContext:
     def __init__(self, db_url):
-        self.pool = DatabasePool.get_pool(db_url)
+        self.db_url = db_url
+        self.pool = None
         self.conn = None
-    def __enter__(self):
-        self.conn = self.pool.getconn()
+    async def __aenter__(self):
+        self.pool = await DatabasePool.get_pool(self.db_url)
+        self.conn = await self.pool.acquire()
         return EmbeddingRepository(self.conn)
-    def __exit__(self, exc_type, exc_val, exc_tb):
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.conn:
-            self.pool.putconn(self.conn)
+            await self.pool.release(self.conn)
 
 class EmbeddingRepository:
     def __init__(self, conn):
         self.conn = conn
 
-    def store_rich_embedding(self, seq_hash, model_id, vector_data, biological_data, confidence_score, is_fallback=False):
+    async def get_model(self, model_id):
+        # Scripts without a running gateway (bench/) load the registry on first use
+        await ModelRegistry.ensure_loaded(self.conn)
+        return ModelRegistry.get(model_id)
+
+    async def _candidate_scan(self, spec, limit, rerank_factor, query_sql):
+        factor = rerank_factor or RERANK_FACTORS.get(spec.quantization, 1)
+        return _scan_distance(spec.quantization, spec.dimension, query_sql), limit * factor
+
+    async def store_rich_embedding(self, seq_hash, model_id, vector_data, biological_data, confidence_score, requested_model_id=None):
+        # requested_model_id: the model the caller asked for; a different model_id marks a fallback row
+        is_fallback = requested_model_id is not None and requested_model_id != model_id
         vector_list = json.loads(vector_data) if isinstance(vector_data, str) else vector_data
-        with self.conn.cursor() as cur:
+        async with self.conn.transaction():
             query_meta = """
-                INSERT INTO embedding_metadata 
-                (sequence_hash, model_id, confidence_score, is_fallback, sequence_text, 
+                INSERT INTO embedding_metadata
+                (sequence_hash, model_id, confidence_score, is_fallback, requested_model_id, sequence_text,
                  primary_accession, protein_name, organism, function_text, binding_sites, pdb_ids)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (sequence_hash, model_id) DO UPDATE 
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11::jsonb, $12::jsonb)
+                ON CONFLICT (sequence_hash, model_id) DO UPDATE
                 SET confidence_score = EXCLUDED.confidence_score,
                     is_fallback = EXCLUDED.is_fallback,
+                    requested_model_id = EXCLUDED.requested_model_id,
                     protein_name = EXCLUDED.protein_name,
                     pdb_ids = EXCLUDED.pdb_ids,
                     binding_sites = EXCLUDED.binding_sites
                 RETURNING id;
             """
-            cur.execute(query_meta, (
-                seq_hash, model_id, confidence_score, is_fallback, biological_data['sequence'],
+            meta_id = await self.conn.fetchval(query_meta,
+                seq_hash, model_id, confidence_score, is_fallback, requested_model_id if is_fallback else None, biological_data['sequence'],
                 biological_data.get('accession'), biological_data.get('name'),
                 biological_data.get('organism'), biological_data.get('function'),
                 json.dumps(biological_data.get('annotations', [])),
                 json.dumps(biological_data.get('pdb_ids', []))
-            ))
-            meta_id = cur.fetchone()[0]
-            table_name = 'vectors_esm2_8m' if '8M' in model_id else 'vectors_esm2_650m'
-            query_vec = sql.SQL("INSERT INTO {} (metadata_id, vector) VALUES (%s, %s) ON CONFLICT (metadata_id) DO UPDATE SET vector = EXCLUDED.vector;").format(sql.Identifier(table_name))
-            cur.execute(query_vec, (meta_id, vector_list))
-            self.conn.commit()
-
-    def find_similar(self, vector, model_id, limit=5):
-        table_name = 'vectors_esm2_650m' if '650M' in model_id else 'vectors_esm2_8m'
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            query = sql.SQL("""
-                SELECT m.primary_accession, m.protein_name, m.organism, m.is_fallback,
-                       (v.vector <=> %s::vector) as distance
-                FROM {} v
-                JOIN embedding_metadata m ON v.metadata_id = m.id
-                WHERE m.model_id = %s
-                ORDER BY distance ASC LIMIT %s
-            """).format(sql.Identifier(table_name))
-            cur.execute(query, (vector, model_id, limit))
-            return cur.fetchall()
-
-    def get_embedding_by_accession(self, accession: str, model_id: str):
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT * FROM embedding_metadata WHERE primary_accession = %s LIMIT 1", (accession,))
-            row = cur.fetchone()
-            if not row: return None
-            # Fix json loading
-            for key in ['pdb_ids', 'binding_sites']:
-                if row.get(key) and isinstance(row[key], str):
-                    row[key] = json.loads(row[key])
-            return row
-            
-    def get_all_summaries(self, limit=100):
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT primary_accession, protein_name, organism, is_fallback, model_id FROM embedding_metadata LIMIT %s", (limit,))
-            return cur.fetchall()
\ No newline at end of file
+            )
+            table_name = (await self.get_model(model_id)).table_name
+            query_vec = _upsert_vectors_sql(table_name, "SELECT $1::integer AS metadata_id, $2::vector AS vector")
+            await self.conn.execute(query_vec, meta_id, vector_list)
+        return meta_id
+
+    async def store_rich_embeddings_bulk(self, records):
+        # records: (seq_hash, model_id, vector, biological_data, confidence_score, requested_model_id)
+        # ON CONFLICT cannot touch the same row twice in one statement, so keep the last record per key
+        latest = {(r[0], r[1]): r for r in records}
+        rows = list(latest.values())
+        if not rows: return []
+        # Only a row standing in for another model keeps the requested id
+        requested = [r[5] if r[5] not in (None, r[1]) else None for r in rows]
+
+        async with self.conn.transaction():
+            returned = await self.conn.fetch("""
+                INSERT INTO embedding_metadata
+                (sequence_hash, model_id, confidence_score, is_fallback, requested_model_id, sequence_text,
+                 primary_accession, protein_name, organism, function_text, binding_sites, pdb_ids)
+                SELECT * FROM unnest(
+                    $1::bpchar[], $2::varchar[], $3::float8[], $4::bool[], $5::varchar[], $6::text[],
+                    $7::varchar[], $8::varchar[], $9::varchar[], $10::text[], $11::jsonb[], $12::jsonb[]
+                )
+                ON CONFLICT (sequence_hash, model_id) DO UPDATE
+                SET confidence_score = EXCLUDED.confidence_score,
+                    is_fallback = EXCLUDED.is_fallback,
+                    requested_model_id = EXCLUDED.requested_model_id,
+                    protein_name = EXCLUDED.protein_name,
+                    pdb_ids = EXCLUDED.pdb_ids,
+                    binding_sites = EXCLUDED.binding_sites
+                RETURNING id, sequence_hash, model_id
+            """,
+                [r[0] for r in rows], [r[1] for r in rows], [r[4] for r in rows], [m is not None for m in requested], requested,
+                [r[3]['sequence'] for r in rows], [r[3].get('accession') for r in rows],
+                [r[3].get('name') for r in rows], [r[3].get('organism') for r in rows],
+                [r[3].get('function') for r in rows],
+                [json.dumps(r[3].get('annotations', [])) for r in rows],
+                [json.dumps(r[3].get('pdb_ids', [])) for r in rows],
+            )
+
+            # Match ids back to vectors, then COPY (binary, via the pgvector codec) into a staging table
+            by_table = {}
+            for row in returned:
+                table_name = (await self.get_model(row['model_id'])).table_name
+                by_table.setdefault(table_name, []).append((row['id'], latest[(row['sequence_hash'], row['model_id'])][2]))
+            for table_name, vectors in by_table.items():
+                staging = f"staging_{table_name}"
+                await self.conn.execute(f'CREATE TEMP TABLE IF NOT EXISTS "{staging}" (LIKE "{table_name}") ON COMMIT DROP')
+                await self.conn.copy_records_to_table(staging, records=vectors, columns=["metadata_id", "vector"])
+                await self.conn.execute(_upsert_vectors_sql(table_name, f'SELECT metadata_id, vector FROM "{staging}"'))
+        # (metadata_id, model_id, vector) so callers can feed the in-process index
+        return [(row['id'], row['model_id'], latest[(row['sequence_hash'], row['model_id'])][2]) for row in returned]
+
+    async def existing_hashes(self, seq_hashes, model_id):
+        rows = await self.conn.fetch(
+            "SELECT sequence_hash FROM embedding_metadata WHERE model_id = $1 AND sequence_hash = ANY($2::bpchar[])",
+            model_id, list(seq_hashes)
+        )
+        return {row['sequence_hash'] for row in rows}
+
+    async def get_vector(self, seq_hash, model_id):
+        table_name = (await self.get_model(model_id)).table_name
+        query = f"""
+            SELECT v.vector, m.confidence_score
+            FROM embedding_metadata m
+            JOIN "{table_name}" v ON v.metadata_id = m.id
+            WHERE m.sequence_hash = $1 AND m.model_id = $2
+        """
+        row = await self.conn.fetchrow(query, seq_hash, model_id)
+        return dict(row) if row else None
+
+    async def iter_vectors(self, model_id, after_id=0, batch_size=10000):
+        # Keyset pagination on metadata_id: constant cost per page, resumable from any id
+        table_name = (await self.get_model(model_id)).table_name
+        while True:
+            rows = await self.conn.fetch(
+                f'SELECT metadata_id, vector FROM "{table_name}" WHERE metadata_id > $1 ORDER BY metadata_id LIMIT $2',
+                after_id, batch_size
+            )
+            if not rows: return
+            yield rows
+            after_id = rows[-1]['metadata_id']
+
+    async def iter_updated_vectors(self, model_id, since, batch_size=10000):
+        # Rows inserted or re-upserted since a point in time; keyset on (updated_at, metadata_id)
+        table_name = (await self.get_model(model_id)).table_name
+        after_id = 0
+        while True:
+            rows = await self.conn.fetch(
+                f'''SELECT metadata_id, vector, updated_at FROM "{table_name}"
+                    WHERE (updated_at, metadata_id) > ($1, $2) ORDER BY updated_at, metadata_id LIMIT $3''',
+                since, after_id, batch_size
+            )
+            if not rows: return
+            yield rows
+            since, after_id = rows[-1]['updated_at'], rows[-1]['metadata_id']
+
+    async def get_metadata_by_ids(self, ids):
+        rows = await self.conn.fetch(
+            "SELECT id, primary_accession, protein_name, organism, is_fallback FROM embedding_metadata WHERE id = ANY($1::int[])",
+            [int(i) for i in ids]
+        )
+        return {row['id']: dict(row) for row in rows}
+
+    async def backfill_sources(self, model_id, after_id, mode="missing", limit=1000):
+        # One keyset page of backfill input -> (rows, page_end): a single representative row (lowest id) per sequence,
+        # so a sequence stored under several models is embedded once. Short independent queries,
+        # so a long job never holds a snapshot open.
+        table_name = (await self.get_model(model_id)).table_name
+        # "all" never mentions model_id, so it is only bound in "missing" mode (an unused $n has no type)
+        args, missing = [after_id, limit], ""
+        if mode == "missing":
+            args.append(model_id)
+            missing = f"""
+            AND NOT EXISTS (
+                SELECT 1 FROM embedding_metadata t JOIN "{table_name}" v ON v.metadata_id = t.id
+                WHERE t.sequence_hash = m.sequence_hash AND t.model_id = $3
+            )"""
+        rows = await self.conn.fetch(f"""
+            SELECT m.id, m.sequence_hash, m.sequence_text, m.primary_accession, m.protein_name,
+                   m.organism, m.function_text, m.binding_sites, m.pdb_ids
+            FROM (
+                SELECT * FROM embedding_metadata WHERE id > $1 ORDER BY id LIMIT $2
+            ) m
+            WHERE m.id = (SELECT min(d.id) FROM embedding_metadata d WHERE d.sequence_hash = m.sequence_hash)
+            {missing}
+            ORDER BY m.id
+        """, *args)
+        # Where the next page starts, even when every row of this one was filtered out; None at the end
+        page_end = await self.conn.fetchval(
+            "SELECT max(id) FROM (SELECT id FROM embedding_metadata WHERE id > $1 ORDER BY id LIMIT $2) p", after_id, limit)
+        return [dict(row) for row in rows], page_end
+
+    async def create_backfill_job(self, job_id, model_id, mode):
+        row = await self.conn.fetchrow(
+            "INSERT INTO backfill_jobs (job_id, model_id, mode) VALUES ($1, $2, $3) RETURNING *", job_id, model_id, mode)
+        return dict(row)
+
+    async def get_backfill_job(self, job_id):
+        row = await self.conn.fetchrow("SELECT * FROM backfill_jobs WHERE job_id = $1", job_id)
+        return dict(row) if row else None
+
+    async def list_backfill_jobs(self, statuses=None):
+        if statuses:
+            rows = await self.conn.fetch("SELECT * FROM backfill_jobs WHERE status = ANY($1::varchar[]) ORDER BY created_at", list(statuses))
+        else:
+            rows = await self.conn.fetch("SELECT * FROM backfill_jobs ORDER BY created_at DESC")
+        return [dict(row) for row in rows]
+
+    async def set_backfill_status(self, job_id, status, error=None):
+        await self.conn.execute(
+            "UPDATE backfill_jobs SET status = $2, error = $3, updated_at = now() WHERE job_id = $1", job_id, status, error)
+
+    async def store_backfill_batch(self, job_id, records, last_id, scanned, fallback_skipped):
+        # Vectors and checkpoint commit together: after a crash the job resumes exactly after this batch
+        async with self.conn.transaction():
+            stored = await self.store_rich_embeddings_bulk(records) if records else []
+            await self.conn.execute("""
+                UPDATE backfill_jobs
+                SET last_id = $2, scanned = scanned + $3, stored = stored + $4,
+                    fallback_skipped = fallback_skipped + $5, updated_at = now()
+                WHERE job_id = $1
+            """, job_id, last_id, scanned, len(stored), fallback_skipped)
+        return stored
+
+    async def fallback_candidates(self, after_id, limit=100):
+        # Fallback rows still waiting for their requested model, in id order (keyset: id > after_id).
+        # Rows that predate requested_model_id cannot be upgraded and are left alone.
+        rows = await self.conn.fetch("""
+            SELECT f.id, f.sequence_hash, f.requested_model_id, f.sequence_text, f.primary_accession, f.protein_name,
+                   f.organism, f.function_text, f.binding_sites, f.pdb_ids
+            FROM embedding_metadata f
+            WHERE f.is_fallback AND f.requested_model_id IS NOT NULL AND f.id > $1
+            ORDER BY f.id
+            LIMIT $2
+        """, after_id, limit)
+        return [dict(row) for row in rows]
+
+    async def clear_upgraded_fallbacks(self):
+        # Fallback rows whose requested model was stored some other way (re-ingest, backfill) need no recompute
+        result = await self.conn.execute("""
+            UPDATE embedding_metadata f SET is_fallback = FALSE, requested_model_id = NULL
+            WHERE f.is_fallback AND EXISTS (
+                SELECT 1 FROM embedding_metadata t WHERE t.sequence_hash = f.sequence_hash AND t.model_id = f.requested_model_id
+            )
+        """)
+        return int(result.split()[-1])
+
+    async def store_fallback_upgrades(self, records, fallback_ids):
+        # Upgraded vectors and the flag flip commit together; the old row stays as a genuine vector for its own model
+        async with self.conn.transaction():
+            stored = await self.store_rich_embeddings_bulk(records)
+            await self.conn.execute(
+                "UPDATE embedding_metadata SET is_fallback = FALSE, requested_model_id = NULL WHERE id = ANY($1::int[])", fallback_ids)
+        return stored
+
+    async def _apply_search_settings(self, filters, ef_search, iterative_scan, candidates):
+        # SET LOCAL equivalents: only live for the surrounding transaction
+        # HNSW never returns more than ef_search rows, so the rerank pool sets a floor (up to pgvector's maximum)
+        if ef_search or candidates > 40:
+            ef = min(max(int(ef_search or 40), candidates), EF_SEARCH_MAX)
+            await self.conn.execute("SELECT set_config('hnsw.ef_search', $1, true)", str(ef))
+        # A filtered HNSW walk stops after ef_search candidates; iterative scan keeps going until LIMIT is met
+        mode = iterative_scan or ("relaxed_order" if filters else None)
+        if mode:
+            await self.conn.execute("SELECT set_config('hnsw.iterative_scan', $1, true)", mode)
+
+    async def find_similar(self, vector, model_id, limit=5, filters=None, ef_search=None, iterative_scan=None, rerank_factor=None):
+        spec = await self.get_model(model_id)
+        table_name = spec.table_name
+        scan, candidates = await self._candidate_scan(spec, limit, rerank_factor, "$1::vector")
+        where, params = _filter_clause(filters, first_param=4)
+        # Filter inside the (possibly quantized) index scan, rerank candidates on the fp32 column,
+        # hydrate metadata only for the final rows; outer sort fixes relaxed_order
+        query = f"""
+            SELECT m.primary_accession, m.protein_name, m.organism, m.is_fallback, c.distance
+            FROM (
+                SELECT s.metadata_id, (s.vector <=> $1::vector) AS distance
+                FROM (
+                    SELECT v.metadata_id, v.vector
+                    FROM "{table_name}" v
+                    {where}
+                    ORDER BY {scan} LIMIT $3
+                ) s
+                ORDER BY distance ASC LIMIT $2
+            ) c
+            JOIN embedding_metadata m ON c.metadata_id = m.id
+            ORDER BY c.distance ASC
+        """
+        async with self.conn.transaction():
+            await self._apply_search_settings(filters, ef_search, iterative_scan, candidates)
+            rows = await self.conn.fetch(query, vector, limit, candidates, *params)
+        return [dict(r) for r in rows]
+
+    async def find_similar_batch(self, vectors, model_id, limit=5, filters=None, ef_search=None, iterative_scan=None, rerank_factor=None):
+        # One round trip for many queries: every query vector drives its own HNSW scan via LATERAL
+        spec = await self.get_model(model_id)
+        table_name = spec.table_name
+        scan, candidates = await self._candidate_scan(spec, limit, rerank_factor, "q.vec")
+        where, params = _filter_clause(filters, first_param=4)
+        query = f"""
+            SELECT q.idx, m.primary_accession, m.protein_name, m.organism, m.is_fallback, r.distance
+            FROM (SELECT u.vec::vector AS vec, u.idx FROM unnest($1::text[]) WITH ORDINALITY AS u(vec, idx)) q
+            CROSS JOIN LATERAL (
+                SELECT s.metadata_id, (s.vector <=> q.vec) AS distance
+                FROM (
+                    SELECT v.metadata_id, v.vector
+                    FROM "{table_name}" v
+                    {where}
+                    ORDER BY {scan} LIMIT $3
+                ) s
+                ORDER BY distance ASC LIMIT $2
+            ) r
+            JOIN embedding_metadata m ON r.metadata_id = m.id
+            ORDER BY q.idx, r.distance
+        """
+        async with self.conn.transaction():
+            await self._apply_search_settings(filters, ef_search, iterative_scan, candidates)
+            rows = await self.conn.fetch(query, [_vector_literal(v) for v in vectors], limit, candidates, *params)
+        results = [[] for _ in vectors]
+        for row in rows:
+            row = dict(row)
+            results[row.pop('idx') - 1].append(row)
+        return results
+
+    async def get_embedding_by_accession(self, accession: str, model_id: str):
+        row = await self.conn.fetchrow("SELECT * FROM embedding_metadata WHERE primary_accession = $1 LIMIT 1", accession)
+        if not row: return None
+        row = dict(row)
+        # Fix json loading
+        for key in ['pdb_ids', 'binding_sites']:
+            if row.get(key) and isinstance(row[key], str):
+                row[key] = json.loads(row[key])
+        return row
+
+    async def get_all_summaries(self, limit=100):
+        rows = await self.conn.fetch("SELECT primary_accession, protein_name, organism, is_fallback, model_id FROM embedding_metadata LIMIT $1", limit)
+        return [dict(r) for r in rows]
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0b\x63\x61\x63he.proto\x12\x13\x63om.titancache.grpc\"%\n\x12HealthCheckRequest\x12\x0f\n\x07service\x18\x01 \x01(\t\"\x99\x01\n\x13HealthCheckResponse\x12\x46\n\x06status\x18\x01 \x01(\x0e\x32\x36.com.titancache.grpc.HealthCheckResponse.ServingStatus\":\n\rServingStatus\x12\x0b\n\x07UNKNOWN\x10\x00\x12\x0b\n\x07SERVING\x10\x01\x12\x0f\n\x0bNOT_SERVING\x10\x02\"+\n\nKeyRequest\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x10\n\x08model_id\x18\x02 \x01(\t\"m\n\rValueResponse\x12\r\n\x05value\x18\x01 \x01(\t\x12\r\n\x05\x66ound\x18\x02 \x01(\x08\x12\x10\n\x08model_id\x18\x03 \x01(\t\x12\x12\n\ncreated_at\x18\x04 \x01(\t\x12\x18\n\x10\x63onfidence_score\x18\x05 \x01(\x02\"T\n\nCacheEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t\x12\x10\n\x08model_id\x18\x03 \x01(\t\x12\x18\n\x10\x63onfidence_score\x18\x04 \x01(\x02\"?\n\x0cLeaseRequest\x12\x16\n\x0emax_batch_size\x18\x01 \x01(\x05\x12\x17\n\x0ftarget_model_id\x18\x02 \x01(\t\"9\n\rLeaseResponse\x12(\n\x05tasks\x18\x01 \x03(\x0b\x32\x19.com.titancache.grpc.Task\"\xa0\x01\n\x0b\x42\x61tchResult\x12\x37\n\x07results\x18\x01 \x03(\x0b\x32&.com.titancache.grpc.BatchResult.Entry\x12\x10\n\x08model_id\x18\x02 \x01(\t\x1a\x46\n\x05\x45ntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x16\n\x0e\x65mbedding_json\x18\x02 \x01(\t\x12\x18\n\x10\x63onfidence_score\x18\x03 \x01(\x02\"\x0e\n\x0c\x45mptyRequest\" \n\rEmptyResponse\x12\x0f\n\x07message\x18\x01 \x01(\t\"8\n\x04Task\x12\x0c\n\x04hash\x18\x01 \x01(\t\x12\x10\n\x08sequence\x18\x02 \x01(\t\x12\x10\n\x08model_id\x18\x03 \x01(\t2\xed\x03\n\x0c\x43\x61\x63heService\x12J\n\x03Put\x12\x1f.com.titancache.grpc.CacheEntry\x1a\".com.titancache.grpc.EmptyResponse\x12J\n\x03Get\x12\x1f.com.titancache.grpc.KeyRequest\x1a\".com.titancache.grpc.ValueResponse\x12N\n\x05\x43lear\x12!.com.titancache.grpc.EmptyRequest\x1a\".com.titancache.grpc.EmptyResponse\x12K\n\nSubmitTask\x12\x19.com.titancache.grpc.Task\x1a\".com.titancache.grpc.EmptyResponse\x12S\n\nLeaseTasks\x12!.com.titancache.grpc.LeaseRequest\x1a\".com.titancache.grpc.LeaseResponse\x12S\n\x0bSubmitBatch\x12 .com.titancache.grpc.BatchResult\x1a\".com.titancache.grpc.EmptyResponse2\xc2\x01\n\x06Health\x12Z\n\x05\x43heck\x12\'.com.titancache.grpc.HealthCheckRequest\x1a(.com.titancache.grpc.HealthCheckResponse\x12\\\n\x05Watch\x12\'.com.titancache.grpc.HealthCheckRequest\x1a(.com.titancache.grpc.HealthCheckResponse0\x01\x42\x02P\x01\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0b\x63\x61\x63he.proto\x12\x13\x63om.titancache.grpc\"%\n\x12HealthCheckRequest\x12\x0f\n\x07service\x18\x01 \x01(\t\"\x99\x01\n\x13HealthCheckResponse\x12\x46\n\x06status\x18\x01 \x01(\x0e\x32\x36.com.titancache.grpc.HealthCheckResponse.ServingStatus\":\n\rServingStatus\x12\x0b\n\x07UNKNOWN\x10\x00\x12\x0b\n\x07SERVING\x10\x01\x12\x0f\n\x0bNOT_SERVING\x10\x02\"B\n\nKeyRequest\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x10\n\x08model_id\x18\x02 \x01(\t\x12\x15\n\raccept_binary\x18\x03 \x01(\x08\"X\n\x0c\x41waitRequest\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x10\n\x08model_id\x18\x02 \x01(\t\x12\x12\n\ntimeout_ms\x18\x03 \x01(\x05\x12\x15\n\raccept_binary\x18\x04 \x01(\x08\"\xda\x01\n\rValueResponse\x12\r\n\x05value\x18\x01 \x01(\t\x12\r\n\x05\x66ound\x18\x02 \x01(\x08\x12\x10\n\x08model_id\x18\x03 \x01(\t\x12\x12\n\ncreated_at\x18\x04 \x01(\t\x12\x18\n\x10\x63onfidence_score\x18\x05 \x01(\x02\x12\x0e\n\x06vector\x18\x06 \x01(\x0c\x12\x35\n\x08\x65ncoding\x18\x07 \x01(\x0e\x32#.com.titancache.grpc.VectorEncoding\x12\x15\n\rdead_lettered\x18\x08 \x01(\x08\x12\r\n\x05\x65rror\x18\t \x01(\t\"\x9b\x01\n\nCacheEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t\x12\x10\n\x08model_id\x18\x03 \x01(\t\x12\x18\n\x10\x63onfidence_score\x18\x04 \x01(\x02\x12\x0e\n\x06vector\x18\x05 \x01(\x0c\x12\x35\n\x08\x65ncoding\x18\x06 \x01(\x0e\x32#.com.titancache.grpc.VectorEncoding\"R\n\x0cLeaseRequest\x12\x16\n\x0emax_batch_size\x18\x01 \x01(\x05\x12\x17\n\x0ftarget_model_id\x18\x02 \x01(\t\x12\x11\n\tworker_id\x18\x03 \x01(\t\"K\n\rLeaseResponse\x12(\n\x05tasks\x18\x01 \x03(\x0b\x32\x19.com.titancache.grpc.Task\x12\x10\n\x08lease_ms\x18\x02 \x01(\x05\"E\n\x10HeartbeatRequest\x12\x11\n\tworker_id\x18\x01 \x01(\t\x12\x10\n\x08model_id\x18\x02 \x01(\t\x12\x0c\n\x04keys\x18\x03 \x03(\t\"!\n\x11HeartbeatResponse\x12\x0c\n\x04lost\x18\x01 \x03(\t\"R\n\x0eReleaseRequest\x12\x11\n\tworker_id\x18\x01 \x01(\t\x12\x10\n\x08model_id\x18\x02 \x01(\t\x12\x0c\n\x04keys\x18\x03 \x03(\t\x12\r\n\x05\x65rror\x18\x04 \x01(\t\"\xa9\x01\n\x0e\x44\x65\x61\x64LetterList\x12:\n\x07\x65ntries\x18\x01 \x03(\x0b\x32).com.titancache.grpc.DeadLetterList.Entry\x1a[\n\x05\x45ntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x10\n\x08model_id\x18\x02 \x01(\t\x12\x10\n\x08\x61ttempts\x18\x03 \x01(\x05\x12\r\n\x05\x65rror\x18\x04 \x01(\t\x12\x12\n\ndead_at_ms\x18\x05 \x01(\x03\"\xeb\x01\n\x0b\x42\x61tchResult\x12\x37\n\x07results\x18\x01 \x03(\x0b\x32&.com.titancache.grpc.BatchResult.Entry\x12\x10\n\x08model_id\x18\x02 \x01(\t\x1a\x90\x01\n\x05\x45ntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x16\n\x0e\x65mbedding_json\x18\x02 \x01(\t\x12\x18\n\x10\x63onfidence_score\x18\x03 \x01(\x02\x12\x11\n\tembedding\x18\x04 \x01(\x0c\x12\x35\n\x08\x65ncoding\x18\x05 \x01(\x0e\x32#.com.titancache.grpc.VectorEncoding\"\x0e\n\x0c\x45mptyRequest\" \n\rEmptyResponse\x12\x0f\n\x07message\x18\x01 \x01(\t\"\x81\x01\n\x04Task\x12\x0c\n\x04hash\x18\x01 \x01(\t\x12\x10\n\x08sequence\x18\x02 \x01(\t\x12\x10\n\x08model_id\x18\x03 \x01(\t\x12/\n\x08priority\x18\x04 \x01(\x0e\x32\x1d.com.titancache.grpc.Priority\x12\x16\n\x0e\x65nqueued_at_ms\x18\x05 \x01(\x03\"J\n\x0bStreamHello\x12\x11\n\tworker_id\x18\x01 \x01(\t\x12\x10\n\x08model_id\x18\x02 \x01(\t\x12\x16\n\x0emax_batch_size\x18\x03 \x01(\x05\"\xd2\x01\n\rWorkerMessage\x12/\n\x05hello\x18\x01 \x01(\x0b\x32 .com.titancache.grpc.StreamHello\x12\x31\n\x07results\x18\x02 \x01(\x0b\x32 .com.titancache.grpc.BatchResult\x12\x0f\n\x07\x63redits\x18\x03 \x01(\x05\x12\x16\n\x0eheartbeat_keys\x18\x04 \x03(\t\x12\x34\n\x07release\x18\x05 \x01(\x0b\x32#.com.titancache.grpc.ReleaseRequest\"G\n\tTaskBatch\x12(\n\x05tasks\x18\x01 \x03(\x0b\x32\x19.com.titancache.grpc.Task\x12\x10\n\x08lease_ms\x18\x02 \x01(\x05\"\xbd\x02\n\nQueueStats\x12\x35\n\x06models\x18\x01 \x03(\x0b\x32%.com.titancache.grpc.QueueStats.Model\x12\x14\n\x0c\x64\x65\x61\x64_letters\x18\x02 \x01(\x05\x1a\xe1\x01\n\x05Model\x12\x10\n\x08model_id\x18\x01 \x01(\t\x12\x19\n\x11interactive_depth\x18\x02 \x01(\x05\x12\x12\n\nbulk_depth\x18\x03 \x01(\x05\x12\x15\n\ractive_leases\x18\x04 \x01(\x05\x12\x19\n\x11streaming_workers\x18\x05 \x01(\x05\x12\x14\n\x0cleased_total\x18\x06 \x01(\x03\x12\x19\n\x11queue_wait_p50_ms\x18\x07 \x01(\x01\x12\x19\n\x11queue_wait_p99_ms\x18\x08 \x01(\x01\x12\x19\n\x11queue_wait_max_ms\x18\t \x01(\x01*:\n\x0eVectorEncoding\x12\x08\n\x04JSON\x10\x00\x12\x0e\n\nFLOAT32_LE\x10\x01\x12\x0e\n\nFLOAT16_LE\x10\x02*%\n\x08Priority\x12\x0f\n\x0bINTERACTIVE\x10\x00\x12\x08\n\x04\x42ULK\x10\x01\x32\xff\x07\n\x0c\x43\x61\x63heService\x12J\n\x03Put\x12\x1f.com.titancache.grpc.CacheEntry\x1a\".com.titancache.grpc.EmptyResponse\x12J\n\x03Get\x12\x1f.com.titancache.grpc.KeyRequest\x1a\".com.titancache.grpc.ValueResponse\x12N\n\x05\x43lear\x12!.com.titancache.grpc.EmptyRequest\x1a\".com.titancache.grpc.EmptyResponse\x12K\n\nSubmitTask\x12\x19.com.titancache.grpc.Task\x1a\".com.titancache.grpc.EmptyResponse\x12S\n\nLeaseTasks\x12!.com.titancache.grpc.LeaseRequest\x1a\".com.titancache.grpc.LeaseResponse\x12S\n\x0bSubmitBatch\x12 .com.titancache.grpc.BatchResult\x1a\".com.titancache.grpc.EmptyResponse\x12Z\n\tHeartbeat\x12%.com.titancache.grpc.HeartbeatRequest\x1a&.com.titancache.grpc.HeartbeatResponse\x12W\n\x0cReleaseTasks\x12#.com.titancache.grpc.ReleaseRequest\x1a\".com.titancache.grpc.EmptyResponse\x12Y\n\x0fListDeadLetters\x12!.com.titancache.grpc.EmptyRequest\x1a#.com.titancache.grpc.DeadLetterList\x12U\n\x0bStreamTasks\x12\".com.titancache.grpc.WorkerMessage\x1a\x1e.com.titancache.grpc.TaskBatch(\x01\x30\x01\x12S\n\rGetQueueStats\x12!.com.titancache.grpc.EmptyRequest\x1a\x1f.com.titancache.grpc.QueueStats\x12T\n\x0b\x41waitResult\x12!.com.titancache.grpc.AwaitRequest\x1a\".com.titancache.grpc.ValueResponse2\xc2\x01\n\x06Health\x12Z\n\x05\x43heck\x12\'.com.titancache.grpc.HealthCheckRequest\x1a(.com.titancache.grpc.HealthCheckResponse\x12\\\n\x05Watch\x12\'.com.titancache.grpc.HealthCheckRequest\x1a(.com.titancache.grpc.HealthCheckResponse0\x01\x42\x02P\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -32,6 +32,10 @@ _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'cache_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   _globals['DESCRIPTOR']._loaded_options = None
   _globals['DESCRIPTOR']._serialized_options = b'P\001'
+  _globals['_VECTORENCODING']._serialized_start=2393
+  _globals['_VECTORENCODING']._serialized_end=2451
+  _globals['_PRIORITY']._serialized_start=2453
+  _globals['_PRIORITY']._serialized_end=2490
   _globals['_HEALTHCHECKREQUEST']._serialized_start=36
   _globals['_HEALTHCHECKREQUEST']._serialized_end=73
   _globals['_HEALTHCHECKRESPONSE']._serialized_start=76
@@ -39,27 +43,49 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_HEALTHCHECKRESPONSE_SERVINGSTATUS']._serialized_start=171
   _globals['_HEALTHCHECKRESPONSE_SERVINGSTATUS']._serialized_end=229
   _globals['_KEYREQUEST']._serialized_start=231
-  _globals['_KEYREQUEST']._serialized_end=274
-  _globals['_VALUERESPONSE']._serialized_start=276
-  _globals['_VALUERESPONSE']._serialized_end=385
-  _globals['_CACHEENTRY']._serialized_start=387
-  _globals['_CACHEENTRY']._serialized_end=471
-  _globals['_LEASEREQUEST']._serialized_start=473
-  _globals['_LEASEREQUEST']._serialized_end=536
-  _globals['_LEASERESPONSE']._serialized_start=538
-  _globals['_LEASERESPONSE']._serialized_end=595
-  _globals['_BATCHRESULT']._serialized_start=598
-  _globals['_BATCHRESULT']._serialized_end=758
-  _globals['_BATCHRESULT_ENTRY']._serialized_start=688
-  _globals['_BATCHRESULT_ENTRY']._serialized_end=758
-  _globals['_EMPTYREQUEST']._serialized_start=760
-  _globals['_EMPTYREQUEST']._serialized_end=774
-  _globals['_EMPTYRESPONSE']._serialized_start=776
-  _globals['_EMPTYRESPONSE']._serialized_end=808
-  _globals['_TASK']._serialized_start=810
-  _globals['_TASK']._serialized_end=866
-  _globals['_CACHESERVICE']._serialized_start=869
-  _globals['_CACHESERVICE']._serialized_end=1362
-  _globals['_HEALTH']._serialized_start=1365
-  _globals['_HEALTH']._serialized_end=1559
+  _globals['_KEYREQUEST']._serialized_end=297
+  _globals['_AWAITREQUEST']._serialized_start=299
+  _globals['_AWAITREQUEST']._serialized_end=387
+  _globals['_VALUERESPONSE']._serialized_start=390
+  _globals['_VALUERESPONSE']._serialized_end=608
+  _globals['_CACHEENTRY']._serialized_start=611
+  _globals['_CACHEENTRY']._serialized_end=766
+  _globals['_LEASEREQUEST']._serialized_start=768
+  _globals['_LEASEREQUEST']._serialized_end=850
+  _globals['_LEASERESPONSE']._serialized_start=852
+  _globals['_LEASERESPONSE']._serialized_end=927
+  _globals['_HEARTBEATREQUEST']._serialized_start=929
+  _globals['_HEARTBEATREQUEST']._serialized_end=998
+  _globals['_HEARTBEATRESPONSE']._serialized_start=1000
+  _globals['_HEARTBEATRESPONSE']._serialized_end=1033
+  _globals['_RELEASEREQUEST']._serialized_start=1035
+  _globals['_RELEASEREQUEST']._serialized_end=1117
+  _globals['_DEADLETTERLIST']._serialized_start=1120
+  _globals['_DEADLETTERLIST']._serialized_end=1289
+  _globals['_DEADLETTERLIST_ENTRY']._serialized_start=1198
+  _globals['_DEADLETTERLIST_ENTRY']._serialized_end=1289
+  _globals['_BATCHRESULT']._serialized_start=1292
+  _globals['_BATCHRESULT']._serialized_end=1527
+  _globals['_BATCHRESULT_ENTRY']._serialized_start=1383
+  _globals['_BATCHRESULT_ENTRY']._serialized_end=1527
+  _globals['_EMPTYREQUEST']._serialized_start=1529
+  _globals['_EMPTYREQUEST']._serialized_end=1543
+  _globals['_EMPTYRESPONSE']._serialized_start=1545
+  _globals['_EMPTYRESPONSE']._serialized_end=1577
+  _globals['_TASK']._serialized_start=1580
+  _globals['_TASK']._serialized_end=1709
+  _globals['_STREAMHELLO']._serialized_start=1711
+  _globals['_STREAMHELLO']._serialized_end=1785
+  _globals['_WORKERMESSAGE']._serialized_start=1788
+  _globals['_WORKERMESSAGE']._serialized_end=1998
+  _globals['_TASKBATCH']._serialized_start=2000
+  _globals['_TASKBATCH']._serialized_end=2071
+  _globals['_QUEUESTATS']._serialized_start=2074
+  _globals['_QUEUESTATS']._serialized_end=2391
+  _globals['_QUEUESTATS_MODEL']._serialized_start=2166
+  _globals['_QUEUESTATS_MODEL']._serialized_end=2391
+  _globals['_CACHESERVICE']._serialized_start=2493
+  _globals['_CACHESERVICE']._serialized_end=3516
+  _globals['_HEALTH']._serialized_start=3519
+  _globals['_HEALTH']._serialized_end=3713
 # @@protoc_insertion_point(module_scope)
@@ -64,6 +64,36 @@ class CacheServiceStub(object):
                 request_serializer=cache__pb2.BatchResult.SerializeToString,
                 response_deserializer=cache__pb2.EmptyResponse.FromString,
                 _registered_method=True)
+        self.Heartbeat = channel.unary_unary(
+                '/com.titancache.grpc.CacheService/Heartbeat',
+                request_serializer=cache__pb2.HeartbeatRequest.SerializeToString,
+                response_deserializer=cache__pb2.HeartbeatResponse.FromString,
+                _registered_method=True)
+        self.ReleaseTasks = channel.unary_unary(
+                '/com.titancache.grpc.CacheService/ReleaseTasks',
+                request_serializer=cache__pb2.ReleaseRequest.SerializeToString,
+                response_deserializer=cache__pb2.EmptyResponse.FromString,
+                _registered_method=True)
+        self.ListDeadLetters = channel.unary_unary(
+                '/com.titancache.grpc.CacheService/ListDeadLetters',
+                request_serializer=cache__pb2.EmptyRequest.SerializeToString,
+                response_deserializer=cache__pb2.DeadLetterList.FromString,
+                _registered_method=True)
+        self.StreamTasks = channel.stream_stream(
+                '/com.titancache.grpc.CacheService/StreamTasks',
+                request_serializer=cache__pb2.WorkerMessage.SerializeToString,
+                response_deserializer=cache__pb2.TaskBatch.FromString,
+                _registered_method=True)
+        self.GetQueueStats = channel.unary_unary(
+                '/com.titancache.grpc.CacheService/GetQueueStats',
+                request_serializer=cache__pb2.EmptyRequest.SerializeToString,
+                response_deserializer=cache__pb2.QueueStats.FromString,
+                _registered_method=True)
+        self.AwaitResult = channel.unary_unary(
+                '/com.titancache.grpc.CacheService/AwaitResult',
+                request_serializer=cache__pb2.AwaitRequest.SerializeToString,
+                response_deserializer=cache__pb2.ValueResponse.FromString,
+                _registered_method=True)
 
 
 class CacheServiceServicer(object):
@@ -105,6 +135,47 @@ class CacheServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def Heartbeat(self, request, context):
+        """Leases expire after lease_ms unless the holder heartbeats; expired or released tasks are
+        requeued until max attempts, then dead-lettered
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ReleaseTasks(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListDeadLetters(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StreamTasks(self, request_iterator, context):
+        """Persistent worker session: the server pushes tasks while the worker has credits (free slots),
+        the worker sends results, heartbeats and new credits back on the same stream
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetQueueStats(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def AwaitResult(self, request, context):
+        """Long-poll: returns as soon as the key is resolved, or found=false after timeout_ms
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_CacheServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -138,6 +209,36 @@ def add_CacheServiceServicer_to_server(servicer, server):
                     request_deserializer=cache__pb2.BatchResult.FromString,
                     response_serializer=cache__pb2.EmptyResponse.SerializeToString,
             ),
+            'Heartbeat': grpc.unary_unary_rpc_method_handler(
+                    servicer.Heartbeat,
+                    request_deserializer=cache__pb2.HeartbeatRequest.FromString,
+                    response_serializer=cache__pb2.HeartbeatResponse.SerializeToString,
+            ),
+            'ReleaseTasks': grpc.unary_unary_rpc_method_handler(
+                    servicer.ReleaseTasks,
+                    request_deserializer=cache__pb2.ReleaseRequest.FromString,
+                    response_serializer=cache__pb2.EmptyResponse.SerializeToString,
+            ),
+            'ListDeadLetters': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListDeadLetters,
+                    request_deserializer=cache__pb2.EmptyRequest.FromString,
+                    response_serializer=cache__pb2.DeadLetterList.SerializeToString,
+            ),
+            'StreamTasks': grpc.stream_stream_rpc_method_handler(
+                    servicer.StreamTasks,
+                    request_deserializer=cache__pb2.WorkerMessage.FromString,
+                    response_serializer=cache__pb2.TaskBatch.SerializeToString,
+            ),
+            'GetQueueStats': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetQueueStats,
+                    request_deserializer=cache__pb2.EmptyRequest.FromString,
+                    response_serializer=cache__pb2.QueueStats.SerializeToString,
+            ),
+            'AwaitResult': grpc.unary_unary_rpc_method_handler(
+                    servicer.AwaitResult,
+                    request_deserializer=cache__pb2.AwaitRequest.FromString,
+                    response_serializer=cache__pb2.ValueResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'com.titancache.grpc.CacheService', rpc_method_handlers)
@@ -311,6 +412,168 @@ class CacheService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def Heartbeat(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/com.titancache.grpc.CacheService/Heartbeat',
+            cache__pb2.HeartbeatRequest.SerializeToString,
+            cache__pb2.HeartbeatResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ReleaseTasks(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/com.titancache.grpc.CacheService/ReleaseTasks',
+            cache__pb2.ReleaseRequest.SerializeToString,
+            cache__pb2.EmptyResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListDeadLetters(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/com.titancache.grpc.CacheService/ListDeadLetters',
+            cache__pb2.EmptyRequest.SerializeToString,
+            cache__pb2.DeadLetterList.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def StreamTasks(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/com.titancache.grpc.CacheService/StreamTasks',
+            cache__pb2.WorkerMessage.SerializeToString,
+            cache__pb2.TaskBatch.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetQueueStats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/com.titancache.grpc.CacheService/GetQueueStats',
+            cache__pb2.EmptyRequest.SerializeToString,
+            cache__pb2.QueueStats.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def AwaitResult(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/com.titancache.grpc.CacheService/AwaitResult',
+            cache__pb2.AwaitRequest.SerializeToString,
+            cache__pb2.ValueResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class HealthStub(object):
     """Missing associated documentation comment in .proto file."""
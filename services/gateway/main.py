@@ -1,10 +1,48 @@
 # services/gateway/main.py
-from fastapi import FastAPI, Query, HTTPException, Body, UploadFile, File
+from fastapi import FastAPI, Query, HTTPException, Body, UploadFile, File, Depends
+from fastapi.responses import JSONResponse, StreamingResponse
 from app.core.orchestrator import HelixOrchestrator
+from app.core.bulk import iter_fasta
+from app.db.registry import ModelRegistry
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, Optional
+from contextlib import asynccontextmanager
+import asyncio, grpc, io, json, os, shutil, tempfile
+from typing import Any, Dict, Literal, Optional
+
+SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX", "10000"))
+# Top-k per query; with the deepest rerank factor (BINARY x10) this still fits hnsw.ef_search <= 1000
+SEARCH_LIMIT_MAX = 100
+
+def search_options(
+    organism: Optional[str] = Query(None),
+    min_confidence: Optional[float] = Query(None),
+    exclude_fallback: bool = Query(False),
+    ef_search: Optional[int] = Query(None, ge=1, le=1000),
+    iterative_scan: Optional[Literal["off", "strict_order", "relaxed_order"]] = Query(None),
+    rerank_factor: Optional[int] = Query(None, ge=1, le=100)
+):
+    filters = {"organism": organism, "min_confidence": min_confidence, "exclude_fallback": exclude_fallback}
+    return {
+        "filters": {k: v for k, v in filters.items() if v not in (None, False)},
+        "ef_search": ef_search,
+        "iterative_scan": iterative_scan,
+        "rerank_factor": rerank_factor,
+    }
+
+orchestrator = HelixOrchestrator()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await orchestrator.startup()
+    yield
+    await orchestrator.shutdown()
+
+app = FastAPI(title="HelixStream Gateway", lifespan=lifespan)
+@app.exception_handler(ValueError)
+async def invalid_input(request, exc: ValueError):
+    # Invalid sequences and unregistered model ids
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
 
-app = FastAPI(title="HelixStream Gateway")
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -13,13 +51,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-orchestrator = HelixOrchestrator()
-
 @app.post("/v1/ingest")
 async def ingest_data(
     query: Optional[str] = Query(None), 
     sequence: Optional[str] = Body(None, embed=True),
-    limit: int = 5, 
+    limit: int = Query(5, ge=1, le=10000), 
     model_id: str = "esm2_t6_8M_UR50D"
 ):
     # Direct Sequence Paste
@@ -36,12 +72,35 @@ async def ingest_data(
 async def search_similar(
     payload: Dict[str, str] = Body(...), 
     model_id: str = Query("esm2_t6_8M_UR50D"), 
-    limit: int = 5
+    limit: int = Query(5, ge=1, le=SEARCH_LIMIT_MAX),
+    options: Dict[str, Any] = Depends(search_options)
 ):
     sequence = payload.get("sequence")
     if not sequence:
         raise HTTPException(status_code=422, detail="Missing 'sequence'")
-    return await orchestrator.search_similar(sequence, model_id, limit)
+    return await orchestrator.search_similar(sequence, model_id, limit, **options)
+
+@app.post("/v1/search/batch")
+async def search_batch(
+    payload: Dict[str, Any] = Body(...),
+    model_id: str = Query("esm2_t6_8M_UR50D"),
+    limit: int = Query(5, ge=1, le=SEARCH_LIMIT_MAX),
+    options: Dict[str, Any] = Depends(search_options)
+):
+    # Either {"sequences": [...]} or {"fasta": ">id\nSEQ..."}
+    if payload.get("fasta"):
+        queries = list(iter_fasta(io.StringIO(payload["fasta"])))
+    elif isinstance(payload.get("sequences"), list):
+        queries = [(str(i), seq) for i, seq in enumerate(payload["sequences"])]
+    else:
+        raise HTTPException(status_code=422, detail="Provide 'sequences' or 'fasta'")
+    if len(queries) > SEARCH_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {SEARCH_BATCH_MAX} queries per request")
+
+    async def ndjson():
+        async for item in orchestrator.search_batch(queries, model_id, limit, **options):
+            yield json.dumps(item) + "\n"
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
 @app.get("/v1/structure/{accession}")
 async def get_structure(accession: str, model_id: str = Query("esm2_t6_8M_UR50D")): 
@@ -50,20 +109,70 @@ async def get_structure(accession: str, model_id: str = Query("esm2_t6_8M_UR50D"
         raise HTTPException(status_code=404, detail="Protein not found")
     return manifest
 
+@app.get("/v1/models")
+async def list_models():
+    return orchestrator.list_models()
+
+@app.get("/v1/metrics")
+async def get_metrics():
+    return orchestrator.metrics()
+
+@app.get("/v1/queue")
+async def get_queue_stats():
+    try:
+        return await orchestrator.queue_stats()
+    except grpc.RpcError as e:
+        raise HTTPException(status_code=503, detail=f"TitanCache unavailable: {e.code()}")
+
 @app.get("/v1/embeddings")
-async def get_all_embeddings(limit: int = 100):
+async def get_all_embeddings(limit: int = Query(100, ge=1, le=10000)):
     from app.db.repository import DatabaseContext
-    with DatabaseContext(orchestrator.db_url) as repo:
-        return repo.get_all_summaries(limit)
+    async with DatabaseContext(orchestrator.db_url) as repo:
+        return await repo.get_all_summaries(limit)
 
-@app.post("/v1/ingest/bulk")
+@app.post("/v1/ingest/bulk", status_code=202)
 async def bulk_ingest(file: UploadFile = File(...), model_id: str = "esm2_t6_8M_UR50D"):
-    content = (await file.read()).decode("utf-8")
-    entries = content.split(">")[1:] 
-    results = []
-    for entry in entries:
-        lines = entry.strip().split("\n")
-        sequence = "".join(lines[1:])
-        res = await orchestrator.ingest_manual_sequence(sequence, model_id)
-        results.append({"status": res[0]["status"]})
-    return {"total": len(results), "summary": results}
\ No newline at end of file
+    # Unknown model -> ValueError -> 400 now, not a failed job later
+    ModelRegistry.get(model_id)
+    # Spool the upload to our own file: Starlette closes UploadFile once this handler returns
+    with tempfile.NamedTemporaryFile(prefix="helix_bulk_", suffix=".fasta", delete=False) as spool:
+        await asyncio.to_thread(shutil.copyfileobj, file.file, spool, 1 << 20)
+    job = orchestrator.bulk.submit(spool.name, model_id)
+    return job.to_dict()
+
+@app.get("/v1/ingest/bulk/{job_id}")
+async def bulk_ingest_status(job_id: str):
+    job = orchestrator.bulk.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.post("/v1/admin/backfill", status_code=202)
+async def start_backfill(model_id: str, mode: str = "missing"):
+    # Unknown model or mode -> ValueError -> 400
+    return await orchestrator.backfill.start(model_id, mode)
+
+@app.get("/v1/admin/backfill")
+async def list_backfills():
+    return await orchestrator.backfill.list()
+
+@app.get("/v1/admin/backfill/{job_id}")
+async def backfill_status(job_id: str):
+    job = await orchestrator.backfill.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/v1/admin/backfill/{job_id}/pause")
+async def pause_backfill(job_id: str):
+    job = await orchestrator.backfill.pause(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/v1/admin/backfill/{job_id}/resume")
+async def resume_backfill(job_id: str):
+    job = await orchestrator.backfill.resume(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
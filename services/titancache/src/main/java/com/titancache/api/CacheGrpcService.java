@@ -1,78 +1,234 @@
 package com.titancache.api;
 
+import com.titancache.core.TaskQueue;
 import com.titancache.core.TitanCache;
 import com.titancache.grpc.*;
+import com.google.protobuf.ByteString;
+import io.grpc.Status;
+import io.grpc.stub.ServerCallStreamObserver;
 import io.grpc.stub.StreamObserver;
 import net.devh.boot.grpc.server.service.GrpcService;
 import org.slf4j.Logger;
 import org.slf4j.LoggerFactory;
 
+import java.util.concurrent.CompletionException;
+import java.util.concurrent.TimeUnit;
+
 @GrpcService
 public class CacheGrpcService extends CacheServiceGrpc.CacheServiceImplBase {
     private static final Logger logger = LoggerFactory.getLogger(CacheGrpcService.class);
+    private static final int DEFAULT_AWAIT_TIMEOUT_MS = 12000;
     private final TitanCache cache;
+    private final TaskDispatcher dispatcher;
 
-    public CacheGrpcService(TitanCache cache) {
+    public CacheGrpcService(TitanCache cache, TaskDispatcher dispatcher) {
         this.cache = cache;
+        this.dispatcher = dispatcher;
+    }
+
+    static Task toTask(TaskQueue.TaskEntry entry) {
+        return Task.newBuilder()
+                .setHash(entry.hash())
+                .setSequence(entry.sequence())
+                .setModelId(entry.modelId())
+                .setPriority(entry.priority())
+                .setEnqueuedAtMs(entry.enqueuedAtMs())
+                .build();
     }
 
     @Override
     public void submitTask(Task request, StreamObserver<EmptyResponse> responseObserver) {
-        cache.submitTask(request.getHash(), request.getSequence(), request.getModelId());
-        responseObserver.onNext(EmptyResponse.newBuilder().setMessage("Queued").build());
+        var dead = cache.submitTask(request.getHash(), request.getSequence(), request.getModelId(), request.getPriority());
+        responseObserver.onNext(EmptyResponse.newBuilder().setMessage(dead == null ? "Queued" : "DeadLettered: " + dead.error()).build());
         responseObserver.onCompleted();
     }
 
     @Override
     public void leaseTasks(LeaseRequest request, StreamObserver<LeaseResponse> responseObserver) {
-        var entries = cache.leaseTasks(request.getMaxBatchSize(), request.getTargetModelId());
-        LeaseResponse.Builder responseBuilder = LeaseResponse.newBuilder();
+        var entries = cache.leaseTasks(request.getMaxBatchSize(), request.getTargetModelId(), request.getWorkerId());
+        LeaseResponse.Builder responseBuilder = LeaseResponse.newBuilder().setLeaseMs((int) cache.leaseTimeoutMs());
         for (var entry : entries) {
-            responseBuilder.addTasks(Task.newBuilder()
-                    .setHash(entry.hash())
-                    .setSequence(entry.sequence())
-                    .setModelId(entry.modelId())
-                    .build());
+            responseBuilder.addTasks(toTask(entry));
         }
         responseObserver.onNext(responseBuilder.build());
         responseObserver.onCompleted();
     }
 
+    @Override
+    public void heartbeat(HeartbeatRequest request, StreamObserver<HeartbeatResponse> responseObserver) {
+        var lost = cache.heartbeat(request.getWorkerId(), request.getModelId(), request.getKeysList());
+        responseObserver.onNext(HeartbeatResponse.newBuilder().addAllLost(lost).build());
+        responseObserver.onCompleted();
+    }
+
+    @Override
+    public void releaseTasks(ReleaseRequest request, StreamObserver<EmptyResponse> responseObserver) {
+        cache.releaseTasks(request.getWorkerId(), request.getModelId(), request.getKeysList(), request.getError());
+        responseObserver.onNext(EmptyResponse.newBuilder().setMessage("Released").build());
+        responseObserver.onCompleted();
+    }
+
+    @Override
+    public void listDeadLetters(EmptyRequest request, StreamObserver<DeadLetterList> responseObserver) {
+        DeadLetterList.Builder builder = DeadLetterList.newBuilder();
+        for (var dead : cache.deadLetters()) {
+            builder.addEntries(DeadLetterList.Entry.newBuilder()
+                    .setKey(dead.hash())
+                    .setModelId(dead.modelId())
+                    .setAttempts(dead.attempts())
+                    .setError(dead.error())
+                    .setDeadAtMs(dead.deadAtMs())
+                    .build());
+        }
+        responseObserver.onNext(builder.build());
+        responseObserver.onCompleted();
+    }
+
     @Override
     public void get(KeyRequest request, StreamObserver<ValueResponse> responseObserver) {
         var storedVal = cache.get(request.getKey(), request.getModelId());
+        responseObserver.onNext(toValueResponse(storedVal, request.getModelId(), request.getAcceptBinary()));
+        responseObserver.onCompleted();
+    }
+
+    @Override
+    public void awaitResult(AwaitRequest request, StreamObserver<ValueResponse> responseObserver) {
+        int timeoutMs = request.getTimeoutMs() > 0 ? request.getTimeoutMs() : DEFAULT_AWAIT_TIMEOUT_MS;
+        var serverObserver = (ServerCallStreamObserver<ValueResponse>) responseObserver;
+        var future = cache.awaitValue(request.getKey(), request.getModelId());
+
+        // Client gave up (deadline or disconnect): drop the waiter instead of holding it until timeout
+        serverObserver.setOnCancelHandler(() -> future.cancel(false));
+        future.completeOnTimeout(null, timeoutMs, TimeUnit.MILLISECONDS)
+                .whenComplete((storedVal, err) -> {
+                    if (serverObserver.isCancelled()) return;
+                    ValueResponse response = toValueResponse(err == null ? storedVal : null, request.getModelId(), request.getAcceptBinary());
+                    Throwable cause = err instanceof CompletionException ? err.getCause() : err;
+                    if (cause instanceof TitanCache.DeadLetteredException) {
+                        response = response.toBuilder().setDeadLettered(true).setError(cause.getMessage()).build();
+                    }
+                    responseObserver.onNext(response);
+                    responseObserver.onCompleted();
+                });
+    }
 
+    private ValueResponse toValueResponse(TitanCache.StoredValue storedVal, String modelId, boolean acceptBinary) {
         ValueResponse.Builder builder = ValueResponse.newBuilder()
                 .setFound(storedVal != null)
-                .setModelId(request.getModelId());
+                .setModelId(modelId);
 
         if (storedVal != null) {
-            builder.setValue(storedVal.json());
+            if (acceptBinary && storedVal.isBinary()) {
+                builder.setVector(ByteString.copyFrom(storedVal.vector()));
+                builder.setEncoding(storedVal.encoding());
+            } else {
+                builder.setValue(storedVal.asJson());
+                builder.setEncoding(VectorEncoding.JSON);
+            }
             builder.setConfidenceScore(storedVal.confidence());
         }
+        return builder.build();
+    }
 
-        responseObserver.onNext(builder.build());
-        responseObserver.onCompleted();
+    private static TitanCache.StoredValue toStoredValue(ByteString vector, VectorEncoding encoding, String json, float confidence) {
+        // Binary wins when present; JSON-only senders are pre-binary clients
+        if (!vector.isEmpty() && encoding != VectorEncoding.JSON) {
+            return TitanCache.StoredValue.ofBinary(vector.toByteArray(), encoding, confidence);
+        }
+        return TitanCache.StoredValue.ofJson(json, confidence);
     }
 
     @Override
     public void put(CacheEntry request, StreamObserver<EmptyResponse> responseObserver) {
-        cache.put(request.getKey(), request.getModelId(), request.getValue(), request.getConfidenceScore());
+        cache.put(request.getKey(), request.getModelId(),
+                toStoredValue(request.getVector(), request.getEncoding(), request.getValue(), request.getConfidenceScore()));
         responseObserver.onNext(EmptyResponse.newBuilder().setMessage("Stored").build());
         responseObserver.onCompleted();
     }
 
-    @Override
-    public void submitBatch(BatchResult request, StreamObserver<EmptyResponse> responseObserver) {
+    private void storeResults(BatchResult request) {
         String modelId = request.getModelId();
         for (var entry : request.getResultsList()) {
-            cache.put(entry.getKey(), modelId, entry.getEmbeddingJson(), entry.getConfidenceScore());
+            cache.put(entry.getKey(), modelId,
+                    toStoredValue(entry.getEmbedding(), entry.getEncoding(), entry.getEmbeddingJson(), entry.getConfidenceScore()));
             cache.resolveTask(entry.getKey(), modelId);
         }
+    }
+
+    @Override
+    public void submitBatch(BatchResult request, StreamObserver<EmptyResponse> responseObserver) {
+        storeResults(request);
         responseObserver.onNext(EmptyResponse.newBuilder().setMessage("Batch Processed").build());
         responseObserver.onCompleted();
     }
 
+    @Override
+    public StreamObserver<WorkerMessage> streamTasks(StreamObserver<TaskBatch> responseObserver) {
+        return new StreamObserver<>() {
+            private TaskDispatcher.Session session;
+            // Set once the stream has been failed: the response observer must not be called again
+            private boolean closed;
+
+            @Override
+            public void onNext(WorkerMessage message) {
+                if (closed) return;
+                if (session == null) {
+                    if (!message.hasHello()) {
+                        closed = true;
+                        responseObserver.onError(Status.FAILED_PRECONDITION
+                                .withDescription("First WorkerMessage must carry hello").asRuntimeException());
+                        return;
+                    }
+                    var hello = message.getHello();
+                    session = dispatcher.open(hello.getWorkerId(), hello.getModelId(), hello.getMaxBatchSize(), responseObserver);
+                }
+                if (message.hasResults()) storeResults(message.getResults());
+                if (message.getHeartbeatKeysCount() > 0) {
+                    cache.heartbeat(session.leaseOwner, session.modelId, message.getHeartbeatKeysList());
+                }
+                if (message.hasRelease()) {
+                    cache.releaseTasks(session.leaseOwner, session.modelId, message.getRelease().getKeysList(), message.getRelease().getError());
+                }
+                dispatcher.grant(session, message.getCredits());
+            }
+
+            @Override
+            public void onError(Throwable t) {
+                if (session != null) dispatcher.close(session, String.valueOf(t.getMessage()));
+            }
+
+            @Override
+            public void onCompleted() {
+                if (session != null) {
+                    session.finish();
+                    dispatcher.close(session, "worker finished");
+                } else if (!closed) {
+                    responseObserver.onCompleted();
+                }
+            }
+        };
+    }
+
+    @Override
+    public void getQueueStats(EmptyRequest request, StreamObserver<QueueStats> responseObserver) {
+        QueueStats.Builder builder = QueueStats.newBuilder().setDeadLetters(cache.deadLetters().size());
+        for (var stats : cache.queueStats()) {
+            builder.addModels(QueueStats.Model.newBuilder()
+                    .setModelId(stats.modelId())
+                    .setInteractiveDepth(stats.interactiveDepth())
+                    .setBulkDepth(stats.bulkDepth())
+                    .setActiveLeases(stats.activeLeases())
+                    .setStreamingWorkers(dispatcher.streaming(stats.modelId()))
+                    .setLeasedTotal(stats.leasedTotal())
+                    .setQueueWaitP50Ms(stats.waitP50Ms())
+                    .setQueueWaitP99Ms(stats.waitP99Ms())
+                    .setQueueWaitMaxMs(stats.waitMaxMs())
+                    .build());
+        }
+        responseObserver.onNext(builder.build());
+        responseObserver.onCompleted();
+    }
+
     @Override
     public void clear(EmptyRequest request, StreamObserver<EmptyResponse> responseObserver) {
         cache.clear();
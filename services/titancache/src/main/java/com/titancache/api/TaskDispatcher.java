@@ -0,0 +1,132 @@
+package com.titancache.api;
+
+import com.titancache.core.TitanCache;
+import com.titancache.grpc.*;
+import io.grpc.stub.StreamObserver;
+import org.slf4j.Logger;
+import org.slf4j.LoggerFactory;
+
+import java.util.ArrayList;
+import java.util.List;
+import java.util.Map;
+import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.CopyOnWriteArrayList;
+import java.util.concurrent.ExecutorService;
+import java.util.concurrent.Executors;
+import java.util.concurrent.atomic.AtomicInteger;
+
+// Pushes queued tasks to connected StreamTasks sessions. A session only receives as many tasks as it
+// has credits (free slots), so a slow worker is never flooded and a fast one never polls.
+// All pushes run on one thread: StreamObserver is not thread-safe and this keeps sessions fair.
+public class TaskDispatcher {
+    private static final Logger logger = LoggerFactory.getLogger(TaskDispatcher.class);
+
+    private final TitanCache cache;
+    private final Map<String, List<Session>> sessions = new ConcurrentHashMap<>();
+    private final ExecutorService executor = Executors.newSingleThreadExecutor(r -> {
+        Thread thread = new Thread(r, "titan-task-dispatcher");
+        thread.setDaemon(true);
+        return thread;
+    });
+
+    private static final AtomicInteger SESSION_IDS = new AtomicInteger();
+
+    public static class Session {
+        final String workerId;
+        // Leases are held per session, not per worker: a worker that reconnects under the same id
+        // must not lose its new leases when the old stream's close arrives late
+        final String leaseOwner;
+        final String modelId;
+        final int maxBatch;
+        final StreamObserver<TaskBatch> observer;
+        final AtomicInteger credits = new AtomicInteger();
+        volatile boolean open = true;
+
+        Session(String workerId, String modelId, int maxBatch, StreamObserver<TaskBatch> observer) {
+            this.workerId = workerId;
+            this.leaseOwner = workerId + "#" + SESSION_IDS.incrementAndGet();
+            this.modelId = modelId;
+            this.maxBatch = maxBatch > 0 ? maxBatch : Integer.MAX_VALUE;
+            this.observer = observer;
+        }
+
+        synchronized boolean send(TaskBatch batch) {
+            if (!open) return false;
+            observer.onNext(batch);
+            return true;
+        }
+
+        synchronized void finish() {
+            open = false;
+            observer.onCompleted();
+        }
+    }
+
+    public TaskDispatcher(TitanCache cache) {
+        this.cache = cache;
+        cache.onTasksAvailable(this::dispatch);
+    }
+
+    public Session open(String workerId, String modelId, int maxBatch, StreamObserver<TaskBatch> observer) {
+        Session session = new Session(workerId, modelId, maxBatch, observer);
+        sessions.computeIfAbsent(modelId, k -> new CopyOnWriteArrayList<>()).add(session);
+        logger.info("Worker {} streaming for {}", workerId, modelId);
+        return session;
+    }
+
+    public void grant(Session session, int credits) {
+        if (credits <= 0) return;
+        session.credits.addAndGet(credits);
+        dispatch(session.modelId);
+    }
+
+    public void close(Session session, String reason) {
+        synchronized (session) {
+            session.open = false;
+        }
+        List<Session> forModel = sessions.get(session.modelId);
+        if (forModel != null) forModel.remove(session);
+        // Whatever it held is requeued (or dead-lettered) right away instead of waiting for expiry
+        cache.releaseWorker(session.leaseOwner, "stream closed: " + reason);
+        logger.info("Worker {} stream closed: {}", session.workerId, reason);
+    }
+
+    public int streaming(String modelId) {
+        return sessions.getOrDefault(modelId, List.of()).size();
+    }
+
+    public void dispatch(String modelId) {
+        executor.execute(() -> drain(modelId));
+    }
+
+    private void drain(String modelId) {
+        List<Session> forModel = sessions.get(modelId);
+        if (forModel == null || forModel.isEmpty()) return;
+        // Spread work across sessions with credit, a batch at a time
+        boolean progress = true;
+        while (progress) {
+            progress = false;
+            for (Session session : new ArrayList<>(forModel)) {
+                int want = Math.min(session.credits.get(), session.maxBatch);
+                if (!session.open || want <= 0) continue;
+                var entries = cache.leaseTasks(want, modelId, session.leaseOwner);
+                if (entries.isEmpty()) return;
+                session.credits.addAndGet(-entries.size());
+                TaskBatch.Builder batch = TaskBatch.newBuilder().setLeaseMs((int) cache.leaseTimeoutMs());
+                for (var entry : entries) {
+                    batch.addTasks(CacheGrpcService.toTask(entry));
+                }
+                try {
+                    if (session.send(batch.build())) {
+                        progress = true;
+                    } else {
+                        // Closed between lease and send: give the tasks straight back
+                        cache.releaseWorker(session.leaseOwner, "stream closed before delivery");
+                    }
+                } catch (RuntimeException e) {
+                    close(session, e.getMessage());
+                }
+            }
+        }
+    }
+}
@@ -1,5 +1,6 @@
 package com.titancache.config;
 
+import com.titancache.api.TaskDispatcher;
 import com.titancache.core.TitanCache;
 import org.springframework.beans.factory.annotation.Value;
 import org.springframework.context.annotation.Bean;
@@ -14,8 +15,29 @@ public class CacheConfig {
     @Value("${titan.cache.max-entry-size-bytes:1048576}")
     private int maxEntrySizeBytes;
 
+    // Fraction of each lease kept for bulk tasks while interactive ones are waiting
+    @Value("${titan.queue.bulk-min-share:0.1}")
+    private double bulkMinShare;
+
+    // A lease not heartbeated for this long is requeued; after max-attempts the key is dead-lettered
+    @Value("${titan.lease.timeout-ms:30000}")
+    private long leaseTimeoutMs;
+
+    @Value("${titan.lease.max-attempts:3}")
+    private int maxAttempts;
+
+    // SubmitTask for a dead-lettered key is refused for this long, then the key may be retried
+    @Value("${titan.lease.dead-letter-ttl-ms:600000}")
+    private long deadLetterTtlMs;
+
     @Bean
     public TitanCache titanCache() {
-        return new TitanCache(capacity, maxEntrySizeBytes);
+        return new TitanCache(capacity, maxEntrySizeBytes, bulkMinShare,
+                new TitanCache.LeasePolicy(leaseTimeoutMs, maxAttempts, deadLetterTtlMs));
+    }
+
+    @Bean
+    public TaskDispatcher taskDispatcher(TitanCache titanCache) {
+        return new TaskDispatcher(titanCache);
     }
 }
\ No newline at end of file
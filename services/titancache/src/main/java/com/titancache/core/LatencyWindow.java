@@ -0,0 +1,33 @@
+package com.titancache.core;
+
+import java.util.Arrays;
+
+// Fixed-size ring of recent samples; percentiles are computed on read, which is rare
+public class LatencyWindow {
+    private final long[] samples;
+    private int next;
+    private int filled;
+    private long total;
+
+    public LatencyWindow(int size) {
+        this.samples = new long[size];
+    }
+
+    public synchronized void record(long valueMs) {
+        samples[next] = valueMs;
+        next = (next + 1) % samples.length;
+        filled = Math.min(filled + 1, samples.length);
+        total++;
+    }
+
+    public synchronized long count() {
+        return total;
+    }
+
+    public synchronized double percentile(double pct) {
+        if (filled == 0) return 0;
+        long[] sorted = Arrays.copyOf(samples, filled);
+        Arrays.sort(sorted);
+        return sorted[Math.min(filled - 1, (int) (filled * pct / 100.0))];
+    }
+}
@@ -0,0 +1,95 @@
+package com.titancache.core;
+
+import com.titancache.grpc.Priority;
+
+import java.util.ArrayDeque;
+import java.util.ArrayList;
+import java.util.HashMap;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Map;
+
+// One queue per model, split by priority. A worker only ever leases its own model's tasks.
+// Interactive tasks go first, but while bulk work is waiting a minimum share of every lease
+// is reserved for it, so a steady stream of searches cannot starve an ingest.
+public class TaskQueue {
+    private final double bulkMinShare;
+    private final Map<String, ModelQueue> queues = new LinkedHashMap<>();
+
+    public record TaskEntry(String hash, String sequence, String modelId, Priority priority, long enqueuedAtMs) {}
+
+    private static class ModelQueue {
+        final ArrayDeque<TaskEntry> interactive = new ArrayDeque<>();
+        final ArrayDeque<TaskEntry> bulk = new ArrayDeque<>();
+        final Map<String, TaskEntry> queued = new HashMap<>();
+        double bulkCredit; // Accumulates fractional shares so small leases still let bulk through eventually
+
+        ArrayDeque<TaskEntry> of(Priority priority) {
+            return priority == Priority.BULK ? bulk : interactive;
+        }
+    }
+
+    public TaskQueue(double bulkMinShare) {
+        this.bulkMinShare = bulkMinShare;
+    }
+
+    public synchronized boolean offer(TaskEntry entry) {
+        ModelQueue queue = queues.computeIfAbsent(entry.modelId(), k -> new ModelQueue());
+        TaskEntry existing = queue.queued.get(entry.hash());
+        if (existing != null) {
+            // Someone is now waiting on a queued bulk task: move it to the interactive lane
+            if (existing.priority() == Priority.BULK && entry.priority() == Priority.INTERACTIVE) {
+                queue.bulk.remove(existing);
+                queue.interactive.offer(entry);
+                queue.queued.put(entry.hash(), entry);
+            }
+            return false;
+        }
+        queue.of(entry.priority()).offer(entry);
+        queue.queued.put(entry.hash(), entry);
+        return true;
+    }
+
+    public synchronized List<TaskEntry> poll(String modelId, int count) {
+        List<TaskEntry> batch = new ArrayList<>();
+        if (modelId == null || modelId.isEmpty()) {
+            // Legacy workers do not name a model: take from whichever queues have work
+            for (String id : new ArrayList<>(queues.keySet())) {
+                if (batch.size() >= count) break;
+                batch.addAll(poll(id, count - batch.size()));
+            }
+            return batch;
+        }
+
+        ModelQueue queue = queues.get(modelId);
+        if (queue == null) return batch;
+        queue.bulkCredit = queue.bulk.isEmpty() ? 0 : Math.min(queue.bulkCredit + count * bulkMinShare, count);
+        drain(queue, queue.interactive, count - (int) queue.bulkCredit, batch);
+        int before = batch.size();
+        drain(queue, queue.bulk, count - batch.size(), batch);
+        queue.bulkCredit = Math.max(0, queue.bulkCredit - (batch.size() - before));
+        drain(queue, queue.interactive, count - batch.size(), batch);
+        return batch;
+    }
+
+    private static void drain(ModelQueue queue, ArrayDeque<TaskEntry> lane, int limit, List<TaskEntry> batch) {
+        for (int i = 0; i < limit && !lane.isEmpty(); i++) {
+            TaskEntry entry = lane.poll();
+            queue.queued.remove(entry.hash());
+            batch.add(entry);
+        }
+    }
+
+    public synchronized int[] depth(String modelId) {
+        ModelQueue queue = queues.get(modelId);
+        return queue == null ? new int[] {0, 0} : new int[] {queue.interactive.size(), queue.bulk.size()};
+    }
+
+    public synchronized List<String> models() {
+        return new ArrayList<>(queues.keySet());
+    }
+
+    public synchronized void clear() {
+        queues.clear();
+    }
+}
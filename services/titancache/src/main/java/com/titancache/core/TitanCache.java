@@ -1,14 +1,21 @@
 package com.titancache.core;
 
+import com.titancache.core.TaskQueue.TaskEntry;
+import com.titancache.grpc.Priority;
+import com.titancache.grpc.VectorEncoding;
 import org.slf4j.Logger;
 import org.slf4j.LoggerFactory;
 import java.util.ArrayList;
 import java.util.HashMap;
 import java.util.List;
 import java.util.Map;
-import java.util.concurrent.BlockingQueue;
+import java.util.concurrent.CompletableFuture;
 import java.util.concurrent.ConcurrentHashMap;
-import java.util.concurrent.LinkedBlockingQueue;
+import java.util.concurrent.CopyOnWriteArrayList;
+import java.util.concurrent.Executors;
+import java.util.concurrent.ScheduledExecutorService;
+import java.util.concurrent.TimeUnit;
+import java.util.function.Consumer;
 import java.util.concurrent.locks.ReentrantReadWriteLock;
 
 public class TitanCache {
@@ -20,56 +27,240 @@ public class TitanCache {
     private final ReentrantReadWriteLock lock = new ReentrantReadWriteLock();
     private final CacheNode<String, StoredValue> head;
     private final CacheNode<String, StoredValue> tail;
-    private final BlockingQueue<TaskEntry> taskQueue = new LinkedBlockingQueue<>();
-    private final Map<String, Long> activeLeases = new ConcurrentHashMap<>();
+    private final TaskQueue taskQueue;
+    private final LeasePolicy leasePolicy;
+    private final Map<String, Lease> activeLeases = new ConcurrentHashMap<>();
+    private final Map<String, Integer> attempts = new ConcurrentHashMap<>();
+    private final Map<String, DeadLetter> deadLetters = new ConcurrentHashMap<>();
+    private final Map<String, LatencyWindow> queueWait = new ConcurrentHashMap<>();
+    private volatile Consumer<String> taskListener = modelId -> {};
+    private final ScheduledExecutorService reaper = Executors.newSingleThreadScheduledExecutor(r -> {
+        Thread thread = new Thread(r, "titan-lease-reaper");
+        thread.setDaemon(true);
+        return thread;
+    });
+    private final Map<String, List<CompletableFuture<StoredValue>>> waiters = new ConcurrentHashMap<>();
 
-    public record StoredValue(String json, float confidence) {}
-    public record TaskEntry(String hash, String sequence, String modelId) {}
+    public record StoredValue(String json, byte[] vector, VectorEncoding encoding, float confidence) {
+        public static StoredValue ofJson(String json, float confidence) {
+            return new StoredValue(json, null, VectorEncoding.JSON, confidence);
+        }
+
+        public static StoredValue ofBinary(byte[] vector, VectorEncoding encoding, float confidence) {
+            return new StoredValue(null, vector, encoding, confidence);
+        }
+
+        public boolean isBinary() {
+            return vector != null;
+        }
+
+        public String asJson() {
+            return isBinary() ? VectorCodec.toJson(vector, encoding) : json;
+        }
+    }
+
+    public record LeasePolicy(long timeoutMs, int maxAttempts, long deadLetterTtlMs) {}
+    public record Lease(TaskEntry task, String workerId, int attempt, long expiresAtMs) {
+        Lease extend(long expiresAtMs) {
+            return new Lease(task, workerId, attempt, expiresAtMs);
+        }
+    }
+    public record DeadLetter(String hash, String modelId, int attempts, String error, long deadAtMs) {}
+
+    public static class DeadLetteredException extends RuntimeException {
+        public DeadLetteredException(String message) {
+            super(message);
+        }
+    }
 
-    public TitanCache(int capacity, int maxEntrySizeBytes) {
+    public TitanCache(int capacity, int maxEntrySizeBytes, double bulkMinShare, LeasePolicy leasePolicy) {
         this.capacity = capacity;
         this.maxEntrySizeBytes = maxEntrySizeBytes;
+        this.taskQueue = new TaskQueue(bulkMinShare);
+        this.leasePolicy = leasePolicy;
         this.map = new HashMap<>();
         this.head = new CacheNode<>(null, null);
         this.tail = new CacheNode<>(null, null);
         head.next = tail;
         tail.prev = head;
+        long period = Math.max(100, leasePolicy.timeoutMs() / 4);
+        reaper.scheduleAtFixedRate(this::expireLeases, period, period, TimeUnit.MILLISECONDS);
+    }
+
+    public long leaseTimeoutMs() {
+        return leasePolicy.timeoutMs();
+    }
+
+    // Called with the model id whenever new work becomes leasable (submit or requeue)
+    public void onTasksAvailable(Consumer<String> listener) {
+        this.taskListener = listener;
     }
 
     private String compositeKey(String hash, String modelId) {
         return hash + ":" + modelId;
     }
 
-    public void submitTask(String hash, String sequence, String modelId) {
+    // Returns the dead letter instead of queueing when the key recently exhausted its attempts
+    public DeadLetter submitTask(String hash, String sequence, String modelId, Priority priority) {
         String composite = compositeKey(hash, modelId);
         System.out.println("DEBUG: submitTask for key [" + composite + "]");
-        if (map.containsKey(composite) || activeLeases.containsKey(composite)) return;
-        TaskEntry entry = new TaskEntry(hash, sequence, modelId);
-        if (!taskQueue.contains(entry)) {
-            taskQueue.offer(entry);
-            logger.info("Task Queued: {}", hash);
+        DeadLetter dead = deadLetters.get(composite);
+        if (dead != null) {
+            if (System.currentTimeMillis() - dead.deadAtMs() < leasePolicy.deadLetterTtlMs()) return dead;
+            deadLetters.remove(composite, dead);
         }
+        if (map.containsKey(composite) || activeLeases.containsKey(composite)) return null;
+        if (taskQueue.offer(new TaskEntry(hash, sequence, modelId, priority, System.currentTimeMillis()))) {
+            logger.info("Task Queued: {} ({})", hash, priority);
+            taskListener.accept(modelId);
+        }
+        return null;
     }
 
-    public List<TaskEntry> leaseTasks(int count, String targetModelId) {
-        List<TaskEntry> batch = new ArrayList<>();
-        taskQueue.drainTo(batch, count);
+    public List<TaskEntry> leaseTasks(int count, String targetModelId, String workerId) {
+        List<TaskEntry> batch = taskQueue.poll(targetModelId, count);
+        long now = System.currentTimeMillis();
+        long expiresAt = now + leasePolicy.timeoutMs();
         for (TaskEntry entry : batch) {
-            activeLeases.put(compositeKey(entry.hash(), entry.modelId()), System.currentTimeMillis());
+            String composite = compositeKey(entry.hash(), entry.modelId());
+            queueWait.computeIfAbsent(entry.modelId(), k -> new LatencyWindow(2048)).record(now - entry.enqueuedAtMs());
+            int attempt = attempts.merge(composite, 1, Integer::sum);
+            activeLeases.put(composite, new Lease(entry, workerId, attempt, expiresAt));
         }
         return batch;
     }
 
     public void resolveTask(String hash, String modelId) {
         String composite = compositeKey(hash, modelId);
+        attempts.remove(composite);
         if (activeLeases.remove(composite) != null) {
             logger.info("Task Resolved: {}", composite);
         }
     }
 
-    public void put(String hash, String modelId, String valueJson, float confidence) {
+    // Extends the caller's leases; returns the keys it no longer holds
+    public List<String> heartbeat(String workerId, String modelId, List<String> hashes) {
+        long expiresAt = System.currentTimeMillis() + leasePolicy.timeoutMs();
+        List<String> lost = new ArrayList<>();
+        for (String hash : hashes) {
+            Lease lease = activeLeases.computeIfPresent(compositeKey(hash, modelId),
+                    (k, current) -> current.workerId().equals(workerId) ? current.extend(expiresAt) : current);
+            if (lease == null || !lease.workerId().equals(workerId)) lost.add(hash);
+        }
+        return lost;
+    }
+
+    public void releaseTasks(String workerId, String modelId, List<String> hashes, String error) {
+        for (String hash : hashes) {
+            String composite = compositeKey(hash, modelId);
+            Lease lease = activeLeases.get(composite);
+            if (lease != null && lease.workerId().equals(workerId) && activeLeases.remove(composite, lease)) {
+                retryOrDeadLetter(composite, lease, error.isEmpty() ? "released by worker" : error);
+            }
+        }
+    }
+
+    private void expireLeases() {
+        long now = System.currentTimeMillis();
+        try {
+            for (Map.Entry<String, Lease> entry : activeLeases.entrySet()) {
+                Lease lease = entry.getValue();
+                // Conditional remove: loses to a concurrent heartbeat or resolve
+                if (lease.expiresAtMs() <= now && activeLeases.remove(entry.getKey(), lease)) {
+                    retryOrDeadLetter(entry.getKey(), lease, "lease expired (worker " + lease.workerId() + ")");
+                }
+            }
+        } catch (Exception e) {
+            logger.error("Lease reaper failed", e);
+        }
+    }
+
+    private void retryOrDeadLetter(String composite, Lease lease, String error) {
+        TaskEntry task = lease.task();
+        if (map.containsKey(composite)) {
+            // The result arrived anyway (late SubmitBatch)
+            attempts.remove(composite);
+            return;
+        }
+        if (lease.attempt() < leasePolicy.maxAttempts()) {
+            logger.warn("Requeue {} after attempt {}/{}: {}", composite, lease.attempt(), leasePolicy.maxAttempts(), error);
+            taskQueue.offer(task);
+            taskListener.accept(task.modelId());
+            return;
+        }
+        attempts.remove(composite);
+        DeadLetter dead = new DeadLetter(task.hash(), task.modelId(), lease.attempt(), error, System.currentTimeMillis());
+        deadLetters.put(composite, dead);
+        logger.error("Dead-lettered {} after {} attempts: {}", composite, lease.attempt(), error);
+        // Fail waiters now rather than letting them sit until their own timeout
+        List<CompletableFuture<StoredValue>> pending = waiters.get(composite);
+        if (pending != null) {
+            for (CompletableFuture<StoredValue> future : pending) {
+                future.completeExceptionally(new DeadLetteredException(error));
+            }
+        }
+    }
+
+    // Hands back every lease held under workerId (a polling worker id, or one stream session's lease owner),
+    // e.g. when that stream drops mid-batch
+    public void releaseWorker(String workerId, String error) {
+        for (Map.Entry<String, Lease> entry : activeLeases.entrySet()) {
+            Lease lease = entry.getValue();
+            if (lease.workerId().equals(workerId) && activeLeases.remove(entry.getKey(), lease)) {
+                retryOrDeadLetter(entry.getKey(), lease, error);
+            }
+        }
+    }
+
+    public record ModelStats(String modelId, int interactiveDepth, int bulkDepth, int activeLeases,
+                             long leasedTotal, double waitP50Ms, double waitP99Ms, double waitMaxMs) {}
+
+    public List<ModelStats> queueStats() {
+        List<String> models = taskQueue.models();
+        queueWait.keySet().stream().filter(m -> !models.contains(m)).forEach(models::add);
+        List<ModelStats> stats = new ArrayList<>();
+        for (String modelId : models) {
+            int[] depth = taskQueue.depth(modelId);
+            int leases = (int) activeLeases.values().stream().filter(l -> l.task().modelId().equals(modelId)).count();
+            LatencyWindow wait = queueWait.getOrDefault(modelId, new LatencyWindow(1));
+            stats.add(new ModelStats(modelId, depth[0], depth[1], leases, wait.count(),
+                    wait.percentile(50), wait.percentile(99), wait.percentile(100)));
+        }
+        return stats;
+    }
+
+    public List<DeadLetter> deadLetters() {
+        return new ArrayList<>(deadLetters.values());
+    }
+
+    public CompletableFuture<StoredValue> awaitValue(String hash, String modelId) {
+        String composite = compositeKey(hash, modelId);
+        CompletableFuture<StoredValue> future = new CompletableFuture<>();
+        waiters.computeIfAbsent(composite, k -> new CopyOnWriteArrayList<>()).add(future);
+        future.whenComplete((value, err) -> waiters.computeIfPresent(composite, (k, list) -> {
+            list.remove(future);
+            return list.isEmpty() ? null : list;
+        }));
+
+        // Registered before checking, so a concurrent put either lands here or notifies us
+        StoredValue existing = get(hash, modelId);
+        DeadLetter dead = deadLetters.get(composite);
+        if (existing != null) future.complete(existing);
+        else if (dead != null) future.completeExceptionally(new DeadLetteredException(dead.error()));
+        return future;
+    }
+
+    private void notifyWaiters(String composite, StoredValue storedVal) {
+        List<CompletableFuture<StoredValue>> pending = waiters.get(composite);
+        if (pending == null) return;
+        for (CompletableFuture<StoredValue> future : pending) {
+            future.complete(storedVal);
+        }
+    }
+
+    public void put(String hash, String modelId, StoredValue storedVal) {
         String composite = compositeKey(hash, modelId);
-        StoredValue storedVal = new StoredValue(valueJson, confidence);
+        float confidence = storedVal.confidence();
 
         System.out.println("DEBUG PUT -> CompositeKey: [" + composite + "]");
 
@@ -93,6 +284,7 @@ public class TitanCache {
             logger.info("Stored L1: {} (Conf: {})", hash, confidence);
         } finally {
             lock.writeLock().unlock();
+            notifyWaiters(composite, storedVal);
         }
     }
 
@@ -124,6 +316,8 @@ public class TitanCache {
             map.clear();
             taskQueue.clear();
             activeLeases.clear();
+            attempts.clear();
+            deadLetters.clear();
             head.next = tail;
             tail.prev = head;
         } finally {
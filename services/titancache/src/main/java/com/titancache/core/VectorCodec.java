@@ -0,0 +1,26 @@
+package com.titancache.core;
+
+import com.titancache.grpc.VectorEncoding;
+
+import java.nio.ByteBuffer;
+import java.nio.ByteOrder;
+
+public final class VectorCodec {
+    private VectorCodec() {}
+
+    // Only used for legacy readers that still parse JSON out of ValueResponse.value
+    public static String toJson(byte[] data, VectorEncoding encoding) {
+        ByteBuffer buffer = ByteBuffer.wrap(data).order(ByteOrder.LITTLE_ENDIAN);
+        int width = encoding == VectorEncoding.FLOAT16_LE ? Short.BYTES : Float.BYTES;
+        int dims = data.length / width;
+        StringBuilder json = new StringBuilder(dims * 12).append('[');
+        for (int i = 0; i < dims; i++) {
+            if (i > 0) json.append(", ");
+            float value = encoding == VectorEncoding.FLOAT16_LE
+                    ? Float.float16ToFloat(buffer.getShort())
+                    : buffer.getFloat();
+            json.append(value);
+        }
+        return json.append(']').toString();
+    }
+}
@@ -1,36 +1,162 @@
 # $env:MODEL_ID="esm2_t33_650M_UR50D"; $env:TITAN_CACHE_HOST="localhost"; python services/workers/inference_worker.py
 # services/workers/inference_worker.py
-import os, sys, logging, json, torch, time, grpc, atexit
+import os, sys, logging, time, grpc, atexit, socket, threading, queue
+from collections import deque
+from pipeline import DONE, Stage, StageHistogram, StageReporter
+from replicas import ReplicaPool
 from concurrent import futures
-from transformers import AutoTokenizer, AutoModelForMaskedLM
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'gateway'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'gateway', 'gen'))
 
 import gen.cache_pb2 as cache_pb2
 import gen.cache_pb2_grpc as cache_pb2_grpc
+import torch
+from app.core.embedding import EmbeddingEngine
+from app.core.vector_codec import encode_vector, encoding_from_name
 
 class HealthServicer(cache_pb2_grpc.HealthServicer):
+    def __init__(self, worker):
+        self.worker = worker
+
     def Check(self, request, context):
-        return cache_pb2.HealthCheckResponse(status=cache_pb2.HealthCheckResponse.SERVING)
+        return cache_pb2.HealthCheckResponse(status=self.worker.health())
+
+    def Watch(self, request, context):
+        # Sends the current status, then again on every change, until the caller goes away
+        sent = None
+        while context.is_active():
+            with self.worker.health_changed:
+                if self.worker.health() == sent:
+                    self.worker.health_changed.wait(timeout=5.0)
+                    continue
+                sent = self.worker.health()
+            yield cache_pb2.HealthCheckResponse(status=sent)
+
+class LeasedBatch:
+    # One leased batch on its way through the lease -> compute -> submit stages
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.keys = [task.hash for task in tasks]
+        self.leased_at = time.perf_counter()
+        self.buckets, self.outputs, self.error = [], [], None
+
+class PollingLeases:
+    # LeaseTasks/SubmitBatch unary calls, for a TitanCache without StreamTasks
+    def __init__(self, worker):
+        self.worker, self.stub = worker, worker.stub
+        self.lease_ms = 30000
+
+    def source(self):
+        worker = self.worker
+        while True:
+            try:
+                response = self.stub.LeaseTasks(cache_pb2.LeaseRequest(
+                    target_model_id=worker.model_id, max_batch_size=worker.batch_size, worker_id=worker.worker_id))
+                self.lease_ms = response.lease_ms or self.lease_ms
+            except Exception as e:
+                logging.error(f"Inference Loop Error: {e}")
+                response = None
+            if response and response.tasks:
+                yield response.tasks
+            # Keep draining while the queue is full, back off only when idle
+            if not response or len(response.tasks) < worker.batch_size:
+                time.sleep(0.5)
+
+    def submit(self, entries, credits):
+        self.stub.SubmitBatch(cache_pb2.BatchResult(results=entries, model_id=self.worker.model_id))
+
+    def release(self, keys, error, credits):
+        try:
+            self.stub.ReleaseTasks(cache_pb2.ReleaseRequest(worker_id=self.worker.worker_id, model_id=self.worker.model_id, keys=keys, error=error), timeout=2.0)
+        except grpc.RpcError as e:
+            logging.warning(f"ReleaseTasks failed, leases will expire instead: {e.code()}")
+
+    def heartbeat(self, keys):
+        try:
+            res = self.stub.Heartbeat(cache_pb2.HeartbeatRequest(worker_id=self.worker.worker_id, model_id=self.worker.model_id, keys=keys), timeout=2.0)
+            if res.lost:
+                logging.warning(f"Lost lease on {len(res.lost)} tasks, TitanCache requeued them")
+        except grpc.RpcError as e:
+            logging.warning(f"Heartbeat failed: {e.code()}")
+
+    def close(self):
+        pass
+
+class StreamingLeases:
+    # One long-lived StreamTasks call: TitanCache pushes a TaskBatch whenever this worker has credits,
+    # results and heartbeats go back up the same stream. Credits beyond one batch are prefetch,
+    # so every pipeline stage has a batch to work on.
+    def __init__(self, worker):
+        self.worker, self.stub = worker, worker.stub
+        self.lease_ms = 30000
+        self.outbox = queue.Queue()
+
+    def _requests(self):
+        while (message := self.outbox.get()) is not None:
+            yield message
+
+    def source(self):
+        worker = self.worker
+        self.outbox.put(cache_pb2.WorkerMessage(
+            hello=cache_pb2.StreamHello(worker_id=worker.worker_id, model_id=worker.model_id, max_batch_size=worker.batch_size),
+            credits=worker.batch_size * worker.prefetch_batches))
+        logging.info(f"Streaming tasks for {worker.model_id} as {worker.worker_id}")
+        for batch in self.stub.StreamTasks(self._requests()):
+            self.lease_ms = batch.lease_ms or self.lease_ms
+            yield batch.tasks
+
+    def submit(self, entries, credits):
+        self.outbox.put(cache_pb2.WorkerMessage(
+            results=cache_pb2.BatchResult(results=entries, model_id=self.worker.model_id), credits=credits))
+
+    def release(self, keys, error, credits):
+        self.outbox.put(cache_pb2.WorkerMessage(
+            release=cache_pb2.ReleaseRequest(worker_id=self.worker.worker_id, model_id=self.worker.model_id, keys=keys, error=error),
+            credits=credits))
+
+    def heartbeat(self, keys):
+        self.outbox.put(cache_pb2.WorkerMessage(heartbeat_keys=keys))
+
+    def close(self):
+        self.outbox.put(None)
 
 class HelixWorker:
     def __init__(self):
         self.model_id = os.getenv("MODEL_ID", "esm2_t33_650M_UR50D")
         self.local_model_name = f"facebook/{self.model_id}"
         logging.info(f"--- STARTING GPU WORKER: {self.model_id} ---")
-        
-        logging.info("Loading tokenizer...")
-        self.tokenizer = AutoTokenizer.from_pretrained(self.local_model_name)
-        logging.info("Tokenizer loaded.")
-        
-        logging.info("Loading model...")
-        self.model = AutoModelForMaskedLM.from_pretrained(self.local_model_name)
-        logging.info("Model loaded.")
-        
-        self.model.eval()
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model.to(self.device)
+        self.health_changed = threading.Condition()
+
+        # WORKER_REPLICAS > 1: this process only supervises, the replicas load the model
+        self.replicas = int(os.getenv("WORKER_REPLICAS", "1"))
+        self.engine, self.pool = None, None
+        if self.replicas > 1:
+            devices = os.getenv("WORKER_DEVICES", "").split(",") if os.getenv("WORKER_DEVICES") else (
+                [f"cuda:{i}" for i in range(torch.cuda.device_count())] or ["cpu"])
+            self.pool = ReplicaPool(self.local_model_name, self.replicas, devices, int(os.getenv("WORKER_THREADS_PER_REPLICA", "0")))
+            self.pool.on_change = self._health_changed
+        else:
+            logging.info("Loading model...")
+            self.engine = EmbeddingEngine(self.local_model_name, with_confidence=True)
+            logging.info(f"Model loaded on {self.engine.device}.")
+
+        self.batch_size = int(os.getenv("WORKER_BATCH_SIZE", "16"))
+        self.length_buckets = sorted(int(b) for b in os.getenv("LENGTH_BUCKETS", "128,256,512,1022").split(","))
+        self.vector_encoding = encoding_from_name(os.getenv("VECTOR_ENCODING", "float32"))
+        self.worker_id = os.getenv("WORKER_ID", f"{socket.gethostname()}-{os.getpid()}")
+        # Batches allowed to wait between two stages; the stream prefetch should cover every stage
+        self.pipeline_depth = int(os.getenv("WORKER_PIPELINE_DEPTH", "2"))
+        # Every replica needs a bucket in flight on top of the lease and submit stages
+        self.prefetch_batches = max(int(os.getenv("WORKER_PREFETCH_BATCHES", "3")), self.replicas + 2)
+        self.compute_timeout = float(os.getenv("WORKER_COMPUTE_TIMEOUT_S", "300"))
+        self.stats_interval = float(os.getenv("WORKER_STATS_INTERVAL_S", "60"))
+        self.stages = {name: StageHistogram(name) for name in ("lease", "compute", "submit")}
+        self.outstanding = set()
+        self.outstanding_lock = threading.Lock()
+        self.processed = 0
+        self.started = time.perf_counter()
+        self.queue_waits = deque(maxlen=1024)
 
         host = os.getenv("TITAN_CACHE_HOST", "localhost")
         port = os.getenv("TITAN_CACHE_PORT", "9090")
@@ -43,48 +169,164 @@ class HelixWorker:
         logging.info("Closing gRPC channel...")
         self.channel.close()
 
-    def _calculate_confidence(self, logits, hidden_states):
-        probs = torch.softmax(logits, dim=-1)
-        entropy = -torch.sum(probs * torch.log(probs + 1e-10), dim=-1)
-        normalized_entropy = 1.0 - (entropy / torch.log(torch.tensor(20.0)))  # 20 tokens
-        return float(normalized_entropy.mean().item())
+    def _bucketize(self, tasks):
+        # Group tasks of similar length so each padded batch wastes little compute
+        buckets = {}
+        for task in tasks:
+            seq = task.sequence.upper().replace(" ", "")[:1022]
+            bound = next((b for b in self.length_buckets if len(seq) <= b), self.length_buckets[-1])
+            buckets.setdefault(bound, []).append((task, seq))
+        return buckets
+
+    def health(self):
+        if self.pool:
+            ready, _ = self.pool.status()
+            return cache_pb2.HealthCheckResponse.SERVING if ready else cache_pb2.HealthCheckResponse.NOT_SERVING
+        return cache_pb2.HealthCheckResponse.SERVING
+
+    def _health_changed(self):
+        with self.health_changed:
+            self.health_changed.notify_all()
+
+    def _tokenize_bucket(self, items):
+        # Replicas tokenize for themselves, so only plain strings cross the process boundary
+        if self.pool:
+            return [seq for _, seq in items]
+        return self.engine.tokenize(seq for _, seq in items)
+
+    def _embed_bucket(self, inputs):
+        # Returns a future: in-process it is already resolved, with replicas the submit stage waits on it
+        if self.pool:
+            return self.pool.submit(inputs)
+        vectors, confidences = self.engine.embed_tokens(inputs)
+        future = futures.Future()
+        future.set_result((vectors.numpy(), confidences))
+        return future
+
+    def _heartbeat_loop(self, leases, stop):
+        # Keeps every batch in the pipeline leased, beating at a third of the lease so one miss does not cost it
+        while not stop.wait(leases.lease_ms / 3000.0):
+            with self.outstanding_lock:
+                keys = list(self.outstanding)
+            if keys:
+                leases.heartbeat(keys)
+
+    def _log_batch(self, work):
+        self.processed += len(work.keys)
+        waits = sorted(self.queue_waits)
+        wait = f", queue wait p50 {waits[len(waits) // 2]:.0f}ms p99 {waits[int(len(waits) * 0.99)]:.0f}ms" if waits else ""
+        logging.info(f"Batch of {len(work.keys)} done {time.perf_counter() - work.leased_at:.2f}s after lease "
+                     f"(avg {self.processed / (time.perf_counter() - self.started):.1f} seq/s over {self.processed}{wait})")
+
+    def _compute_stage(self, inbox, outbox):
+        hist = self.stages["compute"]
+        while (work := inbox.get()) is not DONE:
+            if work.error is None:
+                start = time.perf_counter()
+                try:
+                    for items, inputs in work.buckets:
+                        work.outputs.append((items, self._embed_bucket(inputs)))
+                except Exception as e:
+                    work.error = e
+                hist.record(time.perf_counter() - start)
+            outbox.put(work, hist)
+        outbox.put(DONE, hist)
+
+    def _submit_stage(self, inbox, leases):
+        hist = self.stages["submit"]
+        while (work := inbox.get()) is not DONE:
+            start = time.perf_counter()
+            try:
+                if work.error is not None: raise work.error
+                entries = []
+                for items, future in work.outputs:
+                    vectors, confidences = future.result(timeout=self.compute_timeout)
+                    for (task, _), vector, confidence in zip(items, vectors, confidences):
+                        entries.append(cache_pb2.BatchResult.Entry(
+                            key=task.hash, 
+                            embedding=encode_vector(vector, self.vector_encoding),
+                            encoding=self.vector_encoding,
+                            confidence_score=confidence
+                        ))
+                leases.submit(entries, len(work.keys))
+                self._log_batch(work)
+            except Exception as e:
+                logging.error(f"Inference Loop Error: {e}")
+                # Hand the batch back now (counts as an attempt) instead of waiting for the leases to expire
+                leases.release(work.keys, f"{type(e).__name__}: {e}", len(work.keys))
+            finally:
+                with self.outstanding_lock:
+                    self.outstanding.difference_update(work.keys)
+            hist.record(time.perf_counter() - start)
 
-    def _poll_and_process(self):
+    def _run_pipeline(self, leases):
+        # lease/tokenize (this thread) -> compute -> submit, joined by bounded queues: when the
+        # accelerator falls behind, tokenizing and leasing block instead of piling up work
+        hist = self.stages["lease"]
+        compute = Stage(self.stages["compute"], self.pipeline_depth)
+        submit = Stage(self.stages["submit"], self.pipeline_depth + self.replicas - 1)
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self._compute_stage, args=(compute, submit), daemon=True),
+            threading.Thread(target=self._submit_stage, args=(submit, leases), daemon=True),
+            threading.Thread(target=self._heartbeat_loop, args=(leases, stop), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
         try:
-            lease_req = cache_pb2.LeaseRequest(target_model_id=self.model_id, max_batch_size=1)
-            response = self.stub.LeaseTasks(lease_req)
-            if not response.tasks: return
-
-            for task in response.tasks:
-                logging.info(f"Computing: {task.hash}")
-                clean_seq = task.sequence.upper().replace(" ", "")[:1022]
-                inputs = self.tokenizer(clean_seq, return_tensors="pt").to(self.device)
-                
-                with torch.no_grad():
-                    outputs = self.model(**inputs, output_hidden_states=True)
-                    embeddings = outputs.hidden_states[-1].mean(dim=1)
-                    normalized = torch.nn.functional.normalize(embeddings, p=2, dim=1)
-                    vector = normalized.tolist()[0]
-                    confidence = self._calculate_confidence(outputs.logits, outputs.hidden_states)
-                
-                entry = cache_pb2.BatchResult.Entry(
-                    key=task.hash, 
-                    embedding_json=json.dumps(vector), 
-                    confidence_score=confidence
-                )
-                self.stub.SubmitBatch(cache_pb2.BatchResult(results=[entry], model_id=self.model_id))
-        except Exception as e:
-            logging.error(f"Inference Loop Error: {e}")
+            source = iter(leases.source())
+            while True:
+                waited = time.perf_counter()
+                tasks = next(source, None)
+                if tasks is None: break
+                start = time.perf_counter()
+                hist.starved += start - waited
+                work = LeasedBatch(tasks)
+                with self.outstanding_lock:
+                    self.outstanding.update(work.keys)
+                # Queue-to-start: how long each task sat in TitanCache before this worker picked it up
+                now_ms = time.time() * 1000
+                self.queue_waits.extend(now_ms - task.enqueued_at_ms for task in tasks if task.enqueued_at_ms)
+                try:
+                    work.buckets = [(items, self._tokenize_bucket(items)) for items in self._bucketize(tasks).values()]
+                except Exception as e:
+                    work.error = e
+                hist.record(time.perf_counter() - start)
+                compute.put(work, hist)
+        finally:
+            compute.put(DONE, hist)
+            for thread in threads[:2]:
+                thread.join()
+            stop.set()
+            leases.close()
 
     def run(self):
-        server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
-        cache_pb2_grpc.add_HealthServicer_to_server(HealthServicer(), server)
+        # Health.Watch streams hold a thread each for as long as the caller watches
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=8))
+        cache_pb2_grpc.add_HealthServicer_to_server(HealthServicer(self), server)
         worker_port = os.getenv("WORKER_PORT", "50051")
         server.add_insecure_port(f'0.0.0.0:{worker_port}') 
         server.start()
+        histograms = list(self.stages.values())
+        if self.pool:
+            self.pool.start()
+            histograms += self.pool.histograms
+            # Do not take leases until at least one replica can work on them
+            with self.health_changed:
+                self.health_changed.wait_for(lambda: self.health() == cache_pb2.HealthCheckResponse.SERVING)
+        StageReporter(histograms, self.stats_interval).start()
+        backoff = 1.0
         while True:
-            self._poll_and_process()
-            time.sleep(0.5)
+            try:
+                self._run_pipeline(StreamingLeases(self))
+                backoff = 1.0
+            except grpc.RpcError as e:
+                if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                    logging.warning("TitanCache does not support StreamTasks, falling back to polling")
+                    self._run_pipeline(PollingLeases(self))
+                logging.warning(f"Task stream dropped ({e.code()}), reconnecting in {backoff:.0f}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -0,0 +1,70 @@
+# services/workers/pipeline.py
+# Stage plumbing for the inference worker: bounded hand-off queues and per-stage timing histograms.
+import bisect, logging, queue, threading, time
+
+BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+DONE = object()
+
+class StageHistogram:
+    # busy: time spent doing the stage's work. starved: waiting for input. blocked: waiting on a full
+    # downstream queue. The bottleneck is the stage that is busy while the others starve or block on it.
+    def __init__(self, name):
+        self.name = name
+        self.counts = [0] * (len(BOUNDS_MS) + 1)
+        self.busy = self.starved = self.blocked = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.counts[bisect.bisect_left(BOUNDS_MS, seconds * 1000)] += 1
+            self.busy += seconds
+
+    def percentile(self, pct):
+        # Upper bound of the bucket holding the pct-th sample, inf past the last bound
+        total = sum(self.counts)
+        if not total: return 0.0
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= total * pct / 100.0:
+                return float(BOUNDS_MS[i]) if i < len(BOUNDS_MS) else float("inf")
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "stage": self.name, "count": sum(self.counts),
+                "p50_ms": self.percentile(50), "p99_ms": self.percentile(99),
+                "busy_s": round(self.busy, 2), "starved_s": round(self.starved, 2), "blocked_s": round(self.blocked, 2),
+                "buckets_ms": dict(zip([str(b) for b in BOUNDS_MS] + ["inf"], self.counts)),
+            }
+
+class Stage:
+    # The bounded inbox of one stage; hist is that stage's (long-lived) histogram
+    def __init__(self, hist, maxsize):
+        self.hist = hist
+        self.inbox = queue.Queue(maxsize=maxsize)
+
+    def put(self, item, hist):
+        # Blocks when this stage is behind: that is the backpressure, charged to the producer
+        start = time.perf_counter()
+        self.inbox.put(item)
+        hist.blocked += time.perf_counter() - start
+
+    def get(self):
+        start = time.perf_counter()
+        item = self.inbox.get()
+        self.hist.starved += time.perf_counter() - start
+        return item
+
+class StageReporter(threading.Thread):
+    def __init__(self, histograms, interval):
+        super().__init__(daemon=True)
+        self.histograms, self.interval = histograms, interval
+        self.stop = threading.Event()
+
+    def run(self):
+        while not self.stop.wait(self.interval):
+            logging.info("Stages: " + " | ".join(
+                f"{s['stage']} n={s['count']} p50<={s['p50_ms']:.0f}ms p99<={s['p99_ms']:.0f}ms "
+                f"busy {s['busy_s']}s starved {s['starved_s']}s blocked {s['blocked_s']}s"
+                for s in (h.snapshot() for h in self.histograms)))
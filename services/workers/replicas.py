@@ -0,0 +1,121 @@
+# services/workers/replicas.py
+# Supervisor mode: N model replicas in their own processes, each pinned to a slice of the host's cores
+# (and a device). The supervisor owns the single lease stream and hands each bucket to the least
+# loaded ready replica, so it always knows what a crashed replica was holding.
+import itertools, logging, multiprocessing as mp, os, threading, time
+from concurrent.futures import Future
+from pipeline import StageHistogram
+
+def replica_main(index, model_name, device, threads, cores, jobs, results):
+    # torch is usually already imported here (spawn re-imports inference_worker.py), but its intra-op
+    # thread pool is only created on first use: pinning before set_num_threads and the first forward
+    # makes those threads inherit the affinity
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    import torch
+    from app.core.embedding import EmbeddingEngine
+    torch.set_num_threads(threads)
+    engine = EmbeddingEngine(model_name, device=torch.device(device), with_confidence=True)
+    results.put(("ready", index, None, None))
+    while (job := jobs.get()) is not None:
+        job_id, sequences = job
+        start = time.perf_counter()
+        try:
+            vectors, confidences = engine.embed(sequences)
+            results.put(("done", index, job_id, (vectors.numpy(), confidences, time.perf_counter() - start)))
+        except Exception as e:
+            results.put(("error", index, job_id, f"{type(e).__name__}: {e}"))
+
+def plan_replicas(count, devices, threads=0):
+    # Contiguous core slices, one per replica; with more replicas than cores they share
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    per = max(1, len(cores) // count)
+    plan = []
+    for i in range(count):
+        chunk = cores[i * per:(i + 1) * per] or cores
+        plan.append((devices[i % len(devices)], threads or len(chunk), chunk))
+    return plan
+
+class ReplicaPool:
+    def __init__(self, model_name, count, devices, threads=0):
+        self.model_name = model_name
+        self.plan = plan_replicas(count, devices, threads)
+        self.ctx = mp.get_context("spawn")
+        self.results = self.ctx.Queue()
+        self.jobs = [self.ctx.Queue() for _ in range(count)]
+        self.procs = [None] * count
+        self.ready = [False] * count
+        self.assigned = [set() for _ in range(count)]
+        self.futures = {}
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+        self.histograms = [StageHistogram(f"replica-{i}") for i in range(count)]
+        self.on_change = lambda: None
+
+    def start(self):
+        for index in range(len(self.procs)):
+            self._spawn(index)
+        threading.Thread(target=self._collect, daemon=True).start()
+        threading.Thread(target=self._monitor, daemon=True).start()
+
+    def _spawn(self, index):
+        device, threads, cores = self.plan[index]
+        logging.info(f"Starting replica {index} on {device} with {threads} threads, cores {cores[0]}-{cores[-1]}")
+        self.procs[index] = self.ctx.Process(
+            target=replica_main, args=(index, self.model_name, device, threads, cores, self.jobs[index], self.results), daemon=True)
+        self.procs[index].start()
+
+    def submit(self, sequences):
+        future = Future()
+        job_id = next(self.ids)
+        with self.lock:
+            candidates = [i for i, ready in enumerate(self.ready) if ready] or range(len(self.procs))
+            index = min(candidates, key=lambda i: len(self.assigned[i]))
+            self.assigned[index].add(job_id)
+            self.futures[job_id] = future
+            inbox = self.jobs[index]
+        inbox.put((job_id, list(sequences)))
+        return future
+
+    def _collect(self):
+        while True:
+            kind, index, job_id, payload = self.results.get()
+            with self.lock:
+                if kind == "ready":
+                    self.ready[index] = True
+                else:
+                    self.assigned[index].discard(job_id)
+                    future = self.futures.pop(job_id, None)
+            if kind == "ready":
+                logging.info(f"Replica {index} ready ({self.status()[0]}/{len(self.procs)})")
+                self.on_change()
+            elif future is None:
+                continue
+            elif kind == "done":
+                vectors, confidences, elapsed = payload
+                self.histograms[index].record(elapsed)
+                future.set_result((vectors, confidences))
+            else:
+                future.set_exception(RuntimeError(payload))
+
+    def _monitor(self):
+        # A replica that crashes (OOM, driver fault) fails every bucket it held and is restarted
+        while True:
+            time.sleep(1.0)
+            for index, proc in enumerate(self.procs):
+                if proc.is_alive(): continue
+                logging.error(f"Replica {index} exited with code {proc.exitcode}, restarting")
+                with self.lock:
+                    self.ready[index] = False
+                    lost = [self.futures.pop(job_id) for job_id in self.assigned[index] if job_id in self.futures]
+                    self.assigned[index].clear()
+                    # A fresh inbox: the old one may hold a half-written job from the crashed replica
+                    self.jobs[index] = self.ctx.Queue()
+                for future in lost:
+                    future.set_exception(RuntimeError(f"replica {index} exited with code {proc.exitcode}"))
+                self.on_change()
+                self._spawn(index)
+
+    def status(self):
+        with self.lock:
+            return sum(self.ready), len(self.procs)